@@ -1,29 +1,50 @@
 # api/agent.py
-from load_client import get_client
-from agents import Agent, OpenAIChatCompletionsModel
+# Building the agent imports the agents/openai stack and the tools; it happens
+# on the first get_agent() call, not at import time.
+import functools
 import os
-from dotenv import load_dotenv
-from tools import get_tools
+import threading
 
+PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "default_prompt.md")
+DEFAULT_MODEL = "google/gemini-2.5-pro-exp-03-25:free"
+PARALLEL_TOOL_CALLS = os.getenv("OPENCODER_PARALLEL_TOOLS", "1") != "0"
+
+default_agent = None
+_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
 def get_default_prompt():
-    with open("default_prompt.md", "r") as file:
+    # Next to this file, so the agent starts from any working directory
+    with open(PROMPT_PATH, "r") as file:
         content = file.read()
     return(content)
 
 def get_model():
-    model = "google/gemini-2.5-pro-exp-03-25:free"
-    print("Selected model: "+model)
-    return model
+    return os.getenv("OPENCODER_MODEL", DEFAULT_MODEL)
 
-def get_agent(tools = get_tools(), selected_model = get_model()):
+def get_agent(tools = None, selected_model = None):
+    """Builds an agent. Without arguments the default one is built once and reused."""
+    global default_agent
+    if tools is None and selected_model is None:
+        with _lock:
+            if default_agent is None:
+                default_agent = build_agent()
+            return default_agent
+    return build_agent(tools, selected_model)
+
+def build_agent(tools = None, selected_model = None):
+    from agents import Agent, ModelSettings, OpenAIChatCompletionsModel
+    from load_client import get_agent_client
+    from tools import get_tools
     agent = Agent(
         name = "Coder Agent",
         instructions=get_default_prompt(),
         model=OpenAIChatCompletionsModel(
-            model=selected_model,
-            openai_client=get_client()
+            model=selected_model or get_model(),
+            openai_client=get_agent_client()
         ),
-        tools=tools,
+        tools=tools if tools is not None else get_tools(),
+        # Independent calls of one step run concurrently (api/tool_pool.py)
+        model_settings=ModelSettings(parallel_tool_calls=PARALLEL_TOOL_CALLS),
     )
     return agent
-
@@ -1,15 +1,134 @@
 # api/agent_runner.py
-from agents import Runner
-from .context_handler import get_context
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+from .context_handler import get_session, use_session
+from .metrics import MetricEvent, get_metrics
+
+
+@dataclass
+class TurnStats():
+    """Latency of one AgentRunner turn."""
+    total_time: float
+    time_to_first_token: Optional[float] = None # None when not streaming (or nothing was streamed)
+    tool_calls: int = 0
+
+    def describe(self) -> str:
+        ttft = f"{self.time_to_first_token:.2f}s" if self.time_to_first_token is not None else "n/a"
+        return f"time to first token: {ttft}, total: {self.total_time:.2f}s, tool calls: {self.tool_calls}"
+
+
+@dataclass
+class AgentStreamEvent():
+    """What run_streamed() yields: kind is "text", "tool_call", "tool_output" or "final"."""
+    kind: str
+    text: str
 
 
 class AgentRunner():
-    def __init__(self, agent):
+    """
+    Runs turns of one conversation. With a `session` (api/session.py) the turn,
+    and every tool call it makes, works on that session's context and workspace;
+    without one it uses the session current in the caller (the default one).
+    """
+
+    def __init__(self, agent, session=None):
         self.agent = agent
+        self.session = session
+        self.last_turn: Optional[TurnStats] = None
+
+    def _session(self):
+        return self.session if self.session is not None else get_session()
+
+    def _start_turn(self, input) -> List[Dict[str, str]]:
+        session = self._session()
+        session.watcher.sync() # Pick up files changed outside the agent since the last turn
+        session.context.add_user_message(input)
+        return session.prompt_layout.build(session.context) # Stable prefix first, see api/prompt_layout.py
+
+    def _report_turn(self, name: str, input, output: str, started: float, context_before: int,
+                     error: Optional[BaseException] = None):
+        """Emits the "turn" MetricEvent (see api/metrics.py)."""
+        session = self._session()
+        if error is not None:
+            extra = {"exception": repr(error)}
+        else:
+            extra = {"tool_calls": self.last_turn.tool_calls, "time_to_first_token": self.last_turn.time_to_first_token,
+                     "prefix_hit_rate": session.prompt_layout.last_prefix_hit_rate}
+        get_metrics().emit(MetricEvent(
+            kind="turn",
+            name=name,
+            status="error" if error is not None else "success",
+            duration=time.perf_counter() - started,
+            input_bytes=len(str(input)),
+            output_bytes=len(output),
+            context_growth=session.context.size() - context_before,
+            session_id=session.id,
+            extra=extra,
+        ))
+
+    def _compact_history(self):
+        """Starts the background compaction of the message history (api/history.py), off the critical path."""
+        session = self._session()
+        session.history.schedule(session.context, session.id)
 
     async def run(self, input) -> str:
-        get_context().add_user_message(input)
-        response = await Runner.run(starting_agent=self.agent, input=get_context().serialize())
+        from agents import Runner # Deferred: the agents SDK is slow to import
+        started = time.perf_counter()
+        context_before = self._session().context.size()
+        try:
+            with use_session(self._session()): # Tool calls inherit it
+                response = await Runner.run(starting_agent=self.agent, input=self._start_turn(input))
+        except Exception as e:
+            self._report_turn("run", input, "", started, context_before, e)
+            raise
         final_output = response.final_output.strip()
-        get_context().add_system_message(final_output)
-        return final_output
\ No newline at end of file
+        self._session().context.add_assistant_message(final_output)
+        self.last_turn = TurnStats(
+            total_time=time.perf_counter() - started,
+            tool_calls=sum(1 for item in response.new_items if item.type == "tool_call_item"),
+        )
+        self._report_turn("run", input, final_output, started, context_before)
+        self._compact_history()
+        return final_output
+
+    async def run_streamed(self, input) -> AsyncIterator[AgentStreamEvent]:
+        """
+        Same as run(), but yields text deltas and tool events as the model produces them.
+        The last event has kind "final" and carries the whole final output, which is
+        also written to the context. Latencies are stored in self.last_turn.
+        """
+        from agents import Runner
+        started = time.perf_counter()
+        context_before = self._session().context.size()
+        first_token_at: Optional[float] = None
+        tool_calls = 0
+        try:
+            with use_session(self._session()): # Runner.run_streamed() starts a task that copies it
+                result = Runner.run_streamed(starting_agent=self.agent, input=self._start_turn(input))
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if event.data.type.endswith(".delta") and first_token_at is None:
+                        first_token_at = time.perf_counter() # Text or tool-call arguments, whichever comes first
+                    if event.data.type == "response.output_text.delta":
+                        yield AgentStreamEvent("text", event.data.delta)
+                elif event.type == "run_item_stream_event":
+                    if event.item.type == "tool_call_item":
+                        tool_calls += 1
+                        yield AgentStreamEvent("tool_call", getattr(event.item.raw_item, "name", "tool"))
+                    elif event.item.type == "tool_call_output_item":
+                        yield AgentStreamEvent("tool_output", str(event.item.output))
+        except Exception as e:
+            self._report_turn("run_streamed", input, "", started, context_before, e)
+            raise
+
+        final_output = str(result.final_output).strip()
+        self._session().context.add_assistant_message(final_output)
+        self.last_turn = TurnStats(
+            total_time=time.perf_counter() - started,
+            time_to_first_token=first_token_at - started if first_token_at is not None else None,
+            tool_calls=tool_calls,
+        )
+        self._report_turn("run_streamed", input, final_output, started, context_before)
+        self._compact_history()
+        yield AgentStreamEvent("final", final_output)
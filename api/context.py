@@ -1,49 +1,263 @@
-from typing import Dict, List # Import List as well for type hinting methods
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional # Import List as well for type hinting methods
+
+from .locking import synchronized
+
+# --- File cache budget ---
+# Sizes are measured in characters, which is what ends up in the prompt.
+DEFAULT_MAX_FILE_BYTES = 512 * 1024
+DEFAULT_MAX_FILE_TOKENS = None # Optional extra limit, estimated from CHARS_PER_TOKEN
+CHARS_PER_TOKEN = 4
+MAX_EVICTED_STUBS = 200 # Oldest stubs are dropped completely past this count
+MESSAGES_PER_CHUNK = 64 # Messages are joined into a serialized chunk once, when this many have accumulated
 
 class Context():
-    def __init__(self):
+    """
+    Conversation messages and cached files for the agent.
+
+    Serialization is incremental: every message and every file keeps its own
+    rendered segment, and only a file that changed is rendered again. Messages
+    go into an append-only list of chunks, each joined once when it fills up
+    (MESSAGES_PER_CHUNK), so no message is copied again on later turns; the
+    file segments are re-joined only after a file changed. serialize() joins
+    the chunks once, when the string is asked for, and returns the cached
+    string until something changes. size() is kept up to date as segments
+    change and never joins anything.
+
+    Every file segment carries a version that changes whenever the segment
+    does (new content, eviction stub, rename), so the prompt layout
+    (api/prompt_layout.py) can tell which files it has to send again.
+
+    Tools may run on several threads at once (api/tool_pool.py): the public
+    methods hold `lock`, and code reading several fields together should too.
+
+    Cached files are bounded by a character/token budget. When the budget is
+    exceeded the least recently used files are evicted (O(1) per access) and,
+    if evict_to_stub is set, replaced by a one-line stub with path and size.
+    """
+
+    def __init__(self, max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+                 max_file_tokens: Optional[int] = DEFAULT_MAX_FILE_TOKENS,
+                 evict_to_stub: bool = True):
         self.messages: List[str] = []
         self.files: Dict[str, str] = {}
+        self.evicted: "OrderedDict[str, int]" = OrderedDict() # filename -> size of the evicted content
+        self._message_chunks: List[str] = []          # Full chunks of MESSAGES_PER_CHUNK messages, joined, append-only
+        self._open_messages: List[str] = []           # Messages after the last full chunk
+        self._file_segments: Dict[str, str] = {}      # filename -> "filename: content" (or the eviction stub)
+        self._files_blob: Optional[str] = None        # File segments joined; None means a file segment changed
+        self._serialized: Optional[str] = None        # None means something changed since last serialize()
+        self._chars = 0                               # Sum of len(chunk) + 1 over get_everything(), for size()
+        self.versions: Dict[str, int] = {}            # filename -> version of its current segment
+        self._version_clock = 0                       # Versions are never reused, even after a delete
 
+        limits = [limit for limit in (max_file_bytes,
+                                      max_file_tokens * CHARS_PER_TOKEN if max_file_tokens else None) if limit]
+        self.max_file_bytes: Optional[int] = min(limits) if limits else None
+        self.evict_to_stub = evict_to_stub
+        self._lru: "OrderedDict[str, int]" = OrderedDict() # filename -> size, least recently used first
+        self._file_bytes = 0
+        self.reloads = 0   # add_file() of a file that was still cached
+        self.loads = 0     # add_file() of a file that was not cached (new, or evicted earlier)
+        self.evictions = 0
+        self.journal = None # Optional SessionJournal (api/journal.py) told about every change
+        self.watcher = None # Optional FileWatcher (api/watcher.py) told about every file entering the cache
+        self.lock = threading.RLock()
+
+    @synchronized
     def get_everything(self) -> List[str]: # Add return type hint
         everything = []
         everything.extend(self.messages)
+        everything.extend(self._file_segments.values())
+        return everything
 
+    @synchronized
+    def serialize(self) -> str:
+        if self._serialized is None:
+            if self._files_blob is None:
+                self._files_blob = "\n".join(self._file_segments.values())
+            parts = self._message_chunks + self._open_messages
+            if self._file_segments:
+                parts.append(self._files_blob)
+            self._serialized = "\n".join(parts)
+        return self._serialized
 
-        files_array = []
-        # Now self.files is an actual dictionary, so .items() will work
-        for key, value in self.files.items():
-            files_array.append(f"{key}: {value}")
+    @synchronized
+    def size(self) -> int:
+        """Length of what serialize() returns, without joining anything."""
+        return max(0, self._chars - 1)
 
-        everything.extend(files_array)
-        return everything
-    
-    def serialize(self) -> str:
-        return "\n".join(self.get_everything())
-        
+    def _append_message(self, message: str):
+        self.messages.append(message)
+        self._open_messages.append(message)
+        if len(self._open_messages) == MESSAGES_PER_CHUNK:
+            self._message_chunks.append("\n".join(self._open_messages))
+            self._open_messages = []
+        self._chars += len(message) + 1
+        self._serialized = None
+        if self.journal is not None:
+            self.journal.record_message(message)
+
+    @synchronized
+    def replace_history(self, old: List[str], new: List[str]) -> bool:
+        """
+        Replaces the first len(old) messages, if they still are `old` (the same
+        objects), by `new` and keeps the ones added since. Returns False otherwise.
+        """
+        count = len(old)
+        if len(self.messages) < count or any(a is not b for a, b in zip(self.messages, old)):
+            return False
+        self._chars += sum(len(m) + 1 for m in new) - sum(len(m) + 1 for m in old)
+        self.messages[:count] = new
+        full = len(self.messages) - len(self.messages) % MESSAGES_PER_CHUNK
+        self._message_chunks = ["\n".join(self.messages[start:start + MESSAGES_PER_CHUNK])
+                                for start in range(0, full, MESSAGES_PER_CHUNK)]
+        self._open_messages = self.messages[full:]
+        self._serialized = None
+        if self.journal is not None:
+            self.journal.record_history(count, new)
+        return True
+
+    def _mark_files_dirty(self):
+        self._files_blob = None
+        self._serialized = None
 
+    @synchronized
     def add_user_message(self, message: str): # Add type hint
-        self.messages.append(f"user: {message}")
+        self._append_message(f"user: {message}")
 
+    @synchronized
     def add_system_message(self, message: str): # Add type hint
-        self.messages.append(f"system: {message}")
+        self._append_message(f"system: {message}")
 
+    @synchronized
+    def add_assistant_message(self, message: str):
+        self._append_message(f"assistant: {message}")
 
+    # --- File cache ---
+
+    def _record_store(self, filename: str) -> bool:
+        """Counts a load or a reload and marks the file as most recently used. True if it was cached."""
+        if filename in self._lru:
+            self._lru.move_to_end(filename)
+            self.reloads += 1
+            return True
+        self.loads += 1
+        return False
+
+    def _set_segment(self, filename: str, segment: str):
+        previous = self._file_segments.get(filename)
+        if previous is not None:
+            self._chars -= len(previous) + 1
+        self._file_segments[filename] = segment # Keeps its place when replaced
+        self._chars += len(segment) + 1
+        self._version_clock += 1
+        self.versions[filename] = self._version_clock
+
+    def _drop_segment(self, filename: str):
+        segment = self._file_segments.pop(filename, None)
+        if segment is not None:
+            self._chars -= len(segment) + 1
+        self.versions.pop(filename, None)
+
+    def _forget(self, filename: str):
+        """Drops every trace of a file (content, stub, LRU entry)."""
+        if filename in self.files:
+            del self.files[filename]
+            self._file_bytes -= self._lru.pop(filename)
+        self.evicted.pop(filename, None)
+        self._drop_segment(filename)
+
+    def _add_stub(self, filename: str, size: int):
+        self.evicted[filename] = size
+        self._set_segment(filename, f"{filename}: [evicted from context: {size} bytes, use ReadFile to load it again]")
+
+    def _evict_over_budget(self):
+        """Evicts least recently used files until the budget fits. The most recent file is always kept."""
+        if self.max_file_bytes is None:
+            return
+        while self._file_bytes > self.max_file_bytes and len(self._lru) > 1:
+            filename, size = self._lru.popitem(last=False)
+            del self.files[filename]
+            self._file_bytes -= size
+            self.evictions += 1
+            if self.evict_to_stub:
+                self._add_stub(filename, size)
+                if len(self.evicted) > MAX_EVICTED_STUBS:
+                    oldest, _ = self.evicted.popitem(last=False)
+                    self._drop_segment(oldest)
+            else:
+                self._drop_segment(filename)
+        self._mark_files_dirty()
+
+    @synchronized
     def add_file(self, filename: str, content: str): # Add type hints
+        if self._store_file(filename, content) and self.journal is not None:
+            self.journal.record_file(filename, content)
+
+    def _store_file(self, filename: str, content: str) -> bool:
+        """add_file() without telling the journal. Returns False if the content was already cached."""
+        was_cached = self._record_store(filename)
+        if was_cached and self.files[filename] == content:
+            return False # Nothing changed, keep the cached segments
+        if was_cached:
+            self._file_bytes -= self._lru[filename]
+        self.evicted.pop(filename, None)
         self.files[filename] = content
+        self._lru[filename] = len(content)
+        self._file_bytes += len(content)
+        self._set_segment(filename, f"{filename}: {content}")
+        self._mark_files_dirty()
+        self._evict_over_budget()
+        if self.watcher is not None:
+            self.watcher.track(filename) # The disk state this content was read from is the reference
+        return True
 
+    @synchronized
     def rename_file(self, old_filename: str, new_filename: str): # Add type hints
         # Add check to prevent KeyError if old_filename doesn't exist
         if old_filename in self.files:
-            self.files[new_filename] = self.files.pop(old_filename)
+            content = self.files[old_filename]
+            self._forget(old_filename)
+            self._store_file(new_filename, content)
+            self._mark_files_dirty()
+        elif old_filename in self.evicted:
+            size = self.evicted[old_filename]
+            self._forget(old_filename)
+            self._forget(new_filename)
+            self._add_stub(new_filename, size)
+            self._mark_files_dirty()
         else:
             print(f"Warning: File '{old_filename}' not found for renaming.")
+            return
+        if self.journal is not None:
+            self.journal.record_rename(old_filename, new_filename)
 
 
+    @synchronized
     def delete_file(self, filename: str): # Add type hints
         # Use pop with a default or check existence to avoid KeyError
-        if filename in self.files:
-            del self.files[filename]
-            # Or use: self.files.pop(filename, None) # Removes if exists, does nothing otherwise
+        if filename in self._file_segments:
+            self._forget(filename)
+            self._mark_files_dirty()
+            if self.journal is not None:
+                self.journal.record_delete(filename)
         else:
              print(f"Warning: File '{filename}' not found for deletion.")
+
+    @synchronized
+    def cache_stats(self) -> Dict[str, float]:
+        """Returns load/reload/eviction counters and rates for the file cache (per add_file())."""
+        stores = self.loads + self.reloads
+        return {
+            "files": len(self.files),
+            "evicted_stubs": len(self.evicted),
+            "bytes": self._file_bytes,
+            "max_bytes": self.max_file_bytes or 0,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "reload_rate": self.reloads / stores if stores else 0.0,
+            "eviction_rate": self.evictions / stores if stores else 0.0,
+        }
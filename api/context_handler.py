@@ -1,8 +1,43 @@
 # api/context_handler.py
-from .context import Context
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 
-context = Context()
+from .session import Session
+
+# The session the current task works for. Tasks (and the tool calls the agent
+# SDK gathers) inherit it, so concurrent conversations never share state.
+# Without a server every call falls back to the process-wide default session.
+default_session = Session("default")
+current_session: ContextVar[Session] = ContextVar("opencoder_session", default=default_session)
+
+def get_session():
+    return current_session.get()
+
+def set_session(session: Session) -> Token:
+    return current_session.set(session)
+
+def reset_session(token: Token):
+    current_session.reset(token)
+
+@contextmanager
+def use_session(session: Session):
+    token = set_session(session)
+    try:
+        yield session
+    finally:
+        reset_session(token)
 
 def get_context():
-    global context
-    return context
\ No newline at end of file
+    return get_session().context
+
+def get_tree_index():
+    return get_session().tree_index
+
+def get_watcher():
+    return get_session().watcher
+
+def get_shell_session():
+    return get_session().shell_session
+
+def resolve_path(path: str) -> str:
+    return get_session().resolve_path(path)
@@ -0,0 +1,504 @@
+# api/coordinator.py
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .session import Session
+from .tree_index import IGNORED_NAMES
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_WORKERS = 4
+TODO_FILENAME = "todo.md"           # Same file as the ReadTODO/WriteTODO tools; workers never merge changes to it
+BRANCH_PREFIX = "opencoder/run-"    # Integration branch; task branches get a "-task-<n>" suffix
+COPY_IGNORED = IGNORED_NAMES | {".opencoder"} # Not copied into scratch workspaces
+
+CHECKBOX = re.compile(r"^(?P<indent>\s*)(?:[-*+]|\d+[.)])\s+\[(?P<mark>[ xX])\]\s+(?P<text>.*?)\s*$")
+HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+TASK_TAG = re.compile(r"(?:^|\s)#([A-Za-z][\w-]*)")
+AFTER = re.compile(r"\s*\((?:after|depends on):\s*([^)]*)\)", re.IGNORECASE)
+
+
+class CoordinatorError(Exception):
+    """The checklist or a workspace operation is unusable; nothing was merged."""
+
+
+class MergeConflict(Exception):
+    """A task's changes could not be merged into the integration workspace."""
+
+
+@dataclass
+class Task():
+    number: int                    # 1-based position among the checklist items
+    line: int                      # 0-based line of the item in todo.md
+    text: str                      # Item text without the dependency annotation
+    done: bool
+    section: int = 0               # Index of the heading the item is under
+    tag: Optional[str] = None      # "#name" given in the text, to refer to the task
+    after: List[str] = field(default_factory=list)    # Raw references from "(after: ...)"
+    details: List[str] = field(default_factory=list)  # Indented lines under the item
+    deps: Set[int] = field(default_factory=set)       # Resolved task numbers
+
+
+def parse_todo(text: str) -> List[Task]:
+    """
+    Checklist items ("- [ ] ...", "- [x] ...", "1. [ ] ...") of todo.md as tasks.
+    Indented lines under an item are its details. An item depends on the items
+    named in "(after: 2, #parser)" (numbers or #tags), and on every item under
+    the previous heading: headings are barriers, items under one heading run
+    concurrently. Raises CoordinatorError on unknown references and cycles.
+    """
+    tasks: List[Task] = []
+    base_indent: Optional[int] = None
+    section = 0
+    for line_number, line in enumerate(text.splitlines()):
+        if HEADING.match(line):
+            if tasks and tasks[-1].section == section:
+                section += 1
+            continue
+        match = CHECKBOX.match(line)
+        indent = len(line) - len(line.lstrip())
+        if match and (base_indent is None or indent <= base_indent):
+            base_indent = indent if base_indent is None else base_indent
+            body = match.group("text")
+            after = []
+            for annotation in AFTER.findall(body):
+                after.extend(ref.strip() for ref in annotation.split(",") if ref.strip())
+            body = AFTER.sub("", body).strip()
+            tag = TASK_TAG.search(body)
+            tasks.append(Task(len(tasks) + 1, line_number, body, match.group("mark") != " ", section,
+                              tag.group(1) if tag else None, after))
+        elif tasks and line.strip() and indent > (base_indent or 0):
+            tasks[-1].details.append(line.strip())
+    _resolve(tasks)
+    return tasks
+
+
+def _resolve(tasks: List[Task]):
+    by_tag = {task.tag: task.number for task in tasks if task.tag}
+    by_section: Dict[int, List[int]] = {}
+    for task in tasks:
+        by_section.setdefault(task.section, []).append(task.number)
+    sections = sorted(by_section)
+    for task in tasks:
+        for ref in task.after:
+            name = ref.lstrip("#")
+            if name.isdigit() and 1 <= int(name) <= len(tasks):
+                task.deps.add(int(name))
+            elif name in by_tag:
+                task.deps.add(by_tag[name])
+            else:
+                raise CoordinatorError(f"Item {task.number} ({task.text[:40]!r}) depends on unknown item '{ref}'")
+        position = sections.index(task.section)
+        if position > 0:
+            task.deps.update(by_section[sections[position - 1]])
+        task.deps.discard(task.number)
+    # Cycle check (depth-first, iterative)
+    state: Dict[int, int] = {} # 1: visiting, 2: done
+    deps = {task.number: task.deps for task in tasks}
+    for start in deps:
+        if state.get(start):
+            continue
+        state[start] = 1
+        stack = [(start, iter(deps[start]))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                stack.pop()
+            elif state.get(child) == 1:
+                raise CoordinatorError(f"Dependency cycle through item {child}")
+            elif state.get(child) is None:
+                state[child] = 1
+                stack.append((child, iter(deps[child])))
+
+
+def mark_done(text: str, tasks: List[Task]) -> str:
+    """todo.md with the given tasks checked. Lines are split as in parse_todo(), so Task.line matches."""
+    lines = text.splitlines(keepends=True)
+    for task in tasks:
+        lines[task.line] = re.sub(r"\[ \]", "[x]", lines[task.line], count=1)
+    return "".join(lines)
+
+
+def task_prompt(task: Task, tasks: List[Task]) -> str:
+    """What a worker agent is asked: one item, with the items it builds on for context."""
+    parts = [
+        "You are one of several workers completing a todo list in parallel, each in its own copy of the repository.",
+        f"Complete only this item, without asking for confirmation:\n{task.text}",
+    ]
+    if task.details:
+        parts.append("Details:\n" + "\n".join(task.details))
+    finished = [t for t in tasks if t.number in task.deps]
+    if finished:
+        parts.append("Already done (their changes are in your copy):\n" + "\n".join(f"- {t.text}" for t in finished))
+    parts.append(f"Do not edit {TODO_FILENAME}; the coordinator checks the item off. "
+                 "End with a short summary of what you changed.")
+    return "\n\n".join(parts)
+
+
+# --- Workspaces ---
+
+async def _run(*command: str, cwd: str, check: bool = True) -> str:
+    process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    if check and process.returncode != 0:
+        raise CoordinatorError(f"{' '.join(command[:3])} failed: {stderr.decode(errors='replace').strip()}")
+    return stdout.decode(errors="replace").strip()
+
+
+class GitWorkspaces():
+    """
+    One git worktree per task, branched from the integration branch (base:
+    HEAD), so a task sees the merged work of the tasks it depends on. Finished
+    tasks are committed and merged (--no-ff) into the integration branch, one
+    at a time; finish() merges that branch into the checked-out one.
+    Uncommitted changes of the main worktree are not seen by the workers.
+    """
+
+    def __init__(self, root: str, run_dir: str, run_id: str):
+        self.root = root
+        self.run_dir = run_dir
+        self.branch = f"{BRANCH_PREFIX}{run_id}"
+        self.integration = os.path.join(run_dir, "integration")
+        self._merge_lock = asyncio.Lock()
+        self._identity: List[str] = []
+
+    @staticmethod
+    async def available(root: str) -> bool:
+        try:
+            return await _run("git", "rev-parse", "--is-inside-work-tree", cwd=root) == "true" and \
+                bool(await _run("git", "rev-parse", "--verify", "HEAD", cwd=root))
+        except (CoordinatorError, OSError):
+            return False
+
+    async def setup(self):
+        if not await _run("git", "config", "user.email", cwd=self.root, check=False):
+            self._identity = ["-c", "user.name=opencoder", "-c", "user.email=opencoder@localhost"]
+        await _run("git", "worktree", "add", "-q", "-b", self.branch, self.integration, "HEAD", cwd=self.root)
+
+    def _task_branch(self, task: Task) -> str:
+        return f"{self.branch}-task-{task.number}"
+
+    async def checkout(self, task: Task) -> str:
+        path = os.path.join(self.run_dir, f"task-{task.number}")
+        async with self._merge_lock: # Branch from a tip no merge is writing
+            await _run("git", "worktree", "add", "-q", "-b", self._task_branch(task), path, self.branch, cwd=self.root)
+        return path
+
+    async def collect(self, task: Task, path: str) -> int:
+        """Commits the task's changes (except todo.md) on its branch. Returns the number of changed files."""
+        await _run("git", "add", "-A", "--", ".", ":(exclude).opencoder", cwd=path) # Not the worker's indexes
+        await _run("git", "reset", "-q", "--", TODO_FILENAME, cwd=path, check=False)
+        changed = await _run("git", "diff", "--cached", "--name-only", cwd=path)
+        if not changed:
+            return 0
+        await _run("git", *self._identity, "commit", "-q", "-m", f"Todo item {task.number}: {task.text}", cwd=path)
+        return len(changed.splitlines())
+
+    async def merge(self, task: Task):
+        async with self._merge_lock:
+            try:
+                await _run("git", *self._identity, "merge", "-q", "--no-ff", "--no-edit",
+                           "-m", f"Merge todo item {task.number}: {task.text}", self._task_branch(task), cwd=self.integration)
+            except CoordinatorError as e:
+                await _run("git", "merge", "--abort", cwd=self.integration, check=False)
+                raise MergeConflict(f"{e}; its changes are kept on branch {self._task_branch(task)}")
+
+    async def release(self, task: Task, path: str, keep: bool):
+        """Removes the task's worktree; its branch is kept when its work was not merged."""
+        await _run("git", "worktree", "remove", "--force", path, cwd=self.root, check=False)
+        if not keep:
+            await _run("git", "branch", "-q", "-D", self._task_branch(task), cwd=self.root, check=False)
+
+    async def finish(self, merge: bool) -> Tuple[bool, str]:
+        """Merges the results into the workspace. Returns (whether they are all in it now, note)."""
+        new_commits = await _run("git", "rev-list", "--count", f"HEAD..{self.branch}", cwd=self.root)
+        await _run("git", "worktree", "remove", "--force", self.integration, cwd=self.root, check=False)
+        if new_commits == "0":
+            await _run("git", "branch", "-q", "-D", self.branch, cwd=self.root, check=False)
+            return True, "no changes to merge"
+        if not merge:
+            return False, f"results kept on branch {self.branch}"
+        try:
+            await _run("git", *self._identity, "merge", "-q", "--no-edit", self.branch, cwd=self.root)
+        except CoordinatorError as e:
+            await _run("git", "merge", "--abort", cwd=self.root, check=False)
+            return False, f"could not merge {self.branch} into the current branch ({e}); results kept there"
+        await _run("git", "branch", "-q", "-d", self.branch, cwd=self.root, check=False)
+        return True, f"merged {self.branch} into the current branch"
+
+
+def _manifest(root: str) -> Dict[str, str]:
+    """relative path -> sha1 of the content, for every file outside COPY_IGNORED."""
+    files = {}
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = [d for d in subdirs if d not in COPY_IGNORED]
+        for name in names:
+            if name in COPY_IGNORED:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, root)] = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                continue
+    return files
+
+
+class CopyWorkspaces():
+    """
+    Scratch copies for trees that are not git repositories. Each task gets a
+    copy of the integration copy; its changes (compared by content hash with
+    what it started from) are applied to the integration copy unless that
+    copy changed the same files meanwhile. finish() writes the integration
+    changes back into the workspace, skipping files edited there during the run;
+    without merging, the integration copy is moved out of run_dir and kept.
+    """
+
+    def __init__(self, root: str, run_dir: str, run_id: str):
+        self.root = root
+        self.run_dir = run_dir
+        self.run_id = run_id
+        self.integration = os.path.join(run_dir, "integration")
+        self._base: Dict[str, str] = {}
+        self._started: Dict[int, Dict[str, str]] = {}
+        self._changes: Dict[int, Dict[str, Optional[str]]] = {} # rel -> new hash (None: deleted)
+        self._merge_lock = asyncio.Lock()
+
+    @staticmethod
+    def _copy(source: str, dest: str):
+        shutil.copytree(source, dest, symlinks=True, ignore=shutil.ignore_patterns(*COPY_IGNORED))
+
+    async def setup(self):
+        await asyncio.to_thread(self._copy, self.root, self.integration)
+        self._base = await asyncio.to_thread(_manifest, self.integration)
+
+    async def checkout(self, task: Task) -> str:
+        path = os.path.join(self.run_dir, f"task-{task.number}")
+        async with self._merge_lock:
+            await asyncio.to_thread(self._copy, self.integration, path)
+            self._started[task.number] = await asyncio.to_thread(_manifest, path)
+        return path
+
+    async def collect(self, task: Task, path: str) -> int:
+        before, after = self._started[task.number], await asyncio.to_thread(_manifest, path)
+        changes = {rel: digest for rel, digest in after.items() if before.get(rel) != digest}
+        changes.update({rel: None for rel in before if rel not in after})
+        changes.pop(TODO_FILENAME, None)
+        self._changes[task.number] = changes
+        return len(changes)
+
+    async def merge(self, task: Task):
+        path = os.path.join(self.run_dir, f"task-{task.number}")
+        changes, before = self._changes.get(task.number, {}), self._started[task.number]
+        async with self._merge_lock:
+            current = await asyncio.to_thread(_manifest, self.integration)
+            clashes = [rel for rel, digest in changes.items() if current.get(rel) not in (before.get(rel), digest)]
+            if clashes:
+                raise MergeConflict(f"changed meanwhile by another item: {', '.join(sorted(clashes)[:5])}")
+            await asyncio.to_thread(self._apply, path, self.integration, changes)
+
+    @staticmethod
+    def _apply(source: str, dest: str, changes: Dict[str, Optional[str]]):
+        for rel, digest in changes.items():
+            target = os.path.join(dest, rel)
+            if digest is None:
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(os.path.join(source, rel), target)
+
+    async def release(self, task: Task, path: str, keep: bool):
+        await asyncio.to_thread(shutil.rmtree, path, True)
+
+    async def finish(self, merge: bool) -> Tuple[bool, str]:
+        """Copies the results back into the workspace. Returns (whether they are all in it now, note)."""
+        final = await asyncio.to_thread(_manifest, self.integration)
+        changes = {rel: digest for rel, digest in final.items() if self._base.get(rel) != digest}
+        changes.update({rel: None for rel in self._base if rel not in final})
+        if not changes:
+            return True, "no changes to merge"
+        if not merge: # run_dir is deleted when the run ends
+            kept = os.path.join(tempfile.gettempdir(), f"opencoder_results_{self.run_id}")
+            await asyncio.to_thread(shutil.move, self.integration, kept)
+            return False, f"results kept in {kept}"
+        workspace = await asyncio.to_thread(_manifest, self.root)
+        skipped = [rel for rel in changes if workspace.get(rel) != self._base.get(rel)]
+        await asyncio.to_thread(self._apply, self.integration, self.root,
+                                {rel: digest for rel, digest in changes.items() if rel not in skipped})
+        note = f", skipped {len(skipped)} file(s) edited during the run: {', '.join(sorted(skipped)[:5])}" if skipped else ""
+        return not skipped, f"copied {len(changes) - len(skipped)} changed file(s) back{note}"
+
+
+# --- Coordinator ---
+
+@dataclass
+class TaskResult():
+    task: Task
+    status: str          # "done", "failed", "conflict" or "blocked"
+    duration: float = 0.0
+    files_changed: int = 0
+    output: str = ""
+
+
+@dataclass
+class CoordinatorReport():
+    results: List[TaskResult]
+    workers: int
+    isolation: str
+    makespan: float      # Wall-clock time of the whole run (setup and merges included)
+    serial: float        # Sum of the task times: one worker doing them in order
+    critical_path: float # Longest chain of dependent task times: the best any number of workers can do
+    merge_note: str = ""
+
+    def describe(self) -> str:
+        lines = [f"[{r.status:>8}] {r.task.number}. {r.task.text[:70]} ({r.duration:.1f}s, {r.files_changed} file(s))"
+                 for r in self.results]
+        speedup = self.serial / self.makespan if self.makespan else 0.0
+        lines.append(f"{self.workers} worker(s), {self.isolation} isolation: makespan {self.makespan:.1f}s, "
+                     f"serial {self.serial:.1f}s (x{speedup:.2f}), critical path {self.critical_path:.1f}s")
+        if self.merge_note:
+            lines.append(self.merge_note)
+        return "\n".join(lines)
+
+
+RunTask = Callable[[Session, Task, str], Awaitable[str]]
+
+
+class Coordinator():
+    """
+    Runs the unchecked items of todo.md with up to `workers` agents at once,
+    each in its own Session (context, tree index, shell) rooted in an isolated
+    workspace: a git worktree when `root` is a git repository, else a scratch
+    copy ("auto"). An item starts once the items it depends on are merged;
+    an item whose dependency failed is reported as blocked. Merged items are
+    checked off in todo.md once the results are all merged back.
+
+    `run_task(session, task, prompt)` does the work of one item; by default
+    an AgentRunner of `agent` runs the prompt.
+    """
+
+    def __init__(self, root: str, agent=None, workers: int = DEFAULT_WORKERS, isolation: str = "auto",
+                 run_task: Optional[RunTask] = None, merge: bool = True):
+        if run_task is None and agent is None:
+            raise ValueError("Coordinator needs an agent or a run_task")
+        self.root = os.path.abspath(root)
+        self.agent = agent
+        self.workers = max(1, workers)
+        self.isolation = isolation
+        self.run_task = run_task or self._run_agent
+        self.merge = merge
+
+    async def _run_agent(self, session: Session, task: Task, prompt: str) -> str:
+        from .agent_runner import AgentRunner # Deferred: keeps parsing and the benchmarks free of the agents SDK
+        return await AgentRunner(self.agent, session).run(prompt)
+
+    async def _workspaces(self, run_dir: str, run_id: str):
+        use_git = self.isolation == "worktree" or (self.isolation == "auto" and await GitWorkspaces.available(self.root))
+        if self.isolation == "worktree" and not await GitWorkspaces.available(self.root):
+            raise CoordinatorError(f"'{self.root}' is not a git repository with a commit")
+        return (GitWorkspaces if use_git else CopyWorkspaces)(self.root, run_dir, run_id), ("worktree" if use_git else "copy")
+
+    async def _run_item(self, workspaces, task: Task, tasks: List[Task]) -> TaskResult:
+        started = time.perf_counter()
+        try:
+            path = await workspaces.checkout(task)
+        except CoordinatorError as e:
+            return TaskResult(task, "failed", time.perf_counter() - started, 0, str(e))
+        session = Session(f"todo-{task.number}", root=path)
+        status, output, files = "done", "", 0
+        try:
+            output = await self.run_task(session, task, task_prompt(task, tasks))
+        except Exception as e:
+            logger.exception(f"Todo item {task.number} failed:")
+            status, output = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            await session.close()
+        try:
+            if status == "done":
+                files = await workspaces.collect(task, path)
+                if files:
+                    await workspaces.merge(task)
+        except MergeConflict as e:
+            status, output = "conflict", str(e)
+        finally:
+            await workspaces.release(task, path, keep=status != "done")
+        return TaskResult(task, status, time.perf_counter() - started, files, output)
+
+    async def run(self, todo_path: Optional[str] = None) -> CoordinatorReport:
+        todo_path = todo_path or os.path.join(self.root, TODO_FILENAME)
+        with open(todo_path, "r", encoding="utf-8") as f:
+            todo_text = f.read()
+        tasks = parse_todo(todo_text)
+        started = time.perf_counter()
+        run_id = uuid.uuid4().hex[:8]
+        run_dir = tempfile.mkdtemp(prefix=f"opencoder_run_{run_id}_")
+        workspaces, isolation = await self._workspaces(run_dir, run_id)
+        results: Dict[int, TaskResult] = {}
+        try:
+            await workspaces.setup()
+            finished = {task.number for task in tasks if task.done}
+            pending = {task.number: task for task in tasks if not task.done}
+            running: Dict[asyncio.Task, Task] = {}
+            while pending or running:
+                blocked = True
+                while blocked: # Until nothing changes: an item may depend on a later item blocked in this pass
+                    blocked = False
+                    for number, task in list(pending.items()):
+                        if any(dep in results and results[dep].status != "done" for dep in task.deps):
+                            results[number] = TaskResult(task, "blocked", output="a dependency did not complete")
+                            del pending[number]
+                            blocked = True
+                ready = [task for task in pending.values() if task.deps <= finished]
+                for task in ready[:self.workers - len(running)]:
+                    del pending[task.number]
+                    running[asyncio.create_task(self._run_item(workspaces, task, tasks))] = task
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    del running[future]
+                    results[result.task.number] = result
+                    if result.status == "done":
+                        finished.add(result.task.number)
+            for number, task in pending.items(): # Never became ready; parse_todo() rules out cycles, so defensive
+                results[number] = TaskResult(task, "blocked", output="its dependencies never completed")
+            merged, merge_note = await workspaces.finish(self.merge)
+            if self.merge and merged: # Only once every result is in the workspace
+                completed = [results[n].task for n in sorted(results) if results[n].status == "done"]
+                if completed:
+                    with open(todo_path, "w", encoding="utf-8") as f:
+                        f.write(mark_done(todo_text, completed))
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        ordered = [results[n] for n in sorted(results)]
+        return CoordinatorReport(ordered, self.workers, isolation, time.perf_counter() - started,
+                                 sum(r.duration for r in ordered), _critical_path(tasks, results), merge_note)
+
+
+def _critical_path(tasks: List[Task], results: Dict[int, TaskResult]) -> float:
+    longest: Dict[int, float] = {}
+    for task in tasks: # Dependencies may come later in the file, so resolve recursively
+        _longest(task.number, {t.number: t for t in tasks}, results, longest)
+    return max(longest.values(), default=0.0)
+
+
+def _longest(number: int, tasks: Dict[int, Task], results: Dict[int, TaskResult], memo: Dict[int, float]) -> float:
+    if number not in memo:
+        own = results[number].duration if number in results else 0.0
+        memo[number] = own + max((_longest(dep, tasks, results, memo) for dep in tasks[number].deps), default=0.0)
+    return memo[number]
@@ -0,0 +1,157 @@
+# api/file_reader.py
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# --- Configuration ---
+MMAP_THRESHOLD = 1024 * 1024   # Files at least this big are memory-mapped instead of read()
+MAX_READ_BYTES = 256 * 1024    # Largest slice returned (and cached) in one call
+PREVIEW_LINES = 40             # Lines shown from the head and from the tail of oversized files
+PREVIEW_BYTES = 8 * 1024       # ...but never more than this many bytes from each end
+BINARY_SNIFF_BYTES = 8192      # A NUL byte in this prefix marks the file as binary
+SCAN_CHUNK = 1024 * 1024       # Chunk size used to count/locate lines without copying the whole file
+
+
+@dataclass
+class FileSlice():
+    content: str           # Text returned to the model (the slice, a preview or a notice)
+    label: Optional[str]   # None for a complete read, otherwise e.g. "lines 10-20", "preview"
+    size: int              # Total size of the file in bytes
+    is_binary: bool = False
+
+
+def slice_key(filepath: str, label: Optional[str]) -> str:
+    """Context key for a read: the plain path for whole files, `path [label]` for slices."""
+    return filepath if label is None else f"{filepath} [{label}]"
+
+
+def split_slice_key(key: str) -> Tuple[str, Optional[str]]:
+    """Inverse of slice_key()."""
+    if key.endswith("]") and " [" in key:
+        path, label = key.rsplit(" [", 1)
+        return path, label[:-1]
+    return key, None
+
+
+def _open_buffer(f, size: int):
+    """Returns a bytes-like view of the file: mmap for big files, bytes otherwise."""
+    if size >= MMAP_THRESHOLD:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return f.read()
+
+
+def _count_lines(buffer, size: int) -> int:
+    lines = 0
+    for start in range(0, size, SCAN_CHUNK):
+        lines += buffer[start:start + SCAN_CHUNK].count(b"\n")
+    if size and buffer[size - 1:size] != b"\n":
+        lines += 1 # Last line without a trailing newline
+    return lines
+
+
+def _line_offset(buffer, size: int, line: int) -> int:
+    """Byte offset where 1-based `line` starts (size if the file has fewer lines)."""
+    remaining = line - 1
+    start = 0
+    while remaining > 0 and start < size:
+        chunk = buffer[start:start + SCAN_CHUNK]
+        newlines = chunk.count(b"\n")
+        if newlines < remaining:
+            remaining -= newlines
+            start += len(chunk)
+            continue
+        position = -1
+        for _ in range(remaining):
+            position = chunk.find(b"\n", position + 1)
+        return start + position + 1
+    return size if remaining > 0 else start
+
+
+def _tail_offset(buffer, size: int, lines: int) -> int:
+    """Byte offset where the last `lines` lines start, looking only at the end of the file."""
+    chunk_start = max(0, size - SCAN_CHUNK)
+    chunk = buffer[chunk_start:size]
+    position = len(chunk) - 1 if chunk.endswith(b"\n") else len(chunk)
+    for _ in range(lines):
+        position = chunk.rfind(b"\n", 0, position)
+        if position < 0:
+            return chunk_start
+    return chunk_start + position + 1
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _cap(text_bytes: bytes, label: str) -> Tuple[str, str]:
+    if len(text_bytes) <= MAX_READ_BYTES:
+        return _decode(text_bytes), label
+    return (_decode(text_bytes[:MAX_READ_BYTES]) + f"\n[... slice truncated at {MAX_READ_BYTES} bytes]",
+            f"{label}, truncated")
+
+
+def _slice_buffer(buffer, size: int, start_line: Optional[int], end_line: Optional[int],
+                  start_byte: Optional[int], end_byte: Optional[int]) -> FileSlice:
+    if size == 0:
+        return FileSlice("", None, 0)
+    if b"\0" in buffer[:BINARY_SNIFF_BYTES]:
+        return FileSlice(f"[binary file: {size} bytes, content not shown]", "binary", size, is_binary=True)
+
+    if start_byte is not None or end_byte is not None:
+        start = max(0, start_byte or 0)
+        end = min(size, end_byte if end_byte is not None else size)
+        content, label = _cap(buffer[start:end], f"bytes {start}-{end}")
+        return FileSlice(content, label, size)
+
+    if start_line is not None or end_line is not None:
+        first = max(1, start_line or 1)
+        start = _line_offset(buffer, size, first)
+        if end_line is None:
+            end = size
+            label = f"lines {first}-end"
+        else:
+            end = _line_offset(buffer, size, max(first, end_line) + 1)
+            label = f"lines {first}-{end_line}"
+        content, label = _cap(buffer[start:end], label)
+        return FileSlice(content, label, size)
+
+    if size <= MAX_READ_BYTES:
+        return FileSlice(_decode(buffer[:size]), None, size)
+
+    # Oversized file without a range: head/tail preview
+    total_lines = _count_lines(buffer, size)
+    head_end = min(_line_offset(buffer, size, PREVIEW_LINES + 1), PREVIEW_BYTES)
+    tail_start = max(head_end, _tail_offset(buffer, size, PREVIEW_LINES), size - PREVIEW_BYTES)
+    content = (
+        f"[file too large to read at once: {size} bytes, {total_lines} lines. "
+        f"Showing the first and last {PREVIEW_LINES} lines; pass start_line/end_line "
+        f"or start_byte/end_byte to read a range]\n"
+        f"{_decode(buffer[:head_end])}"
+        f"\n[... {tail_start - head_end} bytes omitted ...]\n"
+        f"{_decode(buffer[tail_start:size])}"
+    )
+    return FileSlice(content, "preview", size)
+
+
+def read_file_slice(abs_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+                    start_byte: Optional[int] = None, end_byte: Optional[int] = None,
+                    data: Optional[bytes] = None) -> FileSlice:
+    """
+    Reads a file, or a line/byte range of it, without loading more than needed.
+
+    Large files are memory-mapped. Binary files only return a notice. Files
+    larger than MAX_READ_BYTES read without a range come back as a head/tail
+    preview with size and line count. With `data` (the whole file, e.g. a
+    prefetched copy) nothing is read from disk. Raises OSError like open() does.
+    """
+    if data is not None:
+        return _slice_buffer(data, len(data), start_line, end_line, start_byte, end_byte)
+    size = os.path.getsize(abs_path)
+    with open(abs_path, "rb") as f:
+        buffer = _open_buffer(f, size)
+        try:
+            return _slice_buffer(buffer, size, start_line, end_line, start_byte, end_byte)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
@@ -0,0 +1,198 @@
+# api/history.py
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .tokens import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_HISTORY_TOKENS = 32000 # Message history budget (OPENCODER_HISTORY_TOKENS, 0 turns compaction off)
+COMPACT_TO = 0.6               # Compaction goes down to this share of the budget, so it does not run every turn
+KEEP_RECENT_TURNS = 3          # Latest turns never compacted
+SUMMARY_CHARS = 160            # Kept from the question and from the answer of a summarized turn
+SUMMARY_SHARE = 0.25           # Oldest summary lines are dropped past this share of the budget (their count is kept)
+ERROR_OUTPUT_CHARS = 120       # Kept from the output of a collapsed failed tool record
+
+TOOL_RECORD_PREFIX = "system: Tool: "
+SUMMARY_PREFIX = "system: Summary of earlier turns"
+
+
+def is_tool_record(message: str) -> bool:
+    return message.startswith(TOOL_RECORD_PREFIX)
+
+
+def collapse_tool_record(message: str) -> str:
+    """One status line for an announce_execution_output() record: tool, action, status (and the error, shortened)."""
+    fields = {}
+    for line in message[len("system: "):].split("\n", 3):
+        name, _, value = line.partition(": ")
+        fields.setdefault(name, value)
+    status = fields.get("Status", "?")
+    line = f"{TOOL_RECORD_PREFIX}{fields.get('Tool', '?')} | {fields.get('Action', '')} | {status}"
+    if status != "success" and fields.get("Output"):
+        line += f": {_shorten(fields['Output'], ERROR_OUTPUT_CHARS)}"
+    return line
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def split_turns(messages: List[str]) -> List[List[str]]:
+    """Groups messages into turns, each starting at a user message (what comes before the first one is a turn too)."""
+    turns: List[List[str]] = []
+    for message in messages:
+        if message.startswith("user: ") or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def summarize_turn(turn: List[str]) -> str:
+    """One line for a turn: the question, the answer and the tools it used."""
+    question = next((m[len("user: "):] for m in turn if m.startswith("user: ")), "")
+    answers = [m.partition(": ")[2] for m in turn if not m.startswith("user: ") and not is_tool_record(m)]
+    tools = Counter(m[len(TOOL_RECORD_PREFIX):].split("\n", 1)[0].split(" | ", 1)[0] for m in turn if is_tool_record(m))
+    errors = sum(1 for m in turn if is_tool_record(m) and ("Status: error" in m or " | error" in m))
+    line = f"- {_shorten(question, SUMMARY_CHARS)!r} -> {_shorten(answers[-1], SUMMARY_CHARS) if answers else '(no answer)'}"
+    if tools:
+        line += " [tools: " + ", ".join(f"{name} x{count}" for name, count in tools.most_common())
+        line += f", {errors} failed]" if errors else "]"
+    return line
+
+
+def _parse_summary(message: str):
+    """(lines, omitted turns) of a summary message."""
+    header, _, body = message.partition("\n")
+    omitted = 0
+    if "+" in header:
+        try:
+            omitted = int(header.rsplit("+", 1)[1].split()[0])
+        except ValueError:
+            pass
+    return [line for line in body.split("\n") if line], omitted
+
+
+def _render_summary(lines: List[str], omitted: int) -> str:
+    header = f"{SUMMARY_PREFIX} ({len(lines)} shown" + (f", +{omitted} older omitted" if omitted else "") + "):"
+    return "\n".join([header] + lines)
+
+
+def compact_messages(messages: List[str], budget: int, counter: TokenCounter,
+                     target: float = COMPACT_TO, keep_recent: int = KEEP_RECENT_TURNS) -> Optional[List[str]]:
+    """
+    A shorter history when `messages` is over `budget` tokens, else None.
+    Turns older than the last `keep_recent` first lose their tool outputs
+    (each record collapsed to a status line); if that is not enough, the
+    oldest turns are rolled, one at a time, into a summary message at the
+    start, until the history fits in `target` of the budget.
+    """
+    if counter.total(messages) <= budget:
+        return None
+    original = messages
+    goal = budget * target
+    summary_lines, omitted = [], 0
+    if messages and messages[0].startswith(SUMMARY_PREFIX):
+        summary_lines, omitted = _parse_summary(messages[0])
+        messages = messages[1:]
+    turns = split_turns(messages)
+    old_count = max(0, len(turns) - keep_recent)
+    turns = [[collapse_tool_record(m) if is_tool_record(m) else m for m in turn] if i < old_count else turn
+             for i, turn in enumerate(turns)]
+
+    def assemble() -> List[str]:
+        nonlocal omitted
+        head = []
+        if summary_lines:
+            summary = _render_summary(summary_lines, omitted)
+            while len(summary_lines) > 1 and counter.count(summary) > budget * SUMMARY_SHARE:
+                drop = max(1, len(summary_lines) // 4)
+                del summary_lines[:drop]
+                omitted += drop
+                summary = _render_summary(summary_lines, omitted)
+            head = [summary]
+        return head + [m for turn in turns for m in turn]
+
+    compacted = assemble()
+    while old_count > 0 and counter.total(compacted) > goal:
+        summary_lines.append(summarize_turn(turns.pop(0)))
+        old_count -= 1
+        compacted = assemble()
+    return compacted if compacted != original else None # Only recent turns: nothing to compact
+
+
+class HistoryCompactor():
+    """
+    Keeps a session's message history within a token budget. After each turn
+    schedule() starts a background task: the messages are snapshotted, the
+    compacted history is computed on a worker thread, and it replaces the
+    snapshotted prefix only if nothing rewrote it meanwhile (messages added
+    since then are kept). Turns never wait for it.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        if budget is None:
+            budget = int(os.getenv("OPENCODER_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS))
+        self.budget = budget
+        self.counter = TokenCounter()
+        self._task: Optional[asyncio.Task] = None
+        self.compactions = 0
+        self.tokens_saved = 0
+        self.last_tokens = 0 # History size seen by the last check
+
+    def schedule(self, context, session_id: Optional[str] = None):
+        if self.budget <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(context, session_id))
+
+    async def _run(self, context, session_id: Optional[str]):
+        started = time.perf_counter()
+        with context.lock:
+            snapshot = list(context.messages)
+        try:
+            compacted = await asyncio.to_thread(compact_messages, snapshot, self.budget, self.counter)
+        except Exception:
+            logger.exception("History compaction failed:")
+            return
+        self.last_tokens = self.counter.total(snapshot)
+        if compacted is None or not context.replace_history(snapshot, compacted):
+            return
+        from .metrics import MetricEvent, get_metrics # Deferred: api.metrics imports the session module
+        after = self.counter.total(compacted)
+        self.compactions += 1
+        self.tokens_saved += self.last_tokens - after
+        self.counter.retain(compacted)
+        get_metrics().emit(MetricEvent(
+            kind="history",
+            name="compact",
+            status="success",
+            duration=time.perf_counter() - started,
+            session_id=session_id,
+            extra={"tokens_before": self.last_tokens, "tokens_after": after,
+                   "messages_before": len(snapshot), "messages_after": len(compacted), "exact": self.counter.exact},
+        ))
+        self.last_tokens = after
+
+    async def wait(self):
+        """Waits for a running compaction (tests, shutdown)."""
+        if self._task is not None:
+            await self._task
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "budget": self.budget,
+            "history_tokens": self.last_tokens,
+            "compactions": self.compactions,
+            "tokens_saved": self.tokens_saved,
+            "exact_tokens": self.counter.exact,
+        }
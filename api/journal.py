@@ -0,0 +1,368 @@
+# api/journal.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+from .file_reader import MAX_READ_BYTES, read_file_slice, split_slice_key
+from .tree_index import TREE_KEY_PREFIX, TreeIndex
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_JOURNAL_DIR = os.path.join(".opencoder", "sessions")
+COMPACT_EVERY_OPS = 1000           # Operations appended before the journal is folded into a snapshot
+COMPACT_EVERY_BYTES = 8 * 1024 * 1024 # ...or journal size, whichever comes first
+SNAPSHOT_NAME = "snapshot.json"
+JOURNAL_NAME = "journal.jsonl"
+BLOB_GRACE_SECONDS = 300           # Unreferenced blobs younger than this are kept (another journal may be writing them)
+
+
+def _write_atomic(path: str, data: bytes):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class BlobStore():
+    """Content-addressed file contents (sha256), shared by every session journal in a directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, content: str) -> str:
+        data = content.encode("utf-8", errors="surrogatepass")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            os.utime(path) # Unchanged files are stored once; a fresh mtime keeps prune() off it
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, data)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read().decode("utf-8", errors="surrogatepass")
+        except OSError:
+            return None
+
+    def prune(self, referenced: Set[str], grace: float = BLOB_GRACE_SECONDS) -> int:
+        """Deletes blobs not in `referenced` and untouched for `grace` seconds. Returns how many were deleted."""
+        deleted = 0
+        cutoff = time.time() - grace
+        try:
+            prefixes = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for prefix in prefixes:
+            try:
+                entries = list(os.scandir(os.path.join(self.directory, prefix)))
+            except NotADirectoryError:
+                continue
+            for entry in entries:
+                if entry.name in referenced or entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+        return deleted
+
+
+def referenced_blobs(session_dir: str) -> Set[str]:
+    """Blob digests a session directory's snapshot and journal refer to."""
+    digests: Set[str] = set()
+    try:
+        with open(os.path.join(session_dir, SNAPSHOT_NAME), "r", encoding="utf-8") as f:
+            digests.update(record["blob"] for record in json.load(f)["files"])
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        with open(os.path.join(session_dir, JOURNAL_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                if op.get("op") == "file":
+                    digests.add(op["blob"])
+    except OSError:
+        pass
+    return digests
+
+
+class SessionJournal():
+    """
+    Append-only log of everything a Context goes through, so a session can be
+    resumed after the process exits.
+
+    Every message, cached file, deletion and rename is appended to
+    journal.jsonl as one small JSON line (file contents go to the blob store by
+    hash, the line only holds the hash plus the file's mtime and size). Every
+    COMPACT_EVERY_OPS operations, and on close(), the folded state is written to
+    snapshot.json and the journal is truncated. Lines carry a sequence number,
+    so a crash between the two steps only replays what the snapshot lacks.
+
+    restore() rebuilds a Context from snapshot + journal. Files whose mtime and
+    size still match are loaded from their blob; changed whole files are read
+    again, changed slices are dropped and directory trees are re-rendered.
+
+    Context calls the record_*() methods under its lock, so they only queue
+    the operation: hashing, blob writes and journal lines happen in order on
+    one writer thread per journal (flush() waits for it). Each snapshot
+    prunes blobs no session journal in the directory refers to any more.
+    """
+
+    def __init__(self, directory: str, resolve_path: Callable[[str], str] = os.path.abspath,
+                 blob_dir: Optional[str] = None):
+        self.directory = directory
+        self.resolve_path = resolve_path
+        # Default: <dir>/sessions/<id> journals share <dir>/blobs
+        sessions_dir = os.path.dirname(os.path.abspath(directory))
+        self.blobs = BlobStore(blob_dir or os.path.join(os.path.dirname(sessions_dir), "blobs"))
+        self._prune = blob_dir is None # A given blob_dir may be shared with journals we cannot see
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+        # Folded state: what the next snapshot will contain
+        self.messages: List[str] = []
+        self.files: "OrderedDict[str, dict]" = OrderedDict() # key -> {blob, mtime_ns, size}, oldest first
+        self.seq = 0
+        self._ops_since_snapshot = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None # One thread: operations stay in order
+        self.pruned_blobs = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Loading ---
+
+    def load(self):
+        """Folds snapshot.json and the newer journal lines into self.messages / self.files."""
+        self.messages, self.files, self.seq = [], OrderedDict(), 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self.messages = snapshot["messages"]
+            self.files = OrderedDict((record.pop("key"), record) for record in snapshot["files"])
+            self.seq = snapshot["seq"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable snapshot '{self.snapshot_path}': {e}")
+        snapshot_seq = self.seq
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break # Torn last line from a crash mid-write
+                    if op["seq"] <= snapshot_seq:
+                        continue # Already folded into the snapshot
+                    self._apply(op)
+                    self.seq = op["seq"]
+                    self._ops_since_snapshot += 1
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, op: dict):
+        kind = op["op"]
+        if kind == "message":
+            self.messages.append(op["text"])
+        elif kind == "history": # The first `count` messages were compacted
+            self.messages[:op["count"]] = op["messages"]
+        elif kind == "file":
+            self.files.pop(op["key"], None)
+            self.files[op["key"]] = {"blob": op["blob"], "mtime_ns": op["mtime_ns"], "size": op["size"]}
+        elif kind == "delete":
+            self.files.pop(op["key"], None)
+        elif kind == "rename":
+            record = self.files.pop(op["key"], None)
+            self.files.pop(op["dest"], None)
+            if record is not None:
+                self.files[op["dest"]] = record
+
+    # --- Recording (called by Context) ---
+
+    def _submit(self, func: Callable, *args):
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="opencoder-journal")
+        self._writer.submit(self._run, func, *args)
+
+    @staticmethod
+    def _run(func: Callable, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Journal write failed:") # The session goes on, only its resume is affected
+
+    def flush(self):
+        """Waits until every operation recorded so far is in the journal."""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def _append(self, op: dict):
+        with self._lock:
+            self.seq += 1
+            op["seq"] = self.seq
+            self._apply(op)
+            if self._file is None:
+                self._file = open(self.journal_path, "a", encoding="utf-8")
+            self._file.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._ops_since_snapshot += 1
+            if self._ops_since_snapshot >= COMPACT_EVERY_OPS or self._file.tell() >= COMPACT_EVERY_BYTES:
+                self._compact()
+
+    def _stat(self, key: str):
+        """(mtime_ns, size) of the file or directory behind a context key, or (None, None)."""
+        if key.startswith(TREE_KEY_PREFIX):
+            path = key[len(TREE_KEY_PREFIX):]
+        else:
+            path = self.resolve_path(split_slice_key(key)[0])
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None
+        return st.st_mtime_ns, st.st_size
+
+    def record_message(self, message: str):
+        self._submit(self._append, {"op": "message", "text": message})
+
+    def record_history(self, count: int, messages: List[str]):
+        self._submit(self._append, {"op": "history", "count": count, "messages": list(messages)})
+
+    def record_file(self, key: str, content: str):
+        mtime_ns, size = self._stat(key) # Now: the disk state the content was read from
+        self._submit(self._write_file, key, content, mtime_ns, size)
+
+    def _write_file(self, key: str, content: str, mtime_ns: Optional[int], size: Optional[int]):
+        self._append({"op": "file", "key": key, "blob": self.blobs.put(content), "mtime_ns": mtime_ns, "size": size})
+
+    def record_delete(self, key: str):
+        self._submit(self._append, {"op": "delete", "key": key})
+
+    def record_rename(self, key: str, dest: str):
+        self._submit(self._append, {"op": "rename", "key": key, "dest": dest})
+
+    # --- Snapshots ---
+
+    def _compact(self):
+        """Writes the folded state as the new snapshot and empties the journal. Caller holds the lock."""
+        snapshot = {
+            "seq": self.seq,
+            "messages": self.messages,
+            "files": [dict(record, key=key) for key, record in self.files.items()],
+        }
+        _write_atomic(self.snapshot_path, json.dumps(snapshot, ensure_ascii=False).encode("utf-8"))
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        open(self.journal_path, "w").close() # Lines up to self.seq are in the snapshot now
+        self._ops_since_snapshot = 0
+        self._prune_blobs()
+
+    def _prune_blobs(self):
+        """Deletes the blobs that no journal next to this one refers to."""
+        if not self._prune:
+            return
+        sessions_dir = os.path.dirname(os.path.abspath(self.directory))
+        referenced = {record["blob"] for record in self.files.values()}
+        try:
+            others = [entry.path for entry in os.scandir(sessions_dir) if entry.is_dir()]
+        except OSError:
+            others = []
+        for session_dir in others:
+            if os.path.abspath(session_dir) != os.path.abspath(self.directory):
+                referenced |= referenced_blobs(session_dir)
+        self.pruned_blobs += self.blobs.prune(referenced)
+
+    def compact(self):
+        self.flush()
+        with self._lock:
+            self._compact()
+
+    def reset(self):
+        """Forgets everything recorded so far (a fresh session under the same name)."""
+        self.flush()
+        with self._lock:
+            self.messages, self.files = [], OrderedDict()
+            self._compact()
+
+    # --- Restoring ---
+
+    def restore(self, context, tree_index: TreeIndex) -> Dict[str, float]:
+        """
+        Loads the journal into an empty `context` (and the rendered trees into
+        `tree_index`), revalidating every file by mtime and size. The journal is
+        then rewritten from what was actually restored. Returns counters.
+        """
+        started = time.perf_counter()
+        self.flush()
+        self.load()
+        journal, context.journal = context.journal, None # Replaying must not record anything
+        report = {"messages": len(self.messages), "files": 0, "reread": 0, "dropped": 0, "trees": 0}
+        try:
+            for message in self.messages:
+                context._append_message(message)
+            for key, record in self.files.items():
+                content = self._revalidate(key, record, tree_index, report)
+                if content is not None:
+                    context._store_file(key, content)
+        finally:
+            context.journal = journal
+        # Fold the outcome (refreshed stats, dropped entries) into a fresh snapshot
+        with self._lock:
+            self.files = OrderedDict((key, self.files[key]) for key in context._lru if key in self.files) # LRU order
+            self._compact()
+        report["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return report
+
+    def _revalidate(self, key: str, record: dict, tree_index: TreeIndex, report: Dict[str, float]) -> Optional[str]:
+        if key.startswith(TREE_KEY_PREFIX):
+            root = key[len(TREE_KEY_PREFIX):]
+            if not os.path.isdir(root):
+                report["dropped"] += 1
+                return None
+            tree_index.rendered_roots.add(root)
+            report["trees"] += 1
+            return tree_index.render(root) # Scanned again, the blob may be stale
+        mtime_ns, size = self._stat(key)
+        if mtime_ns is not None and (mtime_ns, size) == (record["mtime_ns"], record["size"]):
+            content = self.blobs.get(record["blob"])
+            if content is not None:
+                report["files"] += 1
+                return content
+        # Changed (or blob missing): re-read whole files, slices may point at shifted ranges
+        if mtime_ns is not None and size <= MAX_READ_BYTES and split_slice_key(key)[1] is None:
+            try:
+                file_slice = read_file_slice(self.resolve_path(key))
+            except OSError:
+                file_slice = None
+            if file_slice is not None and file_slice.label is None:
+                record.update(blob=self.blobs.put(file_slice.content), mtime_ns=mtime_ns, size=size)
+                report["reread"] += 1
+                return file_slice.content
+        report["dropped"] += 1
+        return None
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._compact()
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
@@ -0,0 +1,82 @@
+# api/locking.py
+import asyncio
+import functools
+import os
+from typing import Callable, List, Optional, Tuple
+
+Claim = Tuple[Optional[str], bool] # (absolute path, None for the whole workspace; exclusive)
+
+
+def synchronized(method: Callable) -> Callable:
+    """Runs a method under its instance's `lock` (a threading.RLock), for objects tools share across threads."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _overlap(a: Optional[str], b: Optional[str]) -> bool:
+    if a is None or b is None:
+        return True
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def conflicts(claims: List[Claim], others: List[Claim]) -> bool:
+    """Two claim sets conflict when paths overlap (one inside the other) and either side is exclusive."""
+    return any((exclusive or other_exclusive) and _overlap(path, other_path)
+               for path, exclusive in claims for other_path, other_exclusive in others)
+
+
+class PathLocks():
+    """
+    Readers/writer locks on workspace paths for concurrent tool calls of one
+    session. A claim covers a path and everything below it; a call holds all
+    its claims at once. Calls are granted in arrival order, so conflicting
+    calls run in the order the model emitted them while independent calls
+    overlap. Used from the event loop thread only; no asyncio.Lock, so it
+    is not bound to one event loop.
+    """
+
+    def __init__(self):
+        self._held: List[List[Claim]] = []
+        self._waiting: List[Tuple[List[Claim], asyncio.Future]] = [] # FIFO
+
+    def _grantable(self, claims: List[Claim], ahead: List[List[Claim]]) -> bool:
+        return not any(conflicts(claims, held) for held in self._held) and not any(conflicts(claims, other) for other in ahead)
+
+    def _wake(self):
+        ahead: List[List[Claim]] = []
+        for entry in list(self._waiting):
+            claims, future = entry
+            if future.done(): # Cancelled while waiting
+                self._waiting.remove(entry)
+            elif self._grantable(claims, ahead):
+                self._waiting.remove(entry)
+                self._held.append(claims)
+                future.set_result(None)
+            else:
+                ahead.append(claims) # Later calls may not overtake it
+
+    async def acquire(self, claims: List[Claim]):
+        if not self._waiting and self._grantable(claims, []):
+            self._held.append(claims)
+            return
+        entry = (claims, asyncio.get_running_loop().create_future())
+        self._waiting.append(entry)
+        try:
+            await entry[1]
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                self._wake()
+            else: # Granted just before the cancellation arrived
+                self.release(claims)
+            raise
+
+    def release(self, claims: List[Claim]):
+        self._held.remove(claims)
+        self._wake()
+
+    def stats(self) -> dict:
+        return {"held": len(self._held), "waiting": len(self._waiting)}
@@ -0,0 +1,264 @@
+# api/metrics.py
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .context_handler import get_session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricEvent():
+    """One finished tool call ("tool"), agent turn ("turn"), history compaction ("history") or prefetch lookup/warm-up ("prefetch")."""
+    kind: str
+    name: str
+    status: str                    # "success" or "error"
+    duration: float                # Seconds
+    input_bytes: int = 0           # Tool arguments (JSON) or the user input
+    output_bytes: int = 0          # What was returned to the model (or the final answer)
+    context_growth: int = 0        # Change of the serialized context size, in characters
+    session_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+# --- Sinks ---
+
+class JsonLinesSink():
+    """Appends every event as one JSON object per line."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def emit(self, event: MetricEvent):
+        line = json.dumps(asdict(event), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class _Aggregate():
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.context_growth = 0
+
+    def add(self, event: MetricEvent):
+        self.count += 1
+        self.errors += event.status != "success"
+        self.total_time += event.duration
+        self.max_time = max(self.max_time, event.duration)
+        self.input_bytes += event.input_bytes
+        self.output_bytes += event.output_bytes
+        self.context_growth += event.context_growth
+
+
+class SummarySink():
+    """In-process totals per (kind, name), for the REPL "metrics" command."""
+
+    def __init__(self):
+        self.aggregates: Dict[Tuple[str, str], _Aggregate] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event: MetricEvent):
+        with self._lock:
+            self.aggregates.setdefault((event.kind, event.name), _Aggregate()).add(event)
+
+    def render(self) -> str:
+        with self._lock:
+            rows = sorted(self.aggregates.items(), key=lambda item: -item[1].total_time)
+            if not rows:
+                return "No metrics recorded yet."
+            lines = [f"{'kind':<8} {'name':<22} {'calls':>5} {'errors':>6} {'avg ms':>9} {'max ms':>9} "
+                     f"{'in bytes':>9} {'out bytes':>10} {'ctx growth':>10}"]
+            for (kind, name), agg in rows:
+                lines.append(f"{kind:<8} {name:<22} {agg.count:>5} {agg.errors:>6} {agg.total_time / agg.count * 1000:>9.1f} "
+                             f"{agg.max_time * 1000:>9.1f} {agg.input_bytes:>9} {agg.output_bytes:>10} {agg.context_growth:>10}")
+            return "\n".join(lines)
+
+    def close(self):
+        pass
+
+
+class PrometheusSink():
+    """
+    Keeps counters in Prometheus text exposition format. render() returns the
+    text; with a `path` it is also written there (atomically, e.g. for the
+    node_exporter textfile collector) after every turn and on close().
+    """
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "opencoder"):
+        self.path = path
+        self.prefix = prefix
+        self.summary = SummarySink()
+
+    def emit(self, event: MetricEvent):
+        self.summary.emit(event)
+        if self.path is not None and event.kind == "turn":
+            self.write()
+
+    @staticmethod
+    def _label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def render(self) -> str:
+        with self.summary._lock:
+            aggregates = list(self.summary.aggregates.items())
+        p = self.prefix
+        metrics = [
+            ("calls_total", "counter", "Finished calls.", lambda a: a.count),
+            ("errors_total", "counter", "Calls that reported an error.", lambda a: a.errors),
+            ("duration_seconds_total", "counter", "Time spent, in seconds.", lambda a: a.total_time),
+            ("duration_seconds_max", "gauge", "Slowest call, in seconds.", lambda a: a.max_time),
+            ("input_bytes_total", "counter", "Bytes of arguments / user input.", lambda a: a.input_bytes),
+            ("output_bytes_total", "counter", "Bytes returned to the model.", lambda a: a.output_bytes),
+            ("context_growth_bytes_total", "counter", "Growth of the serialized context.", lambda a: a.context_growth),
+        ]
+        lines = []
+        for suffix, metric_type, help_text, value in metrics:
+            name = f"{p}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (kind, event_name), agg in aggregates:
+                lines.append(f'{name}{{kind="{self._label(kind)}",name="{self._label(event_name)}"}} {value(agg)}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        if self.path is not None:
+            self.write()
+
+
+# --- Recorder ---
+
+class MetricsRecorder():
+    """Fans events out to its sinks. A SummarySink is always attached."""
+
+    def __init__(self):
+        self.summary = SummarySink()
+        self.sinks: List[Any] = [self.summary]
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, event: MetricEvent):
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception:
+                logger.exception(f"Metrics sink {type(sink).__name__} failed:") # Never break a tool over metrics
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+recorder = MetricsRecorder()
+
+def get_metrics():
+    return recorder
+
+def configure_from_env():
+    """Adds the sinks asked for by OPENCODER_METRICS_JSONL and OPENCODER_METRICS_PROM (file paths)."""
+    if os.getenv("OPENCODER_METRICS_JSONL"):
+        recorder.add_sink(JsonLinesSink(os.getenv("OPENCODER_METRICS_JSONL")))
+    if os.getenv("OPENCODER_METRICS_PROM"):
+        recorder.add_sink(PrometheusSink(os.getenv("OPENCODER_METRICS_PROM")))
+
+
+# --- Tool instrumentation ---
+
+# The tool call in progress in this task, so announce_execution_output() can flag errors on it
+_current_call: ContextVar[Optional[dict]] = ContextVar("opencoder_tool_call", default=None)
+
+def record_tool_status(status: str):
+    """Called for every announced outcome; one error marks the whole tool call as failed."""
+    call = _current_call.get()
+    if call is not None and status != "success":
+        call["errors"] += 1
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, default=lambda o: o.model_dump() if hasattr(o, "model_dump") else str(o)))
+
+def instrument_tool(func: Callable) -> Callable:
+    """
+    Reports every call of a tool function as a "tool" MetricEvent. Keeps the
+    signature, docstring and sync/async nature, so it can sit under @function_tool.
+    """
+    name = func.__name__
+    parameters = inspect.signature(func).parameters
+
+    def start(args, kwargs) -> Tuple[dict, Any, int]:
+        arguments = dict(zip(parameters, args), **kwargs)
+        call = {"errors": 0}
+        token = _current_call.set(call)
+        return call, token, _json_size(arguments)
+
+    def finish(call, token, input_bytes, context_before, started, result, error):
+        _current_call.reset(token)
+        session = get_session()
+        failed = error is not None or call["errors"] > 0 or (isinstance(result, str) and result.startswith("Error"))
+        recorder.emit(MetricEvent(
+            kind="tool",
+            name=name,
+            status="error" if failed else "success",
+            duration=time.perf_counter() - started,
+            input_bytes=input_bytes,
+            output_bytes=len(result) if isinstance(result, str) else 0,
+            context_growth=session.context.size() - context_before,
+            session_id=session.id,
+            extra={"exception": repr(error)} if error is not None else {},
+        ))
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            call, token, input_bytes = start(args, kwargs)
+            context_before, started = get_session().context.size(), time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                finish(call, token, input_bytes, context_before, started, None, e)
+                raise
+            finish(call, token, input_bytes, context_before, started, result, None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call, token, input_bytes = start(args, kwargs)
+        context_before, started = get_session().context.size(), time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            finish(call, token, input_bytes, context_before, started, None, e)
+            raise
+        finish(call, token, input_bytes, context_before, started, result, None)
+        return result
+    return wrapper
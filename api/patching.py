@@ -0,0 +1,230 @@
+# api/patching.py
+import difflib
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# --- Configuration ---
+FUZZY_THRESHOLD = 0.85   # Minimum similarity (difflib ratio) for a fuzzy match of a hunk's old lines
+SNIPPET_CONTEXT = 3      # Unchanged lines shown around each changed region in the tool output
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """A hunk could not be parsed or located in the file."""
+
+
+@dataclass
+class Hunk():
+    old: List[str]                 # Lines to replace, without line endings
+    new: List[str]                 # Replacement lines, without line endings
+    hint: Optional[int] = None     # 0-based line where the diff says the hunk starts, if known
+
+
+@dataclass
+class AppliedHunk():
+    start: int       # 0-based first line of the change in the new text
+    old_count: int
+    new_count: int
+    match: str       # "exact", "whitespace", "fuzzy" or "insert"
+
+
+# --- Parsing ---
+
+def split_lines(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Lines of text without their endings, and each line's ending ("\r\n", "\n",
+    or "" for a last line without one). Only "\n" ends a line: unlike
+    str.splitlines(), form feeds, U+2028 and the like stay inside their line.
+    """
+    lines = text.split("\n")
+    endings = ["\n"] * (len(lines) - 1) + [""]
+    if lines[-1] == "": # Final newline (or empty text): no line after it
+        lines.pop()
+        endings.pop()
+    for i, line in enumerate(lines):
+        if endings[i] and line.endswith("\r"):
+            lines[i], endings[i] = line[:-1], "\r\n"
+    return lines, endings
+
+
+def hunk_from_search_replace(search: str, replace: str) -> Hunk:
+    if not search.strip():
+        raise PatchError("search text is empty; give a few lines of the code to replace")
+    return Hunk(split_lines(search)[0], split_lines(replace)[0])
+
+
+def parse_unified_diff(diff: str) -> List[Hunk]:
+    """Hunks of a unified diff (one file). Header lines (---, +++, diff, index) are skipped."""
+    hunks: List[Hunk] = []
+    current: Optional[Hunk] = None
+    for line in split_lines(diff)[0]:
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = Hunk([], [], hint=max(0, int(header.group(1)) - 1))
+            hunks.append(current)
+        elif current is None or line.startswith("\\"): # Preamble, "\ No newline at end of file"
+            continue
+        elif line.startswith("-"):
+            current.old.append(line[1:])
+        elif line.startswith("+"):
+            current.new.append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current.old.append(line[1:])
+            current.new.append(line[1:])
+        else:
+            raise PatchError(f"unexpected line in hunk: {line[:80]!r}")
+    if not hunks:
+        raise PatchError("no @@ hunk headers found in the diff")
+    return hunks
+
+
+# --- Matching ---
+
+def _squash(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _closest(candidates: List[int], hint: Optional[int], what: str) -> int:
+    if len(candidates) == 1:
+        return candidates[0]
+    if hint is None:
+        raise PatchError(f"{what} matches {len(candidates)} places (lines "
+                         f"{', '.join(str(c + 1) for c in candidates[:5])}); include more surrounding lines")
+    return min(candidates, key=lambda c: abs(c - hint))
+
+
+def find_hunk(lines: List[str], hunk: Hunk, start_from: int = 0) -> Tuple[int, str]:
+    """
+    Locates hunk.old in lines (at or after start_from). Tries an exact match,
+    then one ignoring whitespace differences, then the most similar block above
+    FUZZY_THRESHOLD among the positions sharing at least one line. Returns (index, match kind).
+    """
+    old, n = hunk.old, len(hunk.old)
+    what = f"hunk starting {old[0].strip()[:60]!r}" if old else "hunk"
+    positions = range(start_from, len(lines) - n + 1)
+
+    exact = [i for i in positions if lines[i] == old[0] and lines[i:i + n] == old]
+    if exact:
+        return _closest(exact, hunk.hint, what), "exact"
+
+    squashed_old = [_squash(line) for line in old]
+    squashed = [_squash(line) for line in lines]
+    loose = [i for i in positions if squashed[i] == squashed_old[0] and squashed[i:i + n] == squashed_old]
+    if loose:
+        return _closest(loose, hunk.hint, what), "whitespace"
+
+    # Fuzzy: only score windows anchored on a line that matches exactly (after squashing)
+    old_lines = {}
+    for k, line in enumerate(squashed_old):
+        if line:
+            old_lines.setdefault(line, []).append(k)
+    candidates = {j - k for j in range(start_from, len(lines)) for k in old_lines.get(squashed[j], ())}
+    target = "\n".join(squashed_old)
+    best, best_ratio = [], FUZZY_THRESHOLD
+    for i in sorted(c for c in candidates if start_from <= c <= len(lines) - n):
+        matcher = difflib.SequenceMatcher(None, "\n".join(squashed[i:i + n]), target, autojunk=False)
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio + 1e-9:
+            best, best_ratio = [i], ratio
+        elif abs(ratio - best_ratio) <= 1e-9:
+            best.append(i)
+    if best:
+        return _closest(best, hunk.hint, what), "fuzzy"
+    raise PatchError(f"{what} not found in the file (no block at least {FUZZY_THRESHOLD:.0%} similar)")
+
+
+def apply_hunks(text: str, hunks: List[Hunk]) -> Tuple[str, List[AppliedHunk]]:
+    """
+    Applies hunks in order; each is searched after the previous one's
+    replacement. Lines outside the hunks are kept byte for byte, endings
+    included; a replaced line keeps the ending of the old line in its place,
+    added lines take the ending around them, and the final newline (or its
+    absence) is kept. Raises PatchError (nothing is applied) if a hunk cannot
+    be located.
+    """
+    crlf = text.count("\r\n")
+    default = "\r\n" if crlf > text.count("\n") - crlf else "\n" # The file's usual ending, for new lines
+    lines, endings = split_lines(text)
+    applied: List[AppliedHunk] = []
+    position = 0
+    offset = 0 # Lines added (or removed) by previous hunks, to shift the diff's line hints
+    for hunk in hunks:
+        shifted = Hunk(hunk.old, hunk.new, None if hunk.hint is None else hunk.hint + offset)
+        if not hunk.old: # Pure insertion, only possible with a line number
+            if shifted.hint is None:
+                raise PatchError("a hunk without old lines needs a line number")
+            index, match = min(max(shifted.hint, position), len(lines)), "insert"
+        else:
+            index, match = find_hunk(lines, shifted, position)
+        end = index + len(hunk.old)
+        old_endings = endings[index:end]
+        newline = next((e for e in old_endings if e), endings[index - 1] if index else default) or default
+        new_endings = [old_endings[k] if k < len(old_endings) and old_endings[k] else newline
+                       for k in range(len(hunk.new))]
+        if end == len(lines): # The block reaches the end of the file: so does its final newline, or its absence
+            last = old_endings[-1] if old_endings else (endings[-1] if endings else "")
+            if new_endings:
+                new_endings[-1] = last
+                if not old_endings and index:
+                    endings[index - 1] = endings[index - 1] or newline
+            elif index:
+                endings[index - 1] = last
+        lines[index:end] = hunk.new
+        endings[index:end] = new_endings
+        applied.append(AppliedHunk(index, len(hunk.old), len(hunk.new), match))
+        position = index + len(hunk.new)
+        offset += len(hunk.new) - len(hunk.old)
+    return "".join(line + ending for line, ending in zip(lines, endings)), applied
+
+
+def describe_changes(text: str, applied: List[AppliedHunk], context_lines: int = SNIPPET_CONTEXT) -> str:
+    """The changed regions of the new text, with line numbers and a few lines around them."""
+    lines = split_lines(text)[0] # Same lines as apply_hunks(), so AppliedHunk.start matches
+    parts = []
+    for hunk in applied:
+        first = max(0, hunk.start - context_lines)
+        last = min(len(lines), hunk.start + hunk.new_count + context_lines)
+        header = f"@@ lines {hunk.start + 1}-{hunk.start + hunk.new_count} (-{hunk.old_count} +{hunk.new_count}, {hunk.match} match) @@"
+        body = [f"{n + 1:>6}  {lines[n]}" for n in range(first, last)]
+        parts.append("\n".join([header] + body))
+    return "\n".join(parts)
+
+
+# --- Writing ---
+
+def write_atomic(abs_path: str, content: str, newline: Optional[str] = None):
+    """
+    Writes through a temporary file in the same directory and renames it over
+    abs_path, so readers see the old or the new file, never a partial one.
+    A symlink is followed (the link stays, its target is replaced), and the
+    mode and, where permitted, the owner of an existing file are kept.
+    """
+    abs_path = os.path.realpath(abs_path)
+    directory, name = os.path.split(abs_path)
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(temp_path, "x", encoding="utf-8", newline=newline) as f: # "x": created with the umask, like open("w")
+            f.write(content)
+        try:
+            original = os.stat(abs_path)
+        except FileNotFoundError:
+            original = None
+        if original is not None:
+            os.chmod(temp_path, original.st_mode & 0o7777)
+            try:
+                os.chown(temp_path, original.st_uid, original.st_gid)
+            except (PermissionError, AttributeError): # Not root (or not POSIX): the new file is ours
+                pass
+        os.replace(temp_path, abs_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,375 @@
+# api/prefetch.py
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .file_reader import BINARY_SNIFF_BYTES, MAX_READ_BYTES
+from .locking import synchronized
+from .tree_index import IGNORED_NAMES
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_PREFETCH_BYTES = 8 * 1024 * 1024 # Cache budget per session (OPENCODER_PREFETCH_BYTES, 0 turns prefetching off)
+DEFAULT_PREFETCH_WORKERS = 2             # Background threads shared by all sessions (OPENCODER_PREFETCH_WORKERS)
+MAX_PENDING = 4                          # Prefetch jobs queued per session; more are dropped, not queued
+MAX_CANDIDATES = 8                       # Files warmed after one ReadFile / GetTree
+MAX_NEIGHBOURS = 2                       # Same-extension files next to the read one, in name order
+PARSE_CHARS = 64 * 1024                  # Imports are looked for in this much of the read content
+START_DELAY = 0.005                      # Seconds a job waits first, so the tool call that queued it returns
+                                         # without competing with it for the GIL; model round trips are far longer
+
+PRIORITY_NAMES = ("README.md", "__init__.py", "main.py", "pyproject.toml", "setup.py", "package.json",
+                  "index.ts", "index.js", "Cargo.toml", "go.mod") # Warmed first after GetTree
+JS_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")
+TEST_DIRS = ("tests", "test")
+
+PY_IMPORT = re.compile(r"^[ \t]*(?:from[ \t]+(\.*)([\w.]*)[ \t]+import[ \t]+\(?([\w \t,*]+)|import[ \t]+([\w. \t,]+))", re.M)
+JS_IMPORT = re.compile(r"""(?:\bfrom|\bimport|\brequire\()\s*\(?\s*['"](\.{1,2}/[^'"]+)['"]""")
+C_INCLUDE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*"([^"]+)"', re.M)
+RUST_MOD = re.compile(r"^[ \t]*(?:pub(?:\([^)]*\))?[ \t]+)?mod[ \t]+(\w+)[ \t]*;", re.M)
+
+Fingerprint = Tuple[int, int, int, int] # (mtime_ns, ctime_ns, size, inode); atomic rewrites change the inode
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("OPENCODER_PREFETCH_WORKERS", DEFAULT_PREFETCH_WORKERS))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="opencoder-prefetch")
+        return _executor
+
+
+def fingerprint(stat: os.stat_result) -> Fingerprint:
+    return (stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino)
+
+
+def read_whole(abs_path: str) -> Optional[Tuple[Fingerprint, bytes]]:
+    """A text file ReadFile would return whole, with its fingerprint; None for others or if it changed while read."""
+    before = os.stat(abs_path)
+    if not os.path.isfile(abs_path) or before.st_size == 0 or before.st_size > MAX_READ_BYTES:
+        return None
+    with open(abs_path, "rb") as f:
+        data = f.read(MAX_READ_BYTES + 1)
+    if b"\0" in data[:BINARY_SNIFF_BYTES] or fingerprint(os.stat(abs_path)) != fingerprint(before):
+        return None
+    return fingerprint(before), data
+
+
+# --- Related files ---
+
+def _existing(paths: List[str]) -> List[str]:
+    return [os.path.normpath(p) for p in paths if os.path.isfile(p)]
+
+
+def _python_imports(abs_path: str, text: str, root: str) -> List[str]:
+    directory = os.path.dirname(abs_path)
+    found = []
+    for dots, module, names, plain in PY_IMPORT.findall(text):
+        if plain:
+            modules = [part.split(" as ")[0].strip() for part in plain.split(",")]
+            bases = [root, os.path.join(root, "src"), directory]
+            names = ""
+        elif dots:
+            base = directory
+            for _ in range(len(dots) - 1):
+                base = os.path.dirname(base)
+            modules, bases = [module], [base]
+        else:
+            modules, bases = [module], [root, os.path.join(root, "src"), directory]
+        for name in modules:
+            for base in bases:
+                target = os.path.join(base, *[part for part in name.split(".") if part])
+                candidates = [target + ".py", os.path.join(target, "__init__.py")]
+                # "from package import module" imports a submodule
+                candidates += [os.path.join(target, n.split(" as ")[0].strip() + ".py")
+                               for n in names.split(",") if n.strip() and n.strip() != "*"]
+                found += _existing(candidates)
+    return found
+
+
+def _js_imports(abs_path: str, text: str) -> List[str]:
+    directory = os.path.dirname(abs_path)
+    found = []
+    for spec in JS_IMPORT.findall(text):
+        target = os.path.join(directory, spec)
+        candidates = [target] + [target + ext for ext in JS_EXTENSIONS]
+        candidates += [os.path.join(target, "index" + ext) for ext in JS_EXTENSIONS]
+        found += _existing(candidates)[:1]
+    return found
+
+
+def import_targets(abs_path: str, text: str, root: str) -> List[str]:
+    """Workspace files that `text` (the content of abs_path) imports, includes or declares as modules."""
+    text = text[:PARSE_CHARS]
+    extension = os.path.splitext(abs_path)[1]
+    directory = os.path.dirname(abs_path)
+    if extension == ".py":
+        return _python_imports(abs_path, text, root)
+    if extension in JS_EXTENSIONS:
+        return _js_imports(abs_path, text)
+    if extension in (".c", ".cc", ".cpp", ".h", ".hpp"):
+        return _existing([os.path.join(directory, name) for name in C_INCLUDE.findall(text)])
+    if extension == ".rs":
+        return _existing([p for name in RUST_MOD.findall(text)
+                          for p in (os.path.join(directory, name + ".rs"), os.path.join(directory, name, "mod.rs"))])
+    return []
+
+
+def test_targets(abs_path: str, root: str) -> List[str]:
+    """Test files named after abs_path, next to it or in a tests/ directory."""
+    stem, extension = os.path.splitext(os.path.basename(abs_path))
+    if stem.startswith("test_") or stem.endswith(("_test", ".test", ".spec")):
+        return []
+    names = [f"test_{stem}{extension}", f"{stem}_test{extension}", f"{stem}.test{extension}", f"{stem}.spec{extension}"]
+    directory = os.path.dirname(abs_path)
+    directories = [directory] + [os.path.join(base, d) for base in (directory, root) for d in TEST_DIRS]
+    return _existing([os.path.join(d, name) for d in directories for name in names])
+
+
+def neighbour_targets(abs_path: str) -> List[str]:
+    """The files with the same extension right before and after abs_path in its directory."""
+    directory, name = os.path.split(abs_path)
+    extension = os.path.splitext(name)[1]
+    try:
+        siblings = sorted(e.name for e in os.scandir(directory)
+                          if e.is_file() and e.name.endswith(extension) and not e.name.startswith("."))
+    except OSError:
+        return []
+    if name not in siblings:
+        return []
+    index = siblings.index(name)
+    order = [index + offset for step in range(1, MAX_NEIGHBOURS + 1) for offset in (-step, step)]
+    return [os.path.join(directory, siblings[i]) for i in order if 0 <= i < len(siblings)][:MAX_NEIGHBOURS]
+
+
+def related_files(abs_path: str, text: str, root: str) -> List[str]:
+    """What is likely read after abs_path: its imports, then its tests, then its neighbours."""
+    ordered = import_targets(abs_path, text, root) + test_targets(abs_path, root) + neighbour_targets(abs_path)
+    return [p for p in dict.fromkeys(ordered) if p != abs_path]
+
+
+def directory_files(abs_dir: str) -> List[str]:
+    """Top-level files of a directory, the usual entry points first."""
+    try:
+        names = [e.name for e in os.scandir(abs_dir)
+                 if e.is_file() and not e.name.startswith(".") and e.name not in IGNORED_NAMES]
+    except OSError:
+        return []
+    names.sort(key=lambda n: (PRIORITY_NAMES.index(n) if n in PRIORITY_NAMES else len(PRIORITY_NAMES), n))
+    return [os.path.join(abs_dir, n) for n in names]
+
+
+# --- Cache ---
+
+class Prefetcher():
+    """
+    Warms a bounded in-memory cache with the files a ReadFile or GetTree is
+    usually followed by: a file's imports, tests and neighbours, a directory's
+    entry points. The work runs on a small background pool and never adds
+    anything to the context. ReadFile takes a cached copy only while the
+    file's fingerprint is unchanged; entries are dropped once served. The
+    fingerprint is a backstop: the file tools drop the entries of the paths
+    they write (invalidate()) and ShellExec drops them all (clear()).
+    """
+
+    def __init__(self, root: Optional[str] = None, budget: Optional[int] = None):
+        if budget is None:
+            budget = int(os.getenv("OPENCODER_PREFETCH_BYTES", DEFAULT_PREFETCH_BYTES))
+        self.root = root # None: the process working directory
+        self.budget = budget
+        self.lock = threading.RLock()
+        self._cache: "OrderedDict[str, Tuple[Fingerprint, bytes]]" = OrderedDict() # LRU order
+        self._cached_bytes = 0
+        self._loading: Set[str] = set()
+        self._pending: Set[Future] = set()
+        self._closed = False
+        self._generation = 0       # Bumped by invalidate()/clear(): reads started before are not cached
+        self.hits = 0
+        self.misses = 0            # Includes stale entries
+        self.stale = 0             # Cached copy no longer matched the file
+        self.dropped_jobs = 0      # Not queued, MAX_PENDING jobs were waiting
+        self.prefetched_files = 0
+        self.prefetched_bytes = 0
+        self.served_bytes = 0
+        self.wasted_bytes = 0      # Prefetched and dropped without being served (evicted, stale, invalidated, closed)
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def take(self, abs_path: str, session_id: Optional[str] = None) -> Optional[bytes]:
+        """The cached content of abs_path if it is still fresh, else None (counted as a miss)."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            entry = self._cache.pop(abs_path, None)
+            if entry is not None:
+                self._cached_bytes -= len(entry[1])
+        if entry is not None:
+            try:
+                fresh = fingerprint(os.stat(abs_path)) == entry[0]
+            except OSError:
+                fresh = False
+            if fresh:
+                with self.lock:
+                    self.hits += 1
+                    self.served_bytes += len(entry[1])
+                self._emit("hit", session_id, output_bytes=len(entry[1]))
+                return entry[1]
+            with self.lock:
+                self.stale += 1
+                self.wasted_bytes += len(entry[1])
+            self._emit("wasted", session_id, input_bytes=len(entry[1]), extra={"reason": "stale"})
+        with self.lock:
+            self.misses += 1
+        self._emit("miss", session_id)
+        return None
+
+    def after_read(self, abs_path: str, text: str, session_id: Optional[str] = None):
+        """Schedules the files related to a file just read (its content is parsed in the background)."""
+        self._submit(lambda root: related_files(abs_path, text, root), session_id)
+
+    def after_tree(self, abs_dir: str, session_id: Optional[str] = None):
+        """Schedules the top-level files of a directory just listed."""
+        self._submit(lambda root: directory_files(abs_dir), session_id)
+
+    def _submit(self, find: Callable[[str], List[str]], session_id: Optional[str]):
+        if not self.enabled:
+            return
+        with self.lock:
+            if self._closed:
+                return
+            if len(self._pending) >= MAX_PENDING:
+                self.dropped_jobs += 1
+                return
+            future = get_prefetch_executor().submit(self._warm, find, session_id)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future: Future):
+        with self.lock:
+            self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Prefetch failed:", exc_info=future.exception())
+
+    def _warm(self, find: Callable[[str], List[str]], session_id: Optional[str]):
+        time.sleep(START_DELAY)
+        started = time.perf_counter()
+        files = loaded = 0
+        for path in find(self.root or os.getcwd())[:MAX_CANDIDATES]:
+            with self.lock:
+                if self._closed:
+                    return
+                if path in self._cache or path in self._loading:
+                    continue
+                self._loading.add(path)
+                generation = self._generation
+            try:
+                result = read_whole(path)
+            except OSError:
+                result = None
+            finally:
+                with self.lock:
+                    self._loading.discard(path)
+            if result is None or len(result[1]) > self.budget:
+                continue
+            with self.lock:
+                if self._closed:
+                    return
+                if generation != self._generation: # Possibly written while we read it
+                    continue
+                self._cache[path] = result
+                self._cached_bytes += len(result[1])
+                self.prefetched_files += 1
+                self.prefetched_bytes += len(result[1])
+                evicted = self._evict()
+            files += 1
+            loaded += len(result[1])
+            if evicted:
+                self._emit("wasted", session_id, input_bytes=evicted, extra={"reason": "evicted"})
+        if files:
+            self._emit("warm", session_id, duration=time.perf_counter() - started, input_bytes=loaded,
+                       extra={"files": files})
+
+    def _evict(self) -> int:
+        """Drops least recently cached entries over the budget; returns their bytes. Call with the lock held."""
+        evicted = 0
+        while self._cached_bytes > self.budget and self._cache:
+            _, (_, data) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(data)
+            evicted += len(data)
+        self.wasted_bytes += evicted
+        return evicted
+
+    def invalidate(self, abs_paths: Iterable[str], session_id: Optional[str] = None):
+        """Drops the cached copies of files (or of everything below directories) that were written, moved or deleted."""
+        dropped = 0
+        with self.lock:
+            self._generation += 1
+            for abs_path in abs_paths:
+                below = abs_path + os.sep
+                for path in [p for p in self._cache if p == abs_path or p.startswith(below)]:
+                    dropped += self._drop(path)
+        if dropped:
+            self._emit("wasted", session_id, input_bytes=dropped, extra={"reason": "invalidated"})
+
+    def clear(self, session_id: Optional[str] = None):
+        """Drops every cached copy (e.g. after a shell command, which may have changed any file)."""
+        with self.lock:
+            self._generation += 1
+            dropped = self._cached_bytes
+            self.wasted_bytes += dropped
+            self._cache.clear()
+            self._cached_bytes = 0
+        if dropped:
+            self._emit("wasted", session_id, input_bytes=dropped, extra={"reason": "invalidated"})
+
+    def _drop(self, path: str) -> int:
+        """Drops one entry without serving it; returns its bytes. Call with the lock held."""
+        _, data = self._cache.pop(path)
+        self._cached_bytes -= len(data)
+        self.wasted_bytes += len(data)
+        return len(data)
+
+    def _emit(self, name: str, session_id: Optional[str], duration: float = 0.0, **fields):
+        from .metrics import MetricEvent, get_metrics # Deferred: api.metrics imports the session module
+        get_metrics().emit(MetricEvent(kind="prefetch", name=name, status="success", duration=duration,
+                                       session_id=session_id, **fields))
+
+    def close(self):
+        """Cancels queued jobs and drops the cache (what was never served counts as wasted)."""
+        with self.lock:
+            self._closed = True
+            for future in list(self._pending):
+                future.cancel()
+            self.wasted_bytes += self._cached_bytes
+            self._cache.clear()
+            self._cached_bytes = 0
+
+    @synchronized
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "budget": self.budget,
+            "cached_files": len(self._cache),
+            "cached_bytes": self._cached_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "prefetched_files": self.prefetched_files,
+            "prefetched_bytes": self.prefetched_bytes,
+            "served_bytes": self.served_bytes,
+            "wasted_bytes": self.wasted_bytes,
+            "dropped_jobs": self.dropped_jobs,
+        }
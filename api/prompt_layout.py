@@ -0,0 +1,145 @@
+# api/prompt_layout.py
+from typing import Dict, List, Optional, Tuple
+
+# --- Configuration ---
+STALE_RATIO = 0.5              # Rebuild once superseded file chunks are this share of the file characters sent
+MIN_STALE_CHARS = 64 * 1024    # ...and at least this many characters (small conversations never rebuild)
+
+ROLES = {"user": "user", "assistant": "assistant", "system": "system"} # Context message prefix -> input role
+
+
+def message_item(message: str) -> Dict[str, str]:
+    """Input item for a Context message ("user: ...", "assistant: ...", "system: ...")."""
+    prefix, separator, text = message.partition(": ")
+    role = ROLES.get(prefix) if separator else None
+    if role is None:
+        return {"role": "system", "content": message}
+    return {"role": role, "content": text}
+
+
+def _item_chars(item: Dict[str, str]) -> int:
+    return len(item["content"])
+
+
+class PromptLayout():
+    """
+    Turns a Context into the input item list of a turn, laid out so that each
+    request starts with the previous one (provider prompt caches only reuse an
+    identical prefix).
+
+    The agent instructions and tools come first and never change. Then comes
+    an append-only log: messages in order and, before each user message, one
+    chunk with the files whose version (Context.versions) changed since they
+    were last sent. Unchanged files are only named in that chunk with the
+    version shown earlier. Superseded file chunks stay in the log until they
+    exceed STALE_RATIO of the file characters sent; then the log is rebuilt
+    once from the current context (one cache miss).
+    """
+
+    def __init__(self, stale_ratio: float = STALE_RATIO, min_stale_chars: int = MIN_STALE_CHARS):
+        self.stale_ratio = stale_ratio
+        self.min_stale_chars = min_stale_chars
+        self._items: List[Dict[str, str]] = []            # The log, never modified in place
+        self._message_count = 0                            # Context messages already in the log
+        self._last_message: Optional[str] = None           # To notice a history that was rewritten
+        self._sent: Dict[str, Tuple[int, int]] = {}        # filename -> (version, characters) in the log
+        self._stale_chars = 0
+        self._previous: List[Dict[str, str]] = []          # Items of the last request
+        self.requests = 0
+        self.rebuilds = 0
+        self.input_chars = 0
+        self.prefix_chars = 0
+        self.last_prefix_hit_rate = 0.0
+
+    def _reset(self):
+        self._items = []
+        self._message_count = 0
+        self._last_message = None
+        self._sent = {}
+        self._stale_chars = 0
+
+    def _history_rewritten(self, messages: List[str]) -> bool:
+        if self._message_count == 0:
+            return False
+        return len(messages) < self._message_count or messages[self._message_count - 1] is not self._last_message
+
+    def _file_chunk(self, context) -> Optional[Dict[str, str]]:
+        """Files changed, added or removed since the log last showed them (None if nothing changed)."""
+        changed, unchanged = [], []
+        for filename, segment in context._file_segments.items():
+            version = context.versions[filename]
+            sent = self._sent.get(filename)
+            if sent is not None and sent[0] == version:
+                unchanged.append(f"{filename} (v{version})")
+                continue
+            if sent is not None:
+                self._stale_chars += sent[1]
+            changed.append(f"[v{version}] {segment}")
+            self._sent[filename] = (version, len(segment))
+        removed = [filename for filename in self._sent if filename not in context._file_segments]
+        for filename in removed:
+            self._stale_chars += self._sent.pop(filename)[1]
+        if not changed and not removed:
+            return None
+        parts = ["Files in context, changed since last shown:"] + changed
+        if removed:
+            parts.append("Removed from context: " + ", ".join(removed))
+        if unchanged:
+            parts.append("Unchanged, as shown earlier: " + ", ".join(unchanged))
+        return {"role": "user", "content": "\n".join(parts)}
+
+    def _needs_compaction(self) -> bool:
+        live = sum(chars for _, chars in self._sent.values())
+        return self._stale_chars >= self.min_stale_chars and self._stale_chars >= self.stale_ratio * (live + self._stale_chars)
+
+    def build(self, context) -> List[Dict[str, str]]:
+        """Input items for the next request; call it after the turn's user message was added."""
+        messages = context.messages
+        if self._history_rewritten(messages):
+            self._reset()
+            self.rebuilds += 1
+        new = messages[self._message_count:]
+        before_user = len(new) - 1 if new and new[-1].startswith("user: ") else len(new)
+        self._items.extend(message_item(message) for message in new[:before_user])
+        chunk = self._file_chunk(context)
+        if self._needs_compaction():
+            self._reset()
+            self.rebuilds += 1
+            self._items.extend(message_item(message) for message in messages[:len(messages) - len(new) + before_user])
+            chunk = self._file_chunk(context)
+        if chunk is not None:
+            self._items.append(chunk)
+        self._items.extend(message_item(message) for message in new[before_user:])
+        self._message_count = len(messages)
+        self._last_message = messages[-1] if messages else None
+        items = list(self._items)
+        self._measure(items)
+        return items
+
+    def _measure(self, items: List[Dict[str, str]]):
+        """Counts how much of this request repeats the start of the previous one."""
+        prefix = 0
+        for current, previous in zip(items, self._previous):
+            if current is not previous and current != previous:
+                break
+            prefix += _item_chars(current)
+        total = sum(_item_chars(item) for item in items)
+        self._previous = items
+        self.requests += 1
+        self.input_chars += total
+        self.prefix_chars += prefix
+        self.last_prefix_hit_rate = prefix / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Request counters and the share of input characters that repeat the previous request's prefix."""
+        return {
+            "requests": self.requests,
+            "rebuilds": self.rebuilds,
+            "items": len(self._items),
+            "files_sent": len(self._sent),
+            "stale_chars": self._stale_chars,
+            "input_chars": self.input_chars,
+            "prefix_chars": self.prefix_chars,
+            "prefix_hit_rate": self.prefix_chars / self.input_chars if self.input_chars else 0.0,
+            "last_prefix_hit_rate": self.last_prefix_hit_rate,
+        }
@@ -0,0 +1,210 @@
+# api/response_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from openai import NotGiven
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_CACHE_PATH = os.path.join(".opencoder", "response_cache.sqlite3")
+DEFAULT_TTL = 3600                      # Seconds, same as the old Helicone Cache-Control max-age
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024   # Least recently used entries are evicted past this
+MODES = ("off", "on", "record", "replay")
+# Request parameters that change the answer; headers, metadata and stream options do not
+KEY_FIELDS = (
+    "model", "messages", "tools", "tool_choice", "temperature", "top_p", "frequency_penalty",
+    "presence_penalty", "max_tokens", "response_format", "parallel_tool_calls", "reasoning_effort", "stream",
+)
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def cache_key(kwargs: Dict[str, Any]) -> str:
+    """Stable hash of the parts of a chat.completions.create() call that shape the answer."""
+    relevant = {
+        name: kwargs[name] for name in KEY_FIELDS
+        if name in kwargs and kwargs[name] is not None and not isinstance(kwargs[name], NotGiven)
+    }
+    relevant["stream"] = bool(relevant.get("stream"))
+    encoded = json.dumps(relevant, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache():
+    """
+    SQLite-backed store of chat completions, keyed by cache_key().
+
+    Entries expire after `ttl` seconds (None keeps them forever) and the least
+    recently used ones are evicted once the stored bodies exceed `max_bytes`.
+    Streamed responses are stored as their list of chunks.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = DEFAULT_TTL,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, stream INTEGER, body TEXT,"
+            " size INTEGER, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str, ignore_ttl: bool = False) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT body, created FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and not ignore_ttl and self.ttl is not None and now - row[1] > self.ttl:
+                self._delete(key)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, stream: bool, body: str):
+        size = len(body.encode())
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO responses (key, model, stream, body, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, int(stream), body, size, now, now),
+            )
+            self._total_bytes += size
+            self.stores += 1
+            self._evict()
+
+    def _delete(self, key: str):
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= row[0]
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores,
+                "evictions": self.evictions, "entries": entries, "bytes": self._total_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _ReplayStream():
+    """Async iterable over recorded chunks, standing in for openai.AsyncStream."""
+
+    def __init__(self, chunks: List[ChatCompletionChunk]):
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        for chunk in self._chunks:
+            yield chunk
+
+
+class _RecordingStream():
+    """Passes a live stream through and stores its chunks once it has been read to the end."""
+
+    def __init__(self, stream, on_complete):
+        self._stream = stream
+        self._on_complete = on_complete
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        chunks = []
+        async for chunk in self._stream:
+            chunks.append(chunk)
+            yield chunk
+        self._on_complete(chunks) # A stream abandoned half way is not stored
+
+
+class _Completions():
+    def __init__(self, cached_client: "CachedClient"):
+        self._cached_client = cached_client
+
+    async def create(self, **kwargs):
+        return await self._cached_client.create(**kwargs)
+
+
+class _Chat():
+    def __init__(self, cached_client: "CachedClient"):
+        self.completions = _Completions(cached_client)
+
+
+class CachedClient():
+    """
+    Puts a ResponseCache in front of chat.completions.create() of `client`
+    (an AsyncOpenAI client or a RequestScheduler).
+
+    Modes: "on" serves fresh entries and stores misses, "record" always calls
+    the API and stores the answer, "replay" only serves stored answers
+    (ignoring the TTL) and raises CacheMissError otherwise, so a recorded
+    session can be re-run offline at no API cost. "off" passes through.
+    """
+
+    def __init__(self, client, cache: ResponseCache, mode: str = "on"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {', '.join(MODES)}")
+        self._client = client
+        self.cache = cache
+        self.mode = mode
+        self.chat = _Chat(self)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def create(self, **kwargs):
+        if self.mode == "off":
+            return await self._client.chat.completions.create(**kwargs)
+        key = cache_key(kwargs)
+        stream = bool(kwargs.get("stream"))
+        if self.mode in ("on", "replay"):
+            body = self.cache.get(key, ignore_ttl=self.mode == "replay")
+            if body is not None:
+                if stream:
+                    return _ReplayStream([ChatCompletionChunk.model_validate(c) for c in json.loads(body)])
+                return ChatCompletion.model_validate_json(body)
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded response for this request to {kwargs.get('model')} (key {key[:12]})")
+
+        response = await self._client.chat.completions.create(**kwargs)
+        model = kwargs.get("model")
+        if stream:
+            return _RecordingStream(response, lambda chunks: self.cache.put(
+                key, model, True, json.dumps([chunk.model_dump(mode="json") for chunk in chunks])))
+        self.cache.put(key, model, False, response.model_dump_json())
+        return response
@@ -0,0 +1,237 @@
+# api/scheduler.py
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_RATE_PER_SECOND = 1.0 # Sustained request rate (token bucket refill)
+DEFAULT_BURST = 3             # Requests allowed back to back before pacing kicks in
+DEFAULT_MAX_ATTEMPTS = 6      # Total attempts per request, across all models
+BASE_BACKOFF = 0.5            # Seconds, doubled per consecutive failure of a model
+MAX_BACKOFF = 30.0
+EWMA_ALPHA = 0.3              # Weight of the newest sample in latency/error averages
+UNKNOWN_MODEL_SCORE = 5.0     # Score of a fallback model without history (seconds-ish)
+UNHEALTHY_ERROR_RATE = 0.5    # Above this the requested model gives its first place to the best fallback
+PROBE_INTERVAL = 10           # Every Nth request still goes to an unhealthy requested model first
+RETRIABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket():
+    """Paces requests to `rate` per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float = DEFAULT_RATE_PER_SECOND, capacity: float = DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class ModelStats():
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency: Optional[float] = None # EWMA of successful request latency, seconds
+    error_rate: float = 0.0         # EWMA of failures (0..1)
+    cooldown_until: float = 0.0     # time.monotonic() before which the model is skipped
+
+    def record(self, ok: bool, latency: Optional[float] = None):
+        self.requests += 1
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (0.0 if ok else 1.0)
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            self.latency = latency if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by the recent error rate."""
+        if self.requests == 0:
+            return UNKNOWN_MODEL_SCORE
+        latency = self.latency if self.latency is not None else UNKNOWN_MODEL_SCORE
+        return latency * (1 + 4 * self.error_rate)
+
+
+def is_retriable(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRIABLE_STATUS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _Completions():
+    def __init__(self, scheduler: "RequestScheduler"):
+        self._scheduler = scheduler
+
+    async def create(self, **kwargs):
+        return await self._scheduler.create(**kwargs)
+
+
+class _Chat():
+    def __init__(self, scheduler: "RequestScheduler"):
+        self.completions = _Completions(scheduler)
+
+
+class RequestScheduler():
+    """
+    Drop-in wrapper for an AsyncOpenAI client in front of chat.completions.create().
+
+    Adds token-bucket pacing, exponential backoff with jitter (honouring
+    Retry-After), fallback over an ordered list of models and, optionally,
+    hedged requests: if a non-streamed call has not answered after
+    `hedge_after` seconds a second one is sent to the next best model and the
+    first answer wins. Per-model latency/error averages reorder the fallback
+    list, so a model that keeps failing or is slow is tried later. Any other
+    attribute is delegated to the wrapped client.
+    """
+
+    def __init__(self, client, fallback_models: Optional[List[str]] = None,
+                 rate_per_second: float = DEFAULT_RATE_PER_SECOND, burst: float = DEFAULT_BURST,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, hedge_after: Optional[float] = None,
+                 dynamic_routing: bool = True):
+        self._client = client.with_options(max_retries=0) # Retries happen here, not in the client
+        self.fallback_models = list(fallback_models or [])
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_attempts = max_attempts
+        self.hedge_after = hedge_after
+        self.dynamic_routing = dynamic_routing
+        self.stats: Dict[str, ModelStats] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._routed = 0
+        self.chat = _Chat(self)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def _stats(self, model: str) -> ModelStats:
+        return self.stats.setdefault(model, ModelStats())
+
+    def route(self, requested: str) -> List[str]:
+        """Models to try, best first. The requested model leads unless it keeps failing."""
+        fallbacks = [model for model in self.fallback_models if model != requested]
+        if not self.dynamic_routing:
+            return [requested] + fallbacks
+        # Sort fallbacks by score; ties (e.g. no history yet) keep the configured order
+        fallbacks.sort(key=lambda model: (self._stats(model).score(), self.fallback_models.index(model)))
+        self._routed += 1
+        probe = self._routed % PROBE_INTERVAL == 0 # Lets a demoted model show it has recovered
+        if fallbacks and not probe and self._stats(requested).error_rate > UNHEALTHY_ERROR_RATE:
+            return fallbacks[:1] + [requested] + fallbacks[1:]
+        return [requested] + fallbacks
+
+    def _next_model(self, order: List[str]) -> Tuple[str, float]:
+        """First model not cooling down, or the one that recovers first (with the wait needed)."""
+        now = time.monotonic()
+        for model in order:
+            if self._stats(model).cooldown_until <= now:
+                return model, 0.0
+        model = min(order, key=lambda m: self._stats(m).cooldown_until)
+        return model, self._stats(model).cooldown_until - now
+
+    def _back_off(self, model: str, error: Exception):
+        stats = self._stats(model)
+        delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (stats.consecutive_failures - 1))
+        delay *= random.uniform(0.5, 1.5) # Jitter, so concurrent sessions do not retry in lockstep
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after) # The server's hint is a lower bound
+        stats.cooldown_until = time.monotonic() + delay
+
+    async def _call(self, model: str, kwargs: Dict[str, Any]):
+        await self.bucket.acquire()
+        started = time.perf_counter()
+        try:
+            response = await self._client.chat.completions.create(**{**kwargs, "model": model})
+        except Exception as e:
+            if is_retriable(e):
+                self._stats(model).record(ok=False)
+                self._back_off(model, e)
+            raise
+        self._stats(model).record(ok=True, latency=time.perf_counter() - started)
+        return response
+
+    async def _hedged_call(self, order: List[str], model: str, kwargs: Dict[str, Any]):
+        primary = asyncio.ensure_future(self._call(model, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        backup_model = next((m for m in order if m != model), model)
+        self.hedges += 1
+        logger.info(f"Hedging slow request to {model} with {backup_model}")
+        backup = asyncio.ensure_future(self._call(backup_model, kwargs))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def create(self, **kwargs):
+        requested = kwargs.get("model")
+        order = self.route(requested)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            model, wait = self._next_model(order)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                if self.hedge_after is not None and not kwargs.get("stream"):
+                    return await self._hedged_call(order, model, kwargs)
+                return await self._call(model, kwargs)
+            except Exception as e:
+                if not is_retriable(e):
+                    raise
+                last_error = e
+                order = [m for m in order if m != model] + [model] # Try the next model before this one again
+                logger.warning(f"Request to {model} failed (attempt {attempt + 1}/{self.max_attempts}): {e}")
+        raise last_error
+
+    def describe_stats(self) -> str:
+        lines = []
+        for model, stats in self.stats.items():
+            latency = f"{stats.latency:.2f}s" if stats.latency is not None else "n/a"
+            lines.append(f"{model}: {stats.successes}/{stats.requests} ok, latency {latency}, error rate {stats.error_rate:.2f}")
+        if self.hedges:
+            lines.append(f"hedged requests: {self.hedges}, won by the hedge: {self.hedge_wins}")
+        return "\n".join(lines)
@@ -0,0 +1,466 @@
+# api/search_index.py
+import fnmatch
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse # Python 3.11+
+except ImportError:
+    import sre_constants, sre_parse
+
+from .tree_index import IGNORED_NAMES
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_INDEX_PATH = os.path.join(".opencoder", "search_index.sqlite3")
+MAX_INDEXED_FILE_BYTES = 1024 * 1024 # Larger files are listed but not searchable
+BINARY_SNIFF_BYTES = 8192            # A NUL byte in this prefix marks the file as binary
+REFRESH_INTERVAL = 60                # Seconds before a search re-stats the workspace for external changes
+BULK_INDEX_FILES = 1000              # A refresh indexing this many files rebuilds the base segment at once
+MAX_DELTA_ROWS = 500000              # Delta postings folded into the base segment past this count
+STOP_INTERSECTING = 16               # Candidates left when no more posting lists are fetched
+MAX_MATCHED_FILES = 2000             # Files matched before a (too broad) search stops reading more
+DEFAULT_MAX_RESULTS = 50
+DEFAULT_MAX_PER_FILE = 5
+MAX_LINE_CHARS = 200                 # Matched lines are cut to this length in the results
+DEFINITION_LINE = re.compile(r"^\s*(?:async\s+)?(?:def|class|function|func|fn|interface|struct|type|enum|const|let|var)\b")
+
+
+def trigrams_of(data: bytes) -> Set[int]:
+    """Case-folded (ASCII) byte trigrams of data, packed into ints."""
+    data = data.lower()
+    return {int.from_bytes(trigram, "big") for trigram in {data[i:i + 3] for i in range(len(data) - 2)}}
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Literal strings every match of the regex must contain (e.g. "foo" and
+    "bar" for r"foo\\w+bar"). Branches and optional parts are skipped, so the
+    result may be empty; the search then has no index to narrow it down.
+    """
+    literals: List[str] = []
+
+    def walk(items):
+        current: List[str] = []
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                current.append(chr(av))
+                continue
+            if op is sre_constants.AT:
+                continue # Anchors are zero-width, the literal run goes on
+            if current:
+                literals.append("".join(current))
+                current = []
+            if op is sre_constants.SUBPATTERN:
+                walk(av[-1])
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+                walk(av[2])
+        if current:
+            literals.append("".join(current))
+
+    walk(sre_parse.parse(pattern, flags))
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+class IgnoreRules():
+    """IGNORED_NAMES plus the simple patterns of the workspace's top-level .gitignore (no negations)."""
+
+    def __init__(self, root: str, ignored_names: Iterable[str] = IGNORED_NAMES):
+        self.names = set(ignored_names) | {".opencoder"}
+        self.patterns: List[Tuple[str, bool, bool]] = [] # (pattern, anchored, directories only)
+        try:
+            with open(os.path.join(root, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith(("#", "!")):
+                        continue
+                    dir_only = line.endswith("/")
+                    line = line.rstrip("/")
+                    anchored = "/" in line
+                    self.patterns.append((line.lstrip("/"), anchored, dir_only))
+        except OSError:
+            pass
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        name = rel_path.rsplit("/", 1)[-1]
+        if name in self.names:
+            return True
+        for pattern, anchored, dir_only in self.patterns:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(rel_path if anchored else name, pattern):
+                return True
+        return False
+
+
+@dataclass
+class SearchMatch():
+    path: str   # Relative to the workspace root
+    line: int   # 1-based
+    text: str
+
+
+@dataclass
+class SearchResult():
+    matches: List[SearchMatch] = field(default_factory=list)
+    files_matched: int = 0
+    candidates: int = 0          # Files verified against the pattern
+    indexed: bool = True         # False if no literal could narrow the search down (every file was scanned)
+    truncated: bool = False
+    elapsed: float = 0.0         # Seconds
+
+
+
+
+class SearchIndex():
+    """
+    Trigram index of the text files of a workspace, stored in SQLite.
+
+    Every file's case-folded byte trigrams are indexed. A query is reduced to
+    the literals its matches must contain; the files holding all of their
+    trigrams are the candidates, and only those are read and matched with the
+    real regex.
+
+    Postings live in two places: a base segment with one sorted id list per
+    trigram (built in bulk, cheap to read) and a delta table with one row per
+    (trigram, file) for files indexed since. Deleted or re-indexed files get a
+    new id, so stale ids in the base are filtered out at query time. When the
+    delta grows past MAX_DELTA_ROWS, or a refresh finds many changed files,
+    the base is rebuilt from the per-file trigram sets without reading any file.
+
+    File tools report their changes through update_paths(), and so do shell
+    commands when the file watcher saw every directory of the index (see
+    directories()); everything else (editors) is picked up by refresh(), which
+    re-stats the workspace and only re-reads files whose mtime or size changed.
+    """
+
+    def __init__(self, root: str, path: Optional[str] = None, ignore: Optional[IgnoreRules] = None):
+        self.root = os.path.abspath(root)
+        self.path = path or os.path.join(self.root, DEFAULT_INDEX_PATH)
+        self.ignore = ignore or IgnoreRules(self.root)
+        self.stale = True # Refresh before the first search
+        self.last_refresh = 0.0
+        self._dirs: Set[str] = set() # Absolute paths of the directories walked, known after a refresh
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE, mtime_ns INTEGER, size INTEGER,"
+            " trigrams BLOB," # Sorted array("I"); NULL for binary/oversized files: known, but not searchable
+            " in_base INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS base (trigram INTEGER PRIMARY KEY, ids BLOB)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS delta (trigram INTEGER, file_id INTEGER,"
+            " PRIMARY KEY (trigram, file_id)) WITHOUT ROWID"
+        )
+        self._delta_rows = self._db.execute("SELECT COUNT(*) FROM delta").fetchone()[0]
+
+    # --- Paths ---
+
+    def _relative(self, abs_path: str) -> Optional[str]:
+        rel = os.path.relpath(abs_path, self.root)
+        if rel in (".", "..") or rel.startswith(".." + os.sep):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def _is_ignored(self, rel: str, is_dir: bool) -> bool:
+        parts = rel.split("/")
+        return any(self.ignore.is_ignored("/".join(parts[:i + 1]), is_dir or i < len(parts) - 1)
+                   for i in range(len(parts)))
+
+    # --- Indexing ---
+
+    @staticmethod
+    def _read_trigrams(abs_path: str, size: int) -> Optional[Set[int]]:
+        if size > MAX_INDEXED_FILE_BYTES:
+            return None
+        try:
+            with open(abs_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        return trigrams_of(data)
+
+    def _remove(self, file_id: int):
+        row = self._db.execute("SELECT trigrams, in_base FROM files WHERE id = ?", (file_id,)).fetchone()
+        if row is None:
+            return
+        trigrams, in_base = row
+        if trigrams and not in_base: # Base postings stay until the next rebuild, the dead id is filtered out
+            removed = self._db.executemany("DELETE FROM delta WHERE trigram = ? AND file_id = ?",
+                                           ((trigram, file_id) for trigram in array("I", trigrams)))
+            self._delta_rows -= removed.rowcount
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, abs_path: str, rel: str, stat: os.stat_result, to_delta: bool = True):
+        """Indexes one file under a fresh id. With to_delta=False the postings wait for _rebuild_base()."""
+        grams = self._read_trigrams(abs_path, stat.st_size)
+        packed = array("I", sorted(grams)).tobytes() if grams is not None else None
+        cursor = self._db.execute("INSERT INTO files (path, mtime_ns, size, trigrams) VALUES (?, ?, ?, ?)",
+                                  (rel, stat.st_mtime_ns, stat.st_size, packed))
+        if grams and to_delta:
+            file_id = cursor.lastrowid
+            self._db.executemany("INSERT INTO delta (trigram, file_id) VALUES (?, ?)",
+                                 ((trigram, file_id) for trigram in grams))
+            self._delta_rows += len(grams)
+
+    def _rebuild_base(self):
+        """Folds every file's trigrams into the base segment and empties the delta. Caller holds a transaction."""
+        lists: Dict[int, array] = {}
+        for file_id, trigrams in self._db.execute("SELECT id, trigrams FROM files WHERE trigrams IS NOT NULL ORDER BY id"):
+            for trigram in array("I", trigrams):
+                ids = lists.get(trigram)
+                if ids is None:
+                    ids = lists[trigram] = array("I")
+                ids.append(file_id)
+        self._db.execute("DELETE FROM base")
+        self._db.executemany("INSERT INTO base (trigram, ids) VALUES (?, ?)",
+                             ((trigram, ids.tobytes()) for trigram, ids in lists.items()))
+        self._db.execute("DELETE FROM delta")
+        self._db.execute("UPDATE files SET in_base = 1")
+        self._delta_rows = 0
+
+    def refresh(self) -> Dict[str, int]:
+        """Walks the workspace and re-indexes added/changed files, dropping deleted ones. Returns counters."""
+        with self._lock:
+            known = {path: (file_id, mtime_ns, size) for file_id, path, mtime_ns, size in
+                     self._db.execute("SELECT id, path, mtime_ns, size FROM files")}
+            changed: List[Tuple[str, str, os.stat_result]] = []
+            seen: Set[str] = set()
+            dirs: Set[str] = set()
+            stack = [(self.root, "")]
+            while stack:
+                directory, prefix = stack.pop()
+                dirs.add(directory)
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    rel = prefix + entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if not is_dir and not entry.is_file(follow_symlinks=False):
+                            continue # Symlinks, sockets...
+                    except OSError:
+                        continue
+                    if self.ignore.is_ignored(rel, is_dir):
+                        continue
+                    if is_dir:
+                        stack.append((entry.path, rel + "/"))
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    seen.add(rel)
+                    row = known.get(rel)
+                    if row is None or (row[1], row[2]) != (stat.st_mtime_ns, stat.st_size):
+                        changed.append((entry.path, rel, stat))
+
+            removed = [(rel, row[0]) for rel, row in known.items() if rel not in seen]
+            bulk = len(changed) >= BULK_INDEX_FILES
+            self._db.execute("BEGIN")
+            try:
+                for _rel, file_id in removed:
+                    self._remove(file_id)
+                for abs_path, rel, stat in changed:
+                    if rel in known:
+                        self._remove(known[rel][0])
+                    self._index_file(abs_path, rel, stat, to_delta=not bulk)
+                if bulk or self._delta_rows > MAX_DELTA_ROWS:
+                    self._rebuild_base()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._dirs = dirs
+            self.stale = False
+            self.last_refresh = time.monotonic()
+            return {"files": len(seen), "indexed": len(changed), "removed": len(removed), "rebuilt": bulk}
+
+    def update_paths(self, abs_paths: Iterable[str]):
+        """Re-indexes files (or whole directories) that were written, deleted or moved."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for abs_path in abs_paths:
+                    rel = self._relative(abs_path)
+                    if rel is None or self._is_ignored(rel, os.path.isdir(abs_path)):
+                        continue
+                    # Drop the path and anything below it, then index what exists now
+                    for (file_id,) in self._db.execute(
+                            "SELECT id FROM files WHERE path = ? OR path >= ? AND path < ?",
+                            (rel, rel + "/", rel + "0")).fetchall(): # "0" sorts right after "/"
+                        self._remove(file_id)
+                    if not os.path.isfile(abs_path): # A directory, or gone: forget the directories below
+                        below = abs_path + os.sep
+                        self._dirs = {d for d in self._dirs if d != abs_path and not d.startswith(below)}
+                    if os.path.isfile(abs_path):
+                        self._index_file(abs_path, rel, os.stat(abs_path))
+                    elif os.path.isdir(abs_path):
+                        for directory, dirs, files in os.walk(abs_path):
+                            self._dirs.add(directory)
+                            dir_rel = self._relative(directory)
+                            dirs[:] = [d for d in dirs if not self.ignore.is_ignored(f"{dir_rel}/{d}", True)]
+                            for name in files:
+                                file_rel = f"{dir_rel}/{name}"
+                                path = os.path.join(directory, name)
+                                if not self.ignore.is_ignored(file_rel, False) and os.path.isfile(path):
+                                    self._index_file(path, file_rel, os.stat(path))
+                if self._delta_rows > MAX_DELTA_ROWS:
+                    self._rebuild_base()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def mark_stale(self):
+        """Something outside the file tools (e.g. a shell command) may have changed the workspace."""
+        self.stale = True
+
+    def directories(self) -> List[str]:
+        """
+        The directories a change to the index could appear in, as of the last
+        refresh and updates (empty while stale). Watching all of them is enough
+        to know every path a command changed.
+        """
+        with self._lock:
+            return [] if self.stale else list(self._dirs)
+
+    # --- Searching ---
+
+    def _postings(self, trigram: int) -> Set[int]:
+        row = self._db.execute("SELECT ids FROM base WHERE trigram = ?", (trigram,)).fetchone()
+        ids = set(array("I", row[0])) if row is not None else set()
+        ids.update(file_id for (file_id,) in self._db.execute("SELECT file_id FROM delta WHERE trigram = ?", (trigram,)))
+        return ids
+
+    def _candidates(self, literals: List[str], case_sensitive: bool) -> Optional[Set[int]]:
+        """Ids of the files that may contain every literal (None if nothing narrows the search down)."""
+        grams: Set[int] = set()
+        for literal in literals:
+            if case_sensitive or literal.isascii(): # The index only folds ASCII case
+                grams |= trigrams_of(literal.encode("utf-8"))
+        if not grams:
+            return None
+        # Rarest trigrams first; once few candidates are left, reading them beats fetching more lists
+        marks = ",".join("?" * len(grams))
+        sizes = dict(self._db.execute(f"SELECT trigram, length(ids) FROM base WHERE trigram IN ({marks})", tuple(grams)))
+        candidates: Optional[Set[int]] = None
+        for trigram in sorted(grams, key=lambda g: sizes.get(g, 0)):
+            ids = self._postings(trigram)
+            candidates = ids if candidates is None else candidates & ids
+            if len(candidates) <= STOP_INTERSECTING:
+                break
+        return candidates
+
+    def _files(self, candidate_ids: Optional[Set[int]]) -> List[str]:
+        """Paths of the live candidate files (every searchable file for None), sorted."""
+        if candidate_ids is None:
+            return [path for (path,) in self._db.execute("SELECT path FROM files WHERE trigrams IS NOT NULL ORDER BY path")]
+        ids, paths = sorted(candidate_ids), []
+        for start in range(0, len(ids), 900): # Under SQLite's bound-parameter limit
+            chunk = ids[start:start + 900]
+            marks = ",".join("?" * len(chunk))
+            paths.extend(path for (path,) in self._db.execute(f"SELECT path FROM files WHERE id IN ({marks})", chunk))
+        return sorted(paths)
+
+    def search(self, query: str, regex: bool = False, case_sensitive: Optional[bool] = None,
+               path_glob: Optional[str] = None, max_results: int = DEFAULT_MAX_RESULTS,
+               max_per_file: int = DEFAULT_MAX_PER_FILE) -> SearchResult:
+        """
+        Finds `query` (a literal string, or a Python regex with regex=True).
+        Without case_sensitive the search is case-insensitive unless the query
+        has an uppercase letter. Files are ranked by definitions matched, then
+        path matches, then match count. Raises re.error for an invalid regex.
+        """
+        started = time.perf_counter()
+        if case_sensitive is None:
+            case_sensitive = query != query.lower()
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        pattern = query if regex else re.escape(query)
+        compiled = re.compile(pattern, flags)
+        literals = required_literals(pattern, flags) if regex else ([query] if len(query) >= 3 else [])
+
+        with self._lock:
+            if self.stale or time.monotonic() - self.last_refresh > REFRESH_INTERVAL:
+                self.refresh()
+            candidate_ids = self._candidates(literals, case_sensitive)
+            paths = self._files(candidate_ids)
+
+        result = SearchResult(indexed=candidate_ids is not None)
+        ranked = []
+        needle = query.lower()
+        for rel in paths:
+            if path_glob and not fnmatch.fnmatchcase(rel, path_glob):
+                continue
+            if len(ranked) >= MAX_MATCHED_FILES:
+                result.truncated = True # Ranking only covers the first files, the query is too broad
+                break
+            try:
+                with open(os.path.join(self.root, rel), "rb") as f:
+                    text = f.read().decode("utf-8", errors="replace")
+            except OSError:
+                self.stale = True # Deleted behind our back, the next search refreshes
+                continue
+            result.candidates += 1
+            lines: List[SearchMatch] = []
+            count = definitions = 0
+            line_number, position, last_line = 1, 0, 0
+            matches = compiled.finditer(text)
+            for match in matches:
+                count += 1
+                line_number += text.count("\n", position, match.start())
+                position = match.start()
+                if line_number == last_line:
+                    continue # One result per line
+                last_line = line_number
+                line_start = text.rfind("\n", 0, position) + 1
+                line_end = text.find("\n", position)
+                line = text[line_start:line_end if line_end >= 0 else len(text)]
+                definitions += bool(DEFINITION_LINE.match(line))
+                lines.append(SearchMatch(rel, line_number, line.strip()[:MAX_LINE_CHARS]))
+                if len(lines) == max_per_file:
+                    count += sum(1 for _ in matches) # Only counted from here on, for the ranking
+                    break
+            if count:
+                ranked.append(((-definitions, needle not in rel.lower(), -count, rel), lines, count))
+        ranked.sort(key=lambda item: item[0])
+        result.files_matched = len(ranked)
+        for _, lines, count in ranked:
+            room = max_results - len(result.matches)
+            result.matches.extend(lines[:room])
+            if len(lines) > room or count > len(lines):
+                result.truncated = True
+            if len(result.matches) >= max_results:
+                result.truncated = result.truncated or len(ranked) > 1
+                break
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, searchable = self._db.execute("SELECT COUNT(*), COUNT(trigrams) FROM files").fetchone()
+            trigrams = self._db.execute("SELECT COUNT(*) FROM base").fetchone()[0]
+        return {"files": files, "searchable": searchable, "trigrams": trigrams, "delta_rows": self._delta_rows,
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
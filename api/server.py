@@ -0,0 +1,229 @@
+# api/server.py
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .agent_runner import AgentRunner
+from .session import Session
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_MAX_SESSIONS = 256
+STREAM_LIMIT = 16 * 1024 * 1024 # Longest accepted request line (file contents travel inside it)
+
+# --- JSON-RPC 2.0 error codes ---
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _SessionEntry():
+    def __init__(self, session: Session, runner: AgentRunner):
+        self.session = session
+        self.runner = runner
+        self.lock = asyncio.Lock() # One turn at a time per conversation; sessions run concurrently
+
+
+class AgentServer():
+    """
+    Serves many independent agent sessions from one process over JSON-RPC 2.0,
+    one JSON object per line, on stdio or TCP.
+
+    Methods:
+        session.create {root?, session_id?}     -> {session_id, root}
+        session.close  {session_id}             -> {closed}
+        session.list   {}                       -> {sessions}
+        agent.run      {session_id, input, stream?} -> {output, stats}
+        context.get    {session_id}             -> {context}
+
+    With "stream": true, agent.run sends "agent.event" notifications
+    ({session_id, kind, text}) before its result. Requests are handled
+    concurrently, so one connection can drive several sessions at once.
+    """
+
+    def __init__(self, agent, workspace: Optional[str] = None, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.agent = agent
+        self.workspace = os.path.abspath(workspace or os.getcwd())
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, _SessionEntry] = {}
+        self.turns_completed = 0
+        self.active_turns = 0
+        self._methods: Dict[str, Callable[[dict, Callable], Awaitable[Any]]] = {
+            "session.create": self._session_create,
+            "session.close": self._session_close,
+            "session.list": self._session_list,
+            "agent.run": self._agent_run,
+            "context.get": self._context_get,
+        }
+
+    # --- Methods ---
+
+    def _entry(self, params: dict) -> _SessionEntry:
+        session_id = params.get("session_id")
+        if session_id not in self.sessions:
+            raise RpcError(INVALID_PARAMS, f"Unknown session '{session_id}'")
+        return self.sessions[session_id]
+
+    async def _session_create(self, params: dict, notify) -> dict:
+        if len(self.sessions) >= self.max_sessions:
+            raise RpcError(SERVER_ERROR, f"Too many sessions (max {self.max_sessions})")
+        workspace = os.path.realpath(self.workspace)
+        root = os.path.realpath(os.path.join(workspace, params.get("root") or "."))
+        if os.path.commonpath([workspace, root]) != workspace: # Absolute paths, "..", symlinks out
+            raise RpcError(INVALID_PARAMS, f"Workspace root must be inside the server workspace: '{params.get('root')}'")
+        if not os.path.isdir(root):
+            raise RpcError(INVALID_PARAMS, f"Workspace root is not a directory: '{root}'")
+        session_id = params.get("session_id")
+        if session_id in self.sessions:
+            raise RpcError(INVALID_PARAMS, f"Session '{session_id}' already exists")
+        session = Session(session_id, root=root)
+        self.sessions[session.id] = _SessionEntry(session, AgentRunner(self.agent, session))
+        return {"session_id": session.id, "root": session.root}
+
+    async def _session_close(self, params: dict, notify) -> dict:
+        entry = self._entry(params)
+        del self.sessions[entry.session.id]
+        async with entry.lock: # Let a running turn finish first
+            await entry.session.close()
+        return {"closed": True}
+
+    async def _session_list(self, params: dict, notify) -> dict:
+        return {"sessions": [{"session_id": session_id, "root": entry.session.root, "busy": entry.lock.locked()}
+                             for session_id, entry in self.sessions.items()]}
+
+    async def _agent_run(self, params: dict, notify) -> dict:
+        entry = self._entry(params)
+        user_input = params.get("input")
+        if not isinstance(user_input, str) or not user_input:
+            raise RpcError(INVALID_PARAMS, "'input' must be a non-empty string")
+        async with entry.lock:
+            self.active_turns += 1
+            try:
+                if params.get("stream"):
+                    output = ""
+                    async for event in entry.runner.run_streamed(user_input):
+                        if event.kind == "final":
+                            output = event.text
+                        else:
+                            await notify("agent.event", {"session_id": entry.session.id, "kind": event.kind, "text": event.text})
+                else:
+                    output = await entry.runner.run(user_input)
+            finally:
+                self.active_turns -= 1
+            self.turns_completed += 1
+        stats = entry.runner.last_turn
+        return {"output": output, "stats": {
+            "total_time": stats.total_time,
+            "time_to_first_token": stats.time_to_first_token,
+            "tool_calls": stats.tool_calls,
+        }}
+
+    async def _context_get(self, params: dict, notify) -> dict:
+        return {"context": self._entry(params).session.context.serialize()}
+
+    # --- Protocol ---
+
+    async def handle_line(self, line: bytes, send: Callable[[dict], Awaitable[None]]):
+        """Handles one request line; the response (and notifications) go through `send`."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            await send({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": f"Parse error: {e}"}})
+            return
+        request_id = request.get("id") if isinstance(request, dict) else None
+
+        async def notify(method: str, params: dict):
+            await send({"jsonrpc": "2.0", "method": method, "params": params})
+
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(INVALID_REQUEST, "Invalid request")
+            method = self._methods.get(request["method"])
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Unknown method '{request['method']}'")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "'params' must be an object")
+            result = await method(params, notify)
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except Exception as e:
+            logger.exception(f"Error handling request {request_id}:")
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": SERVER_ERROR, "message": str(e)}}
+        if request_id is not None: # Requests without an id are notifications: no answer
+            await send(response)
+
+    async def _serve_stream(self, reader: asyncio.StreamReader, write: Callable[[bytes], Awaitable[None]]):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(message: dict):
+            async with write_lock: # Responses of concurrent requests must not interleave
+                await write(json.dumps(message).encode() + b"\n")
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.ensure_future(self.handle_line(line, send))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def write(data: bytes):
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await self._serve_stream(reader, write)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """Starts listening and returns the asyncio server (port 0 picks a free port)."""
+        return await asyncio.start_server(self._handle_connection, host, port, limit=STREAM_LIMIT)
+
+    async def serve_stdio(self):
+        """
+        Serves requests from stdin until it closes. Protocol messages own stdout,
+        so everything the tools print is sent to stderr meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=STREAM_LIMIT)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        out = sys.stdout.buffer
+        sys.stdout = sys.stderr
+
+        async def write(data: bytes):
+            out.write(data)
+            out.flush()
+
+        try:
+            await self._serve_stream(reader, write)
+        finally:
+            sys.stdout = sys.__stdout__
+
+    async def close(self):
+        for entry in list(self.sessions.values()):
+            await entry.session.close()
+        self.sessions.clear()
@@ -0,0 +1,134 @@
+# api/session.py
+import os
+import uuid
+from typing import Dict, Iterable, Optional
+
+from .context import Context
+from .history import HistoryCompactor
+from .journal import DEFAULT_JOURNAL_DIR, SessionJournal
+from .locking import PathLocks
+from .prefetch import Prefetcher
+from .prompt_layout import PromptLayout
+from .search_index import SearchIndex
+from .symbol_index import SymbolIndex
+from .shell import ShellSession
+from .tree_index import TreeIndex
+from .watcher import FileWatcher
+
+
+class Session():
+    """
+    Everything one conversation owns: its Context, tree index, file watcher and
+    shell, plus the workspace root that relative tool paths resolve against
+    (None means the process working directory).
+    """
+
+    def __init__(self, session_id: Optional[str] = None, root: Optional[str] = None):
+        self.id = session_id or uuid.uuid4().hex[:12]
+        self.root = os.path.abspath(root) if root else None
+        self.context = Context()
+        self.tree_index = TreeIndex()
+        self.prompt_layout = PromptLayout() # How the context is sent to the model, per turn
+        self.path_locks = PathLocks()       # Orders conflicting tool calls of one step (api/tool_pool.py)
+        self.history = HistoryCompactor()   # Keeps context.messages within the token budget, between turns
+        self.prefetcher = Prefetcher(self.root) # Warms files ReadFile is likely to be asked for next
+        self.shell_session = ShellSession(cwd=self.root) # The shell process itself starts with the first command
+        self._watcher: Optional[FileWatcher] = None
+        self.journal: Optional[SessionJournal] = None
+        self._search_index: Optional[SearchIndex] = None
+        self._symbol_index: Optional[SymbolIndex] = None
+
+    @property
+    def watcher(self) -> FileWatcher:
+        if self._watcher is None: # Created on first use, it may open an inotify descriptor
+            self._watcher = FileWatcher(self.context, self.tree_index, resolve_path=self.resolve_path)
+        return self._watcher
+
+    @property
+    def search_index(self) -> SearchIndex:
+        if self._search_index is None: # Opened (and brought up to date) by the first search
+            self._search_index = SearchIndex(self.root or os.getcwd())
+        return self._search_index
+
+    @property
+    def symbol_index(self) -> SymbolIndex:
+        if self._symbol_index is None:
+            self._symbol_index = SymbolIndex(self.search_index)
+        return self._symbol_index
+
+    def files_changed(self, abs_paths: Iterable[str]):
+        """The file tools wrote, moved or deleted these paths: drops their prefetched copies and re-indexes them."""
+        abs_paths = list(abs_paths)
+        self.prefetcher.invalidate(abs_paths, self.id)
+        self.update_search_index(abs_paths)
+
+    def update_search_index(self, abs_paths: Iterable[str]):
+        """Re-indexes paths the file tools changed. Before the first search there is no index to update."""
+        if self._search_index is not None:
+            self._search_index.update_paths(abs_paths)
+
+    def mark_search_index_stale(self):
+        """Anything may have changed (e.g. a shell command ran): the next search re-stats the workspace."""
+        if self._search_index is not None:
+            self._search_index.mark_stale()
+
+    def watch_search_index(self) -> bool:
+        """
+        Puts every directory of an up-to-date search index under inotify, so the
+        changes of a command can be applied with apply_search_index_changes().
+        False if there is no such index or the watcher cannot see all of it.
+        """
+        index = self._search_index
+        if index is None or index.stale:
+            return False
+        return self.watcher.watch_directories(index.directories())
+
+    def apply_search_index_changes(self, changed_paths: Optional[Iterable[str]]):
+        """
+        Re-indexes the paths the watcher saw change while every directory was
+        watched (see watch_search_index()); None means the changes are unknown
+        and the next search re-stats the workspace.
+        """
+        if changed_paths is None:
+            self.mark_search_index_stale()
+        else:
+            self.update_search_index(changed_paths)
+
+    def resolve_path(self, path: str) -> str:
+        """Absolute path of `path` inside this session's workspace."""
+        if self.root is None:
+            return os.path.abspath(path)
+        return os.path.abspath(os.path.join(self.root, path))
+
+    def attach_journal(self, directory: Optional[str] = None, resume: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Starts journaling the context to `directory`/<session id> (default:
+        .opencoder/sessions in the workspace). With resume, the previous state is
+        restored first and the restore counters are returned; otherwise any
+        previous journal of this session id is discarded.
+        """
+        directory = directory or self.resolve_path(DEFAULT_JOURNAL_DIR)
+        self.journal = SessionJournal(os.path.join(directory, self.id), resolve_path=self.resolve_path)
+        report = None
+        if resume:
+            report = self.journal.restore(self.context, self.tree_index)
+        else:
+            self.journal.reset()
+        self.context.journal = self.journal
+        return report
+
+    async def close(self):
+        await self.history.wait() # A compaction in flight still reaches the journal
+        self.prefetcher.close()
+        if self.journal is not None:
+            self.journal.close() # Final snapshot, so the next resume reads one file
+        await self.shell_session.close()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        if self._symbol_index is not None:
+            self._symbol_index.close()
+            self._symbol_index = None
+        if self._search_index is not None:
+            self._search_index.close()
+            self._search_index = None
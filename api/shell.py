@@ -0,0 +1,237 @@
+# api/shell.py
+import asyncio
+import os
+import shlex
+import signal
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+# --- Configuration ---
+DEFAULT_OUTPUT_TAIL_BYTES = 16 * 1024 # Bytes kept per stream; older output is dropped
+READ_CHUNK = 64 * 1024
+
+
+class OutputRing():
+    """Keeps only the last `capacity` bytes written to it, and counts everything."""
+
+    def __init__(self, capacity: int = DEFAULT_OUTPUT_TAIL_BYTES):
+        self.capacity = capacity
+        self.total_bytes = 0
+        self._buffer = bytearray()
+
+    def write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        self._buffer += chunk
+        if len(self._buffer) > self.capacity:
+            del self._buffer[:len(self._buffer) - self.capacity]
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.total_bytes - len(self._buffer)
+
+    def text(self) -> str:
+        data = bytes(self._buffer)
+        if self.dropped_bytes:
+            newline = data.find(b"\n")
+            data = data[newline + 1:] if 0 <= newline < len(data) - 1 else data # Start on a whole line
+        text = data.decode("utf-8", errors="replace").strip()
+        if self.dropped_bytes:
+            text = f"[... {self.total_bytes - len(data)} earlier bytes dropped]\n{text}"
+        return text
+
+
+@dataclass
+class CommandResult():
+    command: str
+    returncode: Optional[int]  # None if the command timed out
+    stdout: str
+    stderr: str
+    output_bytes: int          # Total stdout + stderr bytes produced (before the tail cut)
+    wall_time: float
+    timed_out: bool = False
+
+
+async def _pump(stream: asyncio.StreamReader, ring: OutputRing):
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            return
+        ring.write(chunk)
+
+
+def _kill(process: asyncio.subprocess.Process):
+    """Kills the command and everything it spawned (it runs in its own process group)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_command(command: str, timeout: float, tail_bytes: int = DEFAULT_OUTPUT_TAIL_BYTES,
+                      cwd: Optional[str] = None) -> CommandResult:
+    """
+    Runs one shell command without blocking the event loop.
+
+    stdout/stderr are streamed into ring buffers that keep only the last
+    `tail_bytes` bytes each. On timeout (or cancellation) the whole process
+    group is killed; the event loop keeps running.
+    """
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True, # Own process group, so a timeout can kill children too
+    )
+    stdout, stderr = OutputRing(tail_bytes), OutputRing(tail_bytes)
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(_pump(process.stdout, stdout), _pump(process.stderr, stderr), process.wait()),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+        _kill(process)
+        await process.wait()
+    except asyncio.CancelledError:
+        _kill(process)
+        raise
+    return CommandResult(
+        command=command,
+        returncode=None if timed_out else process.returncode,
+        stdout=stdout.text(),
+        stderr=stderr.text(),
+        output_bytes=stdout.total_bytes + stderr.total_bytes,
+        wall_time=time.perf_counter() - started,
+        timed_out=timed_out,
+    )
+
+
+class ShellSessionError(Exception):
+    """The persistent shell died (e.g. the command ran `exit`)."""
+
+
+class ShellSession():
+    """
+    A long-lived shell (pipe-backed) that runs commands one after another.
+
+    Each command is sent through `eval` followed by sentinel lines on stdout and
+    stderr that carry the exit code, so consecutive commands cost no process
+    spawn and keep `cd`, exported variables and activated virtualenvs. A command
+    that times out kills the shell; the next command starts a fresh one.
+    """
+
+    def __init__(self, shell: Optional[str] = None, cwd: Optional[str] = None,
+                 tail_bytes: int = DEFAULT_OUTPUT_TAIL_BYTES):
+        self.shell = shell or ("/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh")
+        self.cwd = cwd
+        self.tail_bytes = tail_bytes
+        self.commands_run = 0
+        self.restarts = 0
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def _start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            self.shell,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            start_new_session=True,
+        )
+
+    async def _read_until(self, stream: asyncio.StreamReader, marker: bytes, ring: OutputRing) -> bytes:
+        """Feeds `ring` until `marker` shows up, then returns the rest of the marker line."""
+        pending = b""
+        while True:
+            chunk = await stream.read(READ_CHUNK)
+            if not chunk:
+                raise ShellSessionError("shell exited")
+            pending += chunk
+            index = pending.find(marker)
+            if index >= 0:
+                ring.write(pending[:index - 1] if index else pending[:index]) # Drop the newline printed before the marker
+                rest = pending[index + len(marker):]
+                while b"\n" not in rest:
+                    chunk = await stream.read(READ_CHUNK)
+                    if not chunk:
+                        raise ShellSessionError("shell exited")
+                    rest += chunk
+                return rest.split(b"\n", 1)[0]
+            keep = len(marker) - 1 # The marker may be split across two chunks
+            ring.write(pending[:-keep])
+            pending = pending[-keep:]
+
+    async def run(self, command: str, timeout: float, tail_bytes: Optional[int] = None) -> CommandResult:
+        tail_bytes = tail_bytes or self.tail_bytes
+        async with self._lock:
+            if not self.alive:
+                await self._start()
+            process = self._process
+            marker = f"__OPENCODER_DONE_{uuid.uuid4().hex}__".encode()
+            script = (
+                f"eval {shlex.quote(command)} < /dev/null\n"
+                f"__opencoder_rc=$?\n"
+                f"printf '\\n%s %d\\n' '{marker.decode()}' \"$__opencoder_rc\"\n"
+                f"printf '\\n%s\\n' '{marker.decode()}' >&2\n"
+            )
+            stdout, stderr = OutputRing(tail_bytes), OutputRing(tail_bytes)
+            started = time.perf_counter()
+            timed_out = False
+            returncode: Optional[int] = None
+            try:
+                process.stdin.write(script.encode())
+                await process.stdin.drain()
+                results = await asyncio.wait_for(
+                    asyncio.gather(self._read_until(process.stdout, marker, stdout),
+                                   self._read_until(process.stderr, marker, stderr),
+                                   return_exceptions=True),
+                    timeout=timeout,
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+                returncode = int(results[0].strip() or 0)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self.restarts += 1
+                await self.close() # The command may still be running: drop the whole session
+            except (ShellSessionError, BrokenPipeError, ConnectionResetError):
+                returncode = await process.wait()
+                self._process = None
+                self.restarts += 1
+                stderr.write(b"\n[shell session ended, a new one will be started]")
+            except asyncio.CancelledError:
+                await self.close()
+                raise
+            self.commands_run += 1
+            return CommandResult(
+                command=command,
+                returncode=returncode,
+                stdout=stdout.text(),
+                stderr=stderr.text(),
+                output_bytes=stdout.total_bytes + stderr.total_bytes,
+                wall_time=time.perf_counter() - started,
+                timed_out=timed_out,
+            )
+
+    async def close(self):
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            _kill(self._process)
+            await self._process.wait()
+        self._process = None
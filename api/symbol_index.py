@@ -0,0 +1,329 @@
+# api/symbol_index.py
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .search_index import DEFAULT_MAX_RESULTS, SearchIndex, SearchMatch
+
+# --- Configuration ---
+DEFAULT_CACHE_PATH = os.path.join(".opencoder", "symbol_cache.sqlite3")
+PARSER_VERSION = 1             # Bump when parsing changes, so cached outlines are recomputed
+MAX_PARSED_FILE_BYTES = 2 * 1024 * 1024
+MAX_SIGNATURE_CHARS = 160
+MAX_DEFINITIONS = 20           # Definitions returned for one name
+
+# ctags-style patterns per file extension: (kind, regex with a "name" group). Anchored at line start.
+_JS_PATTERNS = [
+    ("class", r"\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[A-Za-z_$][\w$]*)"),
+    ("function", r"\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)"),
+    ("function", r"\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)"),
+    ("interface", r"\s*(?:export\s+)?interface\s+(?P<name>[A-Za-z_$][\w$]*)"),
+    ("type", r"\s*(?:export\s+)?type\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\s*="),
+    ("enum", r"\s*(?:export\s+)?(?:const\s+)?enum\s+(?P<name>[A-Za-z_$][\w$]*)"),
+    ("method", r"\s+(?:(?:public|private|protected|static|async|readonly|override|get|set)\s+)*(?P<name>(?!(?:if|for|while|switch|catch|return|function|new|typeof)\b)[A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\([^;]*\)\s*(?::\s*[^{;]+)?\{\s*$"),
+]
+_C_LIKE_PATTERNS = [
+    ("class", r"\s*(?:(?:public|private|protected|internal|abstract|final|static|sealed|partial|data|open)\s+)*(?:class|struct|interface|enum|record|trait|object)\s+(?P<name>[A-Za-z_]\w*)"),
+    ("function", r"\s*(?:(?:public|private|protected|internal|static|final|abstract|virtual|override|async|inline|extern|const|unsafe|synchronized|native)\s+)*(?:[\w:<>\[\],*&]+\s+)+[*&]*(?P<name>(?!(?:if|for|while|switch|return|else|new|delete|catch|sizeof)\b)[A-Za-z_]\w*)\s*\([^;]*$"),
+    ("function", r"\s*(?:(?:private|public|protected|internal|override|suspend|inline)\s+)*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?(?P<name>[A-Za-z_]\w*)"),
+    ("function", r"\s*def\s+(?P<name>[A-Za-z_]\w*)"), # Scala
+]
+LANGUAGE_PATTERNS: Dict[str, List[Tuple[str, str]]] = {
+    "javascript": _JS_PATTERNS,
+    "go": [
+        ("function", r"func\s+(?:\([^)]*\)\s*)?(?P<name>[A-Za-z_]\w*)"),
+        ("type", r"\s*type\s+(?P<name>[A-Za-z_]\w*)\s+(?:struct|interface|func|\w)"),
+    ],
+    "rust": [
+        ("function", r"\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?(?:extern\s+\"[^\"]*\"\s+)?fn\s+(?P<name>[A-Za-z_]\w*)"),
+        ("type", r"\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union|type|mod)\s+(?P<name>[A-Za-z_]\w*)"),
+        ("impl", r"\s*impl(?:<[^>]*>)?\s+(?:[\w:<>, ]+\s+for\s+)?(?P<name>[A-Za-z_]\w*)"),
+    ],
+    "c_like": _C_LIKE_PATTERNS,
+    "ruby": [
+        ("class", r"\s*(?:class|module)\s+(?P<name>[A-Z]\w*(?:::\w+)*)"),
+        ("function", r"\s*def\s+(?:self\.)?(?P<name>[A-Za-z_]\w*[?!=]?)"),
+    ],
+    "php": [
+        ("class", r"\s*(?:(?:abstract|final)\s+)?(?:class|interface|trait|enum)\s+(?P<name>[A-Za-z_]\w*)"),
+        ("function", r"\s*(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+&?(?P<name>[A-Za-z_]\w*)"),
+    ],
+    "shell": [
+        ("function", r"\s*(?:function\s+(?P<name>[A-Za-z_][\w-]*)|(?P<name2>[A-Za-z_][\w-]*)\s*\(\)\s*\{?)"),
+    ],
+    "python_fallback": [ # Python files ast cannot parse (syntax errors, other versions)
+        ("class", r"\s*class\s+(?P<name>[A-Za-z_]\w*)"),
+        ("function", r"\s*(?:async\s+)?def\s+(?P<name>[A-Za-z_]\w*)"),
+    ],
+}
+EXTENSIONS = {
+    ".py": "python", ".pyi": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "javascript", ".tsx": "javascript",
+    ".go": "go", ".rs": "rust",
+    ".java": "c_like", ".kt": "c_like", ".kts": "c_like", ".scala": "c_like", ".cs": "c_like", ".swift": "c_like",
+    ".c": "c_like", ".h": "c_like", ".cc": "c_like", ".cpp": "c_like", ".cxx": "c_like", ".hpp": "c_like", ".m": "c_like",
+    ".rb": "ruby", ".php": "php", ".sh": "shell", ".bash": "shell", ".zsh": "shell",
+}
+_COMPILED = {language: [(kind, re.compile(pattern)) for kind, pattern in patterns]
+             for language, patterns in LANGUAGE_PATTERNS.items()}
+BRACE_LANGUAGES = {"javascript", "go", "rust", "c_like", "php", "shell"}
+HASH_COMMENT_LANGUAGES = {"ruby", "shell", "php", "python_fallback"}
+
+
+@dataclass
+class Symbol():
+    name: str
+    kind: str                        # "class", "function", "method", "variable", ...
+    line: int                        # 1-based first line (decorators excluded)
+    end_line: Optional[int]          # Last line, when the parser can tell
+    signature: str                   # One line: "def f(a, b) -> int", "class A(B)", ...
+    parent: Optional[str] = None     # Qualified name of the enclosing class/function
+    doc: Optional[str] = None        # First line of the docstring
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.parent}.{self.name}" if self.parent else self.name
+
+
+def language_of(path: str) -> Optional[str]:
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+# --- Python ---
+
+def _first_doc_line(node) -> Optional[str]:
+    doc = ast.get_docstring(node, clean=True) if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) else None
+    return doc.strip().splitlines()[0][:MAX_SIGNATURE_CHARS] if doc and doc.strip() else None
+
+
+def _python_signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def parse_python(text: str) -> List[Symbol]:
+    """Classes, functions, methods and module/class-level assignments. Raises SyntaxError."""
+    tree = ast.parse(text)
+    lines = text.splitlines()
+    symbols: List[Symbol] = []
+
+    def visit(body, parent: Optional[str], in_class: bool):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(node, ast.ClassDef) else ("method" if in_class else "function")
+                decorators = "".join(f"@{ast.unparse(d)} " for d in node.decorator_list)
+                symbols.append(Symbol(node.name, kind, node.lineno, node.end_lineno,
+                                      (decorators + _python_signature(node))[:MAX_SIGNATURE_CHARS],
+                                      parent, _first_doc_line(node)))
+                qualified = f"{parent}.{node.name}" if parent else node.name
+                visit(node.body, qualified, isinstance(node, ast.ClassDef))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and (parent is None or in_class):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        source = lines[node.lineno - 1].strip() if node.lineno <= len(lines) else target.id
+                        symbols.append(Symbol(target.id, "variable", node.lineno, node.end_lineno,
+                                              source[:MAX_SIGNATURE_CHARS], parent))
+            elif isinstance(node, (ast.If, ast.Try, ast.With)) and parent is None:
+                # Module-level "if TYPE_CHECKING:", "try: import ...": look inside
+                visit(node.body, parent, in_class)
+                for handler in getattr(node, "handlers", []):
+                    visit(handler.body, parent, in_class)
+                visit(getattr(node, "orelse", []), parent, in_class)
+
+    visit(tree.body, None, False)
+    return symbols
+
+
+# --- Other languages ---
+
+def _block_end(lines: List[str], start: int) -> Optional[int]:
+    """1-based last line of the {...} block opening at or after lines[start] (0-based), by counting braces."""
+    depth, opened = 0, False
+    for index in range(start, min(len(lines), start + 5000)):
+        line = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|//.*$', "", lines[index]) # Braces in strings/comments
+        for char in line:
+            if char == "{":
+                depth += 1
+                opened = True
+            elif char == "}":
+                depth -= 1
+        if opened and depth <= 0:
+            return index + 1
+        if not opened and (line.rstrip().endswith(";") or index - start > 3):
+            return None # Declaration without a body
+    return None
+
+
+def parse_generic(text: str, language: str) -> List[Symbol]:
+    """Line-based, ctags-style symbol extraction. Nesting is derived from brace blocks."""
+    patterns = _COMPILED.get(language, [])
+    lines = text.splitlines()
+    symbols: List[Symbol] = []
+    containers: List[Symbol] = [] # Open classes/types, innermost last
+    comment_prefixes = ("//", "*") + (("#",) if language in HASH_COMMENT_LANGUAGES else ())
+    in_comment = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if in_comment:
+            in_comment = "*/" not in stripped
+            continue
+        if stripped.startswith("/*"):
+            in_comment = "*/" not in stripped
+            continue
+        if not stripped or stripped.startswith(comment_prefixes):
+            continue
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match is None:
+                continue
+            name = match.group("name") if match.groupdict().get("name") else match.groupdict().get("name2")
+            if not name:
+                continue
+            while containers and containers[-1].end_line is not None and containers[-1].end_line < index + 1:
+                containers.pop()
+            end_line = _block_end(lines, index) if language in BRACE_LANGUAGES else None
+            parent = containers[-1].qualified_name if containers else None
+            if kind == "function" and parent and language != "go":
+                kind = "method"
+            signature = stripped.split("{")[0].rstrip() or stripped
+            symbol = Symbol(name, kind, index + 1, end_line, signature[:MAX_SIGNATURE_CHARS], parent)
+            symbols.append(symbol)
+            if kind in ("class", "interface", "type", "impl", "enum") and end_line is not None:
+                containers.append(symbol)
+            break
+    return symbols
+
+
+def parse_symbols(path: str, text: str) -> List[Symbol]:
+    language = language_of(path)
+    if language == "python":
+        try:
+            return parse_python(text)
+        except (SyntaxError, ValueError, RecursionError):
+            return parse_generic(text, "python_fallback")
+    if language is None:
+        return []
+    return parse_generic(text, language)
+
+
+
+# --- Index ---
+
+class SymbolIndex():
+    """
+    Symbols of workspace files, parsed on demand and cached by content hash.
+
+    A file is only re-read when its mtime or size changed, and only re-parsed
+    when its content hash is new, so identical files (or a file switching back
+    to an older version) cost nothing. Definitions and references are looked
+    up through the SearchIndex: only files containing the name are parsed.
+    """
+
+    def __init__(self, search_index: SearchIndex, path: Optional[str] = None):
+        self.search_index = search_index
+        self.root = search_index.root
+        self.path = path or os.path.join(self.root, DEFAULT_CACHE_PATH)
+        self.parsed = 0
+        self.cache_hits = 0
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Tuple[int, int, str]] = {} # abs path -> (mtime_ns, size, content hash)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outlines (hash TEXT PRIMARY KEY, symbols TEXT)")
+
+    def symbols(self, abs_path: str) -> List[Symbol]:
+        """Symbols of one file. Raises OSError if it cannot be read."""
+        stat = os.stat(abs_path)
+        if stat.st_size > MAX_PARSED_FILE_BYTES or language_of(abs_path) is None:
+            return []
+        with self._lock:
+            known = self._stats.get(abs_path)
+            if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                digest = known[2]
+                text = None
+            else:
+                with open(abs_path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha1(data + f"\0{PARSER_VERSION}\0{language_of(abs_path)}".encode()).hexdigest()
+                self._stats[abs_path] = (stat.st_mtime_ns, stat.st_size, digest)
+                text = data.decode("utf-8", errors="replace")
+            row = self._db.execute("SELECT symbols FROM outlines WHERE hash = ?", (digest,)).fetchone()
+            if row is not None:
+                self.cache_hits += 1
+                return [Symbol(**entry) for entry in json.loads(row[0])]
+            if text is None: # Cache row gone (e.g. the file was deleted by hand): read again
+                with open(abs_path, "rb") as f:
+                    text = f.read().decode("utf-8", errors="replace")
+            symbols = parse_symbols(abs_path, text)
+            self._db.execute("INSERT OR REPLACE INTO outlines (hash, symbols) VALUES (?, ?)",
+                             (digest, json.dumps([asdict(symbol) for symbol in symbols])))
+            self.parsed += 1
+            return symbols
+
+    def definitions(self, name: str, path_glob: Optional[str] = None) -> List[Tuple[str, Symbol]]:
+        """(relative path, symbol) of every definition of `name` (or of a qualified "Class.method")."""
+        short = name.rsplit(".", 1)[-1]
+        result = self.search_index.search(rf"\b{re.escape(short)}\b", regex=True, case_sensitive=True,
+                                          path_glob=path_glob, max_results=10 ** 6, max_per_file=1)
+        found = []
+        for path in dict.fromkeys(match.path for match in result.matches):
+            try:
+                symbols = self.symbols(os.path.join(self.root, path))
+            except OSError:
+                continue
+            found.extend((path, symbol) for symbol in symbols
+                         if symbol.name == short and (short == name or symbol.qualified_name.endswith(name)))
+        # Classes and functions before variables, then by path depth (top-level modules first)
+        found.sort(key=lambda item: (item[1].kind == "variable", item[0].count("/"), item[0], item[1].line))
+        return found[:MAX_DEFINITIONS]
+
+    def references(self, name: str, path_glob: Optional[str] = None,
+                   max_results: int = DEFAULT_MAX_RESULTS) -> List[Tuple[SearchMatch, bool]]:
+        """Lines mentioning `name` as a whole word, each flagged True if it is a definition."""
+        short = name.rsplit(".", 1)[-1]
+        result = self.search_index.search(rf"\b{re.escape(short)}\b", regex=True, case_sensitive=True,
+                                          path_glob=path_glob, max_results=max_results, max_per_file=max_results)
+        definition_lines = {}
+        for match in result.matches:
+            if match.path not in definition_lines:
+                try:
+                    symbols = self.symbols(os.path.join(self.root, match.path))
+                except OSError:
+                    symbols = []
+                definition_lines[match.path] = {symbol.line for symbol in symbols if symbol.name == short}
+        return [(match, match.line in definition_lines[match.path]) for match in result.matches]
+
+    def stats(self) -> dict:
+        with self._lock:
+            outlines = self._db.execute("SELECT COUNT(*) FROM outlines").fetchone()[0]
+        return {"parsed": self.parsed, "cache_hits": self.cache_hits, "cached_outlines": outlines}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def render_outline(path: str, symbols: List[Symbol], total_lines: Optional[int] = None) -> str:
+    """One line per symbol, indented by nesting: "  12-40  class Session(...)  # first doc line"."""
+    header = f"{path}: {len(symbols)} symbol(s)" + (f", {total_lines} lines" if total_lines is not None else "")
+    lines = [header]
+    for symbol in symbols:
+        depth = symbol.parent.count(".") + 1 if symbol.parent else 0
+        span = f"{symbol.line}-{symbol.end_line}" if symbol.end_line and symbol.end_line != symbol.line else str(symbol.line)
+        doc = f"  # {symbol.doc}" if symbol.doc else ""
+        lines.append(f"{'  ' * depth}{span:>9}  {symbol.signature}{doc}")
+    return "\n".join(lines)
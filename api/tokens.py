@@ -0,0 +1,67 @@
+# api/tokens.py
+import functools
+import importlib.util
+import logging
+import os
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from .context import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_ENCODING = "o200k_base" # tiktoken encoding (OPENCODER_TOKEN_ENCODING); close enough for non-OpenAI models
+MAX_CACHED_COUNTS = 4096        # Texts whose token count TokenCounter remembers (least recently used go first)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(name: Optional[str] = None):
+    """The tiktoken encoding, or None (estimate from characters) when tiktoken or its data is unavailable."""
+    name = name or os.getenv("OPENCODER_TOKEN_ENCODING", DEFAULT_ENCODING)
+    if importlib.util.find_spec("tiktoken") is None:
+        logger.warning("tiktoken is not installed (see requirements.txt), estimating tokens from characters")
+        return None
+    import tiktoken
+    try:
+        return tiktoken.get_encoding(name) # Downloads the encoding on first use
+    except Exception as e:
+        logger.warning(f"tiktoken encoding '{name}' unavailable ({e}), estimating tokens from characters")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoder = get_encoder()
+    if encoder is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+class TokenCounter():
+    """count_tokens() with an LRU cache, for message lists that are counted again every turn."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_COUNTS):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+
+    @property
+    def exact(self) -> bool:
+        return get_encoder() is not None
+
+    def count(self, text: str) -> int:
+        tokens = self._cache.get(text)
+        if tokens is not None:
+            self._cache.move_to_end(text)
+            return tokens
+        tokens = self._cache[text] = count_tokens(text)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def total(self, texts: Iterable[str]) -> int:
+        return sum(self.count(text) for text in texts)
+
+    def retain(self, texts: Iterable[str]):
+        """Forgets every cached count but those of `texts` (the current messages)."""
+        live = set(texts)
+        self._cache = OrderedDict((text, tokens) for text, tokens in self._cache.items() if text in live)
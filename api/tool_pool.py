@@ -0,0 +1,76 @@
+# api/tool_pool.py
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from .context_handler import get_session, resolve_path
+from .locking import Claim
+
+# --- Configuration ---
+DEFAULT_TOOL_WORKERS = 8 # Threads running synchronous tools, shared by all sessions (OPENCODER_TOOL_WORKERS)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("OPENCODER_TOOL_WORKERS", DEFAULT_TOOL_WORKERS))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="opencoder-tool")
+        return _executor
+
+
+def reads(path: Optional[str] = None) -> Claim:
+    """Shared claim on a workspace path and what is below it (no path: the whole workspace)."""
+    return (resolve_path(path) if path is not None else None, False)
+
+
+def writes(path: Optional[str] = None) -> Claim:
+    """Exclusive claim on a workspace path and what is below it (no path: the whole workspace)."""
+    return (resolve_path(path) if path is not None else None, True)
+
+
+def concurrent_tool(claims: Callable[..., Iterable[Claim]]):
+    """
+    Lets the agent SDK run a tool concurrently with the other calls of the
+    same step. `claims` gets the tool's arguments by name and returns the
+    paths the call reads or writes (reads()/writes()); calls whose claims
+    conflict wait for each other in the session's PathLocks. Synchronous
+    tools run on the bounded tool thread pool with the caller's contextvars
+    (session, metrics), async tools on the event loop. Goes right under
+    @function_tool.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        is_async = inspect.iscoroutinefunction(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            claimed = list(claims(**bound.arguments))
+            locks = get_session().path_locks
+            await locks.acquire(claimed)
+            if is_async:
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    locks.release(claimed)
+            loop = asyncio.get_running_loop()
+            future = get_tool_executor().submit(contextvars.copy_context().run, func, *args, **kwargs)
+            try:
+                return await asyncio.wrap_future(future)
+            finally:
+                if future.done():
+                    locks.release(claimed)
+                else: # Cancelled while the thread runs: keep its paths locked until it ends
+                    future.add_done_callback(lambda _: loop.call_soon_threadsafe(locks.release, claimed))
+        return wrapper
+    return decorator
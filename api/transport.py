@@ -0,0 +1,122 @@
+# api/transport.py
+import asyncio
+import importlib.util
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 120.0 # Seconds; httpx keeps idle connections 5s, shorter than a user's thinking time
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 600.0     # Slow models can take minutes before the last token
+DEFAULT_WRITE_TIMEOUT = 30.0
+DEFAULT_POOL_TIMEOUT = 30.0      # Waiting for a free connection when all max_connections are busy
+
+
+class PoolMetrics():
+    """
+    Connection-pool counters collected from httpcore's "trace" extension:
+    how many requests reused a pooled connection and what opening new ones cost
+    (TCP connect plus TLS handshake).
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.connect_time = 0.0 # Seconds spent in connect_tcp + start_tls, summed
+        self.connect_failures = 0
+
+    @property
+    def reused_requests(self) -> int:
+        return max(0, self.requests - self.connections_opened)
+
+    @property
+    def reuse_rate(self) -> float:
+        return self.reused_requests / self.requests if self.requests else 0.0
+
+    @property
+    def average_connect_time(self) -> float:
+        return self.connect_time / self.connections_opened if self.connections_opened else 0.0
+
+    async def on_request(self, request: httpx.Request):
+        """httpx "request" event hook: attaches a trace callback to the outgoing request."""
+        self.requests += 1
+        started = {}
+
+        async def trace(event_name: str, info: dict):
+            step, _, phase = event_name.rpartition(".")
+            if not (step.endswith("connect_tcp") or step.endswith("start_tls")):
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase in ("complete", "failed") and step in started:
+                self.connect_time += time.perf_counter() - started.pop(step)
+                if phase == "failed":
+                    self.connect_failures += 1
+                elif step.endswith("connect_tcp"):
+                    self.connections_opened += 1
+
+        request.extensions["trace"] = trace
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "reuse_rate": round(self.reuse_rate, 3),
+            "average_connect_ms": round(self.average_connect_time * 1000, 2),
+            "connect_failures": self.connect_failures,
+        }
+
+
+def build_http_client(max_connections: int = DEFAULT_MAX_CONNECTIONS, max_keepalive: int = DEFAULT_MAX_KEEPALIVE,
+                      keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY, http2: bool = False,
+                      connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                      write_timeout: float = DEFAULT_WRITE_TIMEOUT, pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+                      metrics: Optional[PoolMetrics] = None) -> httpx.AsyncClient:
+    """
+    The httpx client handed to AsyncOpenAI(http_client=...): an explicit pool
+    with long-lived keep-alive connections, per-phase timeouts and, if the
+    `h2` package is installed, HTTP/2 (many streams over one connection).
+    """
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout),
+        http2=http2,
+        follow_redirects=True,
+        event_hooks={"request": [metrics.on_request]} if metrics is not None else None,
+    )
+
+
+async def warm_up(http_client: httpx.AsyncClient, base_url: str, connections: int = 1, timeout: float = 10.0) -> int:
+    """
+    Opens `connections` pooled connections to `base_url` ahead of the first model
+    call, so it does not pay DNS, TCP, TLS and proxy setup. Any HTTP answer
+    (even 401/404) leaves a usable keep-alive connection behind. Returns how many
+    requests got an answer; failures are only logged.
+    """
+    url = str(base_url).rstrip("/") + "/models"
+
+    async def one() -> bool:
+        try:
+            response = await http_client.get(url, timeout=timeout)
+            await response.aclose()
+            return True
+        except httpx.HTTPError as e:
+            logger.info(f"Connection warm-up to {url} failed: {e}")
+            return False
+
+    results = await asyncio.gather(*(one() for _ in range(connections)))
+    return sum(results)
@@ -0,0 +1,233 @@
+# api/tree_index.py
+import os
+import threading
+from typing import Dict, Iterable, List, Set
+
+from .locking import synchronized
+
+# --- Configuration ---
+IGNORED_NAMES = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox", ".idea", ".DS_Store",
+})
+DEFAULT_MAX_DEPTH = 8          # Directories deeper than this are listed but not expanded
+DEFAULT_MAX_ENTRIES = 2000     # Lines rendered per tree before truncating
+DEFAULT_MAX_SCAN_ENTRIES = 50000 # Entries scanned per scan() call before giving up on deeper levels
+TREE_KEY_PREFIX = "tree_of_"
+
+
+def tree_key(abs_path: str) -> str:
+    """Context key of the rendered tree for a directory (keyed by absolute path)."""
+    return f"{TREE_KEY_PREFIX}{abs_path}"
+
+
+class TreeIndex():
+    """
+    In-memory index of the workspace directory structure.
+
+    Directories are scanned once with os.scandir and kept as a flat mapping
+    `abs_dir -> {name: is_dir}`. File tools patch the mapping in place after a
+    mutation, so rendering a tree again never touches the disk. Directories
+    that were not scanned (depth/entry caps) are simply absent from the mapping.
+    Public methods hold `lock`, tools patch it from several threads.
+    """
+
+    def __init__(self, ignored_names: Iterable[str] = IGNORED_NAMES, max_depth: int = DEFAULT_MAX_DEPTH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_scan_entries: int = DEFAULT_MAX_SCAN_ENTRIES):
+        self.ignored_names: Set[str] = set(ignored_names)
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.max_scan_entries = max_scan_entries
+        self._dirs: Dict[str, Dict[str, bool]] = {}
+        self.rendered_roots: Set[str] = set() # Roots whose rendered tree lives in the context
+        self.lock = threading.RLock()
+
+    # --- Scanning ---
+
+    def is_ignored(self, name: str) -> bool:
+        return name in self.ignored_names
+
+    def is_indexed(self, abs_dir: str) -> bool:
+        return abs_dir in self._dirs
+
+    @synchronized
+    def indexed_dirs(self) -> List[str]:
+        return list(self._dirs)
+
+    @synchronized
+    def scan(self, abs_root: str):
+        """(Re)scans abs_root breadth-first, up to max_depth levels and max_scan_entries entries."""
+        self._drop_subtree(abs_root)
+        queue = [(abs_root, 0)]
+        scanned = 0
+        while queue:
+            next_queue = []
+            for directory, depth in queue:
+                children: Dict[str, bool] = {}
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.name in self.ignored_names:
+                                continue
+                            try:
+                                is_dir = entry.is_dir(follow_symlinks=False)
+                            except OSError:
+                                is_dir = False
+                            children[entry.name] = is_dir
+                            if is_dir and depth + 1 < self.max_depth:
+                                next_queue.append((entry.path, depth + 1))
+                except OSError:
+                    if directory == abs_root:
+                        raise # Let the caller report errors on the requested root
+                    continue # Unreadable subdirectory, leave it unexpanded
+                self._dirs[directory] = children
+                scanned += len(children)
+            if scanned >= self.max_scan_entries:
+                break
+            queue = next_queue
+
+    @synchronized
+    def rescan_level(self, abs_dir: str):
+        """
+        Re-lists a single indexed directory after an external change. Known
+        subdirectories keep their entries; only added or removed ones are touched.
+        """
+        old = self._dirs.get(abs_dir)
+        if old is None:
+            return
+        new: Dict[str, bool] = {}
+        try:
+            with os.scandir(abs_dir) as entries:
+                for entry in entries:
+                    if entry.name in self.ignored_names:
+                        continue
+                    try:
+                        new[entry.name] = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        new[entry.name] = False
+        except FileNotFoundError:
+            self.remove_path(abs_dir)
+            return
+        self._dirs[abs_dir] = new
+        for name, is_dir in old.items():
+            if is_dir and not new.get(name, False):
+                self._drop_subtree(os.path.join(abs_dir, name))
+        for name, is_dir in new.items():
+            if is_dir and not old.get(name, False):
+                self.scan(os.path.join(abs_dir, name))
+
+    # --- Rendering ---
+
+    @synchronized
+    def render(self, abs_root: str) -> str:
+        """Renders the tree below abs_root, scanning it first if it is not indexed yet."""
+        if abs_root not in self._dirs:
+            self.scan(abs_root)
+        lines: List[str] = [os.path.basename(abs_root) or abs_root]
+        truncated = self._render_dir(abs_root, "", lines)
+        if truncated:
+            lines.append(f"[... truncated after {self.max_entries} entries]")
+        return "\n".join(lines) + "\n"
+
+    def _render_dir(self, directory: str, prefix: str, lines: List[str]) -> bool:
+        """Appends the lines of one directory level. Returns True if the entry cap was hit."""
+        children = self._dirs.get(directory)
+        if children is None:
+            lines.append(f"{prefix}└── [...]") # Not expanded because of the depth/entry caps
+            return False
+        # Sort entries, directories first, then files
+        entries = sorted(children.items(), key=lambda item: (not item[1], item[0].lower()))
+        for index, (name, is_dir) in enumerate(entries):
+            if len(lines) > self.max_entries:
+                return True
+            last = index == len(entries) - 1
+            lines.append(f"{prefix}{'└── ' if last else '├── '}{name}")
+            if is_dir and self._render_dir(os.path.join(directory, name), prefix + ("    " if last else "│   "), lines):
+                return True
+        return False
+
+    # --- In-place patching ---
+
+    @synchronized
+    def add_path(self, abs_path: str, is_dir: bool):
+        """Registers a newly created file or directory, including parents created along the way."""
+        chain = []
+        path = abs_path
+        while True:
+            parent, name = os.path.split(path)
+            if not name:
+                return # Reached the filesystem root without meeting an indexed directory
+            chain.append((parent, name, path))
+            if parent in self._dirs:
+                break
+            path = parent
+        if any(self.is_ignored(name) for _, name, _ in chain):
+            return
+        for parent, name, path in reversed(chain):
+            children = self._dirs.get(parent)
+            if children is None:
+                return # Parent exists but was never expanded, nothing to patch
+            entry_is_dir = is_dir if path == abs_path else True
+            is_new = name not in children
+            children[name] = entry_is_dir
+            if entry_is_dir and is_new:
+                self._dirs.setdefault(path, {}) # A brand new directory is known to be empty
+
+    @synchronized
+    def remove_path(self, abs_path: str):
+        parent, name = os.path.split(abs_path)
+        children = self._dirs.get(parent)
+        if children is not None:
+            children.pop(name, None)
+        self._drop_subtree(abs_path)
+
+    @synchronized
+    def move_path(self, abs_source: str, abs_dest: str):
+        parent, name = os.path.split(abs_source)
+        children = self._dirs.get(parent)
+        is_dir = children.get(name) if children is not None and name in children else os.path.isdir(abs_dest)
+        moved = {
+            abs_dest + directory[len(abs_source):]: entries
+            for directory, entries in self._dirs.items()
+            if self._is_within(directory, abs_source)
+        }
+        self.remove_path(abs_source)
+        self.add_path(abs_dest, is_dir)
+        dest_parent = os.path.dirname(abs_dest)
+        if dest_parent not in self._dirs:
+            return # Only keep the moved subtree if its new parent is indexed
+        if moved:
+            self._dirs.update(moved)
+        elif is_dir:
+            self.scan(abs_dest) # The source was never expanded, so its contents are unknown
+
+    def _drop_subtree(self, abs_path: str):
+        for directory in [d for d in self._dirs if self._is_within(d, abs_path)]:
+            del self._dirs[directory]
+
+    @staticmethod
+    def _is_within(path: str, root: str) -> bool:
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+    @synchronized
+    def affected_roots(self, abs_path: str) -> List[str]:
+        """Rendered roots whose tree contains abs_path (or that live inside it)."""
+        return [root for root in self.rendered_roots
+                if self._is_within(abs_path, root) or self._is_within(root, abs_path)]
+
+
+def refresh_rendered_trees(index: TreeIndex, context, abs_paths: Iterable[str]):
+    """
+    Re-renders, from the in-memory index, every tree in the context that
+    contains one of the given (already patched) paths. No directory is rescanned.
+    """
+    with index.lock, context.lock: # Index, then context: the order every caller uses
+        roots = {root for abs_path in abs_paths for root in index.affected_roots(abs_path)}
+        for root in roots:
+            if os.path.isdir(root):
+                context.add_file(tree_key(root), index.render(root))
+            else:
+                # The rendered root itself was deleted or moved away
+                index.rendered_roots.discard(root)
+                if tree_key(root) in context.files or tree_key(root) in context.evicted:
+                    context.delete_file(tree_key(root))
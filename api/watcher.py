@@ -0,0 +1,289 @@
+# api/watcher.py
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .file_reader import MAX_READ_BYTES, read_file_slice, split_slice_key
+from .tree_index import TREE_KEY_PREFIX, TreeIndex, refresh_rendered_trees
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MAX_INOTIFY_WATCHES = 4096     # Directories past this count are stat-polled instead
+
+# --- inotify constants (linux/inotify.h) ---
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+CONTENT_EVENTS = IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB
+STRUCTURE_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+WATCH_MASK = CONTENT_EVENTS | STRUCTURE_EVENTS | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+class _Inotify():
+    """Minimal non-blocking inotify binding through ctypes (Linux only)."""
+
+    def __init__(self, libc, fd: int):
+        self._libc = libc
+        self.fd = fd
+        self.dirs_by_wd: Dict[int, str] = {}
+        self.wd_by_dir: Dict[str, int] = {}
+
+    @classmethod
+    def create(cls) -> Optional["_Inotify"]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable, falling back to stat polling: {e}")
+            return None
+        if fd < 0:
+            logger.info(f"inotify_init1 failed (errno {ctypes.get_errno()}), falling back to stat polling")
+            return None
+        return cls(libc, fd)
+
+    def watch(self, abs_dir: str) -> bool:
+        if abs_dir in self.wd_by_dir:
+            return True
+        if len(self.wd_by_dir) >= MAX_INOTIFY_WATCHES:
+            return False
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(abs_dir), WATCH_MASK)
+        if wd < 0:
+            return False # ENOSPC, EACCES, ENOENT...: the caller polls this directory
+        self.wd_by_dir[abs_dir] = wd
+        self.dirs_by_wd[wd] = abs_dir
+        return True
+
+    def read_events(self) -> Tuple[List[Tuple[str, str, int]], bool]:
+        """Drains pending events. Returns ([(dir, name, mask)], overflowed)."""
+        events = []
+        overflowed = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+                name = os.fsdecode(buffer[offset + EVENT_HEADER.size: offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                directory = self.dirs_by_wd.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED: # Watch removed by the kernel (directory deleted/unmounted)
+                    del self.dirs_by_wd[wd]
+                    self.wd_by_dir.pop(directory, None)
+                    continue
+                events.append((directory, name, mask))
+        return events, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher():
+    """
+    Keeps the cached files in the Context and the TreeIndex in sync with the disk.
+
+    Uses inotify on the directories holding cached files and on indexed
+    directories where available; everything else is stat-polled (mtime/size).
+    Changes are collected when sync() is called, so nothing runs in the
+    background: the tools call it around commands that may touch the disk and
+    the runner calls it before every turn. Only changed entries are re-read.
+
+    A file's reference stat (and its directory's inotify watch) is taken when
+    it enters the cache (Context.add_file() calls track()), so an edit made
+    before the next sync() is not mistaken for the cached state. Lock order:
+    tree index, context, watcher.
+    """
+
+    def __init__(self, context, tree_index: TreeIndex, use_inotify: bool = True,
+                 resolve_path: Callable[[str], str] = os.path.abspath):
+        self.context = context
+        self.tree_index = tree_index
+        self.resolve_path = resolve_path # Maps context keys (paths as the agent wrote them) to absolute paths
+        self._inotify = _Inotify.create() if use_inotify else None
+        self._file_stats: Dict[str, Tuple[int, int]] = {} # abs file -> (mtime_ns, size)
+        self._dir_stats: Dict[str, int] = {}               # polled abs dir -> mtime_ns
+        self.refreshed = 0
+        self.invalidated = 0
+        self.lock = threading.RLock()
+        with context.lock:
+            context.watcher = self
+            for abs_path in self._cached_paths(): # Cached before the watcher existed: as of now
+                self._track_path(abs_path)
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+
+    def _cached_paths(self) -> Dict[str, List[str]]:
+        """Maps absolute paths of cached files to their context keys (whole file and slices)."""
+        paths: Dict[str, List[str]] = {}
+        for key in self.context.files:
+            if key.startswith(TREE_KEY_PREFIX):
+                continue
+            filepath, _label = split_slice_key(key)
+            paths.setdefault(self.resolve_path(filepath), []).append(key)
+        return paths
+
+    @staticmethod
+    def _stat(abs_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def track(self, key: str):
+        """Takes the reference stat of a context key's file and watches its directory (called by Context)."""
+        if key.startswith(TREE_KEY_PREFIX):
+            return
+        with self.lock:
+            self._track_path(self.resolve_path(split_slice_key(key)[0]))
+
+    def _track_path(self, abs_path: str):
+        self._file_stats[abs_path] = self._stat(abs_path)
+        if self._inotify is not None:
+            self._inotify.watch(os.path.dirname(abs_path))
+
+    def watch_directories(self, abs_dirs: Iterable[str]) -> bool:
+        """
+        Puts directories under inotify for other users of sync_paths() (e.g. the
+        search index). Returns False if some of them cannot be watched.
+        """
+        with self.lock:
+            if self._inotify is None:
+                return False
+            return all([self._inotify.watch(directory) for directory in abs_dirs])
+
+    def sync(self) -> List[str]:
+        """Applies every change seen since the last call. Returns the context keys that changed."""
+        return self.sync_paths()[0]
+
+    def sync_paths(self) -> Tuple[List[str], Optional[Set[str]]]:
+        """
+        Same as sync(), also returning the absolute paths inotify saw change in
+        any watched directory (created, written, deleted or moved entries), or
+        None when changes may have been missed (stat polling, queue overflow).
+        """
+        with self.tree_index.lock, self.context.lock, self.lock:
+            return self._sync()
+
+    def _sync(self) -> Tuple[List[str], Optional[Set[str]]]:
+        cached = self._cached_paths()
+        changed_files: Set[str] = set()
+        changed_dirs: Set[str] = set()
+        changed_paths: Optional[Set[str]] = None
+        poll_everything = self._inotify is None
+
+        if self._inotify is not None:
+            events, overflowed = self._inotify.read_events()
+            poll_everything = overflowed
+            changed_paths = None if overflowed else set()
+            for directory, name, mask in events:
+                path = os.path.join(directory, name) if name else directory
+                if changed_paths is not None:
+                    changed_paths.add(path)
+                if mask & STRUCTURE_EVENTS or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changed_dirs.add(directory if name else os.path.dirname(directory))
+                if path in cached:
+                    changed_files.add(path)
+
+        # Files: watch their directory, or fall back to comparing stat snapshots
+        for abs_path in cached:
+            directory = os.path.dirname(abs_path)
+            watched = self._inotify is not None and self._inotify.watch(directory)
+            stat = self._stat(abs_path)
+            previous = self._file_stats.get(abs_path)
+            if previous is None: # Not tracked (e.g. a key added to context.files directly): as of now
+                self._file_stats[abs_path] = stat
+                continue
+            if (poll_everything or not watched) and stat != previous:
+                changed_files.add(abs_path)
+
+        # Directories of the tree index
+        for directory in self.tree_index.indexed_dirs():
+            if self._inotify is not None and not poll_everything and self._inotify.watch(directory):
+                continue
+            stat = self._stat(directory)
+            mtime = stat[0] if stat else None
+            previous = self._dir_stats.get(directory)
+            self._dir_stats[directory] = mtime
+            if previous is not None and mtime != previous:
+                changed_dirs.add(directory)
+        for abs_path in list(self._file_stats):
+            if abs_path not in cached:
+                del self._file_stats[abs_path] # No longer cached, stop tracking it
+
+        changed_keys = []
+        for abs_path in changed_files:
+            changed_keys.extend(self._refresh_file(abs_path, cached[abs_path]))
+        if changed_dirs:
+            for directory in changed_dirs:
+                if self.tree_index.is_indexed(directory):
+                    self.tree_index.rescan_level(directory)
+            refresh_rendered_trees(self.tree_index, self.context, changed_dirs)
+        if changed_paths is not None:
+            changed_paths.update(changed_files) # Cached files in polled directories
+        return changed_keys, changed_paths
+
+    def _refresh_file(self, abs_path: str, keys: List[str]) -> List[str]:
+        """
+        Re-reads one changed file into the context. Slices (line/byte ranges,
+        previews) are dropped since their ranges may have shifted, and so is the
+        whole file if it is gone, unreadable or grew past MAX_READ_BYTES.
+        """
+        stat = self._stat(abs_path)
+        if stat is not None and stat == self._file_stats.get(abs_path):
+            return [] # Event without an actual change (e.g. our own write)
+        self._file_stats[abs_path] = stat
+        content = None
+        if stat is not None and stat[1] <= MAX_READ_BYTES:
+            try:
+                file_slice = read_file_slice(abs_path)
+                if file_slice.label is None:
+                    content = file_slice.content
+            except OSError as e:
+                logger.info(f"Dropping '{abs_path}' from context, it can no longer be read: {e}")
+        for key in keys:
+            if content is None or split_slice_key(key)[1] is not None:
+                self.context.delete_file(key)
+                self.invalidated += 1
+            else:
+                self.context.add_file(key, content)
+                self.refreshed += 1
+        if content is None:
+            self._file_stats.pop(abs_path, None)
+        return keys
+
+    def close(self):
+        if self.context.watcher is self:
+            self.context.watcher = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,79 @@
+# benchmarks/bench_context.py
+"""
+Measures Context.serialize() cost per turn as the history grows.
+
+Each simulated turn adds a user message, a tool record, touches one file and
+then serializes. The incremental serializer is compared against the old full
+rebuild (re-formatting every message and every file on every call).
+size(), which tools call around every call, must stay flat; serialize()
+still copies the result once, into the new string.
+
+Usage: python benchmarks/bench_context.py [turns] [files] [file_kb]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.context import Context
+
+
+def full_rebuild(context: Context) -> str:
+    """The pre-segment serializer: re-format and re-join everything."""
+    everything = list(context.messages)
+    everything.extend(f"{key}: {value}" for key, value in context.files.items())
+    return "\n".join(everything)
+
+
+def run(turns: int = 2000, files: int = 50, file_kb: int = 20):
+    context = Context(max_file_bytes=None) # Unbounded, so it can be compared to the full rebuild
+    body = "x" * (file_kb * 1024)
+    for i in range(files):
+        context.add_file(f"src/module_{i}.py", body)
+
+    report_every = max(1, turns // 10)
+    incremental_total = 0.0
+    rebuild_total = 0.0
+    window = ([], [], [], [])
+    print("median over each window of turns, in microseconds")
+    print(f"{'turn':>6} {'bytes':>12} {'size_us':>8} {'serialize_us':>14} {'rebuild_us':>12} {'noop_us':>9}")
+    for turn in range(1, turns + 1):
+        context.add_user_message(f"turn {turn}: please change module {turn % files}")
+        context.add_system_message(f"Tool: ReadFile\nAction: Read file: 'src/module_{turn % files}.py'\nStatus: success")
+        if turn % 5 == 0:
+            context.add_file(f"src/module_{turn % files}.py", body[:-1] + str(turn % 10))
+
+        start = time.perf_counter()
+        context.size()
+        size = time.perf_counter() - start
+
+        start = time.perf_counter()
+        serialized = context.serialize()
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebuilt = full_rebuild(context)
+        rebuild = time.perf_counter() - start
+
+        start = time.perf_counter()
+        context.serialize() # Nothing changed since the previous call
+        noop = time.perf_counter() - start
+
+        assert serialized == rebuilt and context.size() == len(serialized)
+        incremental_total += incremental
+        rebuild_total += rebuild
+        for samples, value in zip(window, (size, incremental, rebuild, noop)):
+            samples.append(value * 1e6)
+        if turn % report_every == 0:
+            size_us, incremental_us, rebuild_us, noop_us = (statistics.median(samples) for samples in window)
+            print(f"{turn:>6} {len(serialized):>12} {size_us:>8.2f} {incremental_us:>14.1f} {rebuild_us:>12.1f} {noop_us:>9.2f}")
+            window = ([], [], [], [])
+
+    print(f"total serialize: {incremental_total * 1e3:.1f} ms, total full rebuild: {rebuild_total * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,85 @@
+# benchmarks/bench_coordinator.py
+"""
+Makespan of the todo.md coordinator (api/coordinator.py) against serial
+execution, for 1..N workers, without a model.
+
+The checklist has --items items in --sections headings (headings are
+barriers, plus a few "(after: n)" links). Each item is done by a stand-in
+worker that waits --item-ms (the model's time) and writes one file of its
+own in the workspace, so isolation, commits and merges are real.
+
+Usage: python benchmarks/bench_coordinator.py [--items N] [--sections N] [--item-ms N] [--files N] [--isolation worktree|copy]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.coordinator import Coordinator
+
+
+def make_todo(items: int, sections: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    per_section = max(1, items // sections)
+    for i in range(1, items + 1):
+        if (i - 1) % per_section == 0:
+            lines.append(f"## Step {(i - 1) // per_section + 1}")
+        after = f" (after: {rng.randrange(1, i)})" if i > 2 and rng.random() < 0.2 else ""
+        lines.append(f"- [ ] Implement part {i}{after}")
+    return "\n".join(lines) + "\n"
+
+
+def make_workspace(root: str, files: int, items: int, sections: int, git: bool):
+    os.makedirs(os.path.join(root, "src"))
+    for i in range(files):
+        with open(os.path.join(root, "src", f"module_{i}.py"), "w") as f:
+            f.write(f"VALUE = {i}\n" * 50)
+    with open(os.path.join(root, "todo.md"), "w") as f:
+        f.write(make_todo(items, sections))
+    if git:
+        subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+        subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+        subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-q", "-m", "base"],
+                       cwd=root, check=True)
+
+
+def stand_in_worker(item_ms: int):
+    async def run_task(session, task, prompt):
+        await asyncio.sleep(item_ms / 1000)
+        with open(os.path.join(session.root, "src", f"part_{task.number}.py"), "w") as f:
+            f.write(f"# {task.text}\n")
+        return "done"
+    return run_task
+
+
+async def run(args):
+    print(f"{args.items} items in {args.sections} sections, {args.item_ms}ms per item, "
+          f"{args.files} files, {args.isolation} isolation")
+    print(f"{'workers':>7} {'makespan':>10} {'serial':>9} {'speedup':>8} {'critical path':>14} {'done':>5}")
+    for workers in args.workers:
+        root = tempfile.mkdtemp(prefix="opencoder_coordinator_")
+        make_workspace(root, args.files, args.items, args.sections, args.isolation == "worktree")
+        coordinator = Coordinator(root, workers=workers, isolation=args.isolation, run_task=stand_in_worker(args.item_ms))
+        report = await coordinator.run()
+        done = sum(1 for result in report.results if result.status == "done")
+        print(f"{workers:>7} {report.makespan:>9.2f}s {report.serial:>8.2f}s {report.serial / report.makespan:>7.2f}x "
+              f"{report.critical_path:>13.2f}s {done:>5}")
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=16)
+    parser.add_argument("--sections", type=int, default=3)
+    parser.add_argument("--item-ms", type=int, default=500)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--isolation", choices=("worktree", "copy"), default="worktree")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,183 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end overhead of the agent loop, without the LLM.
+
+A synthetic repository is generated, then AgentRunner.run() drives the real
+tools against FakeOpenAIServer. Every turn the fake model calls GetTree,
+ReadFile, BatchFileOperations (two reads and a write), WriteAndCreateFile and
+ShellExec, then answers. The model answers instantly (or after --latency-ms),
+so what is left is this project's own cost: the runner, the tools, the
+context and the SDK plumbing.
+
+Reported per turn: total latency, time inside model calls, overhead (the
+difference), turn start (watcher sync + serialize) and context size; plus a
+cold tree build of the repository, the process peak RSS and the per-tool
+metrics summary (api/metrics.py).
+
+Usage: python benchmarks/bench_e2e.py [--files N] [--dirs N] [--file-kb N] [--turns N] [--latency-ms N]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import Agent, OpenAIChatCompletionsModel, set_tracing_disabled
+from openai import AsyncOpenAI
+
+from api.agent_runner import AgentRunner
+from api.metrics import get_metrics
+from api.session import Session
+from api.tree_index import TreeIndex
+from fake_openai_server import FakeOpenAIServer, ModelBehaviour
+from tools import get_tools
+
+
+def make_repo(root: str, files: int, dirs: int, file_kb: int, seed: int = 0) -> list:
+    """Writes `files` source files spread over `dirs` nested directories. Returns their relative paths."""
+    rng = random.Random(seed)
+    directories = ["."]
+    for i in range(dirs):
+        parent = rng.choice(directories)
+        directories.append(os.path.join(parent, f"pkg{i}"))
+        os.makedirs(os.path.join(root, directories[-1]), exist_ok=True)
+    line = "def function_{n}(value):\n    return value * {n}  # padding padding padding\n"
+    paths = []
+    for i in range(files):
+        path = os.path.normpath(os.path.join(rng.choice(directories), f"module{i}.py"))
+        body = "".join(line.format(n=n) for n in range(file_kb * 1024 // len(line.format(n=0)) + 1))
+        with open(os.path.join(root, path), "w") as f:
+            f.write(body)
+        paths.append(path)
+    return paths
+
+
+class ScriptedModel(FakeOpenAIServer):
+    """Plays the same tool sequence every turn; the step is the number of tool results so far."""
+
+    def __init__(self, paths: list, **kwargs):
+        super().__init__(**kwargs)
+        self.paths = paths
+        self.turn = 0
+        self._rng = random.Random(1)
+
+    def script_for(self, request: dict) -> dict:
+        step = sum(1 for message in request["messages"] if message["role"] == "tool")
+        if step == 0:
+            self.turn += 1
+        a, b, c = self._rng.sample(self.paths, 3)
+        steps = [
+            ("GetTree", {"path": "."}),
+            ("ReadFile", {"filepath": a, "start_line": None, "end_line": None, "start_byte": None, "end_byte": None}),
+            ("BatchFileOperations", {"operations": [
+                {"op": "read", "path": b, "content": None, "dest": None},
+                {"op": "read", "path": c, "content": None, "dest": None},
+                {"op": "write", "path": f"generated/turn{self.turn}.py", "content": "x = 1\n" * 50, "dest": None},
+            ]}),
+            ("WriteAndCreateFile", {"filepath": f"notes/turn{self.turn}.md", "content": f"Turn {self.turn} notes\n"}),
+            ("ShellExec", {"command": "ls | wc -l"}),
+        ]
+        if step < len(steps):
+            name, arguments = steps[step]
+            return {"tool_calls": [{"name": name, "arguments": arguments}]}
+        return {"content": f"Turn {self.turn} done."}
+
+
+class TimedClient():
+    """Measures the time spent inside chat.completions.create() (the model's share of a turn)."""
+
+    def __init__(self, client: AsyncOpenAI):
+        self._client = client
+        self.model_time = 0.0
+        self.chat = self
+        self.completions = self
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def create(self, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._client.chat.completions.create(**kwargs)
+        finally:
+            self.model_time += time.perf_counter() - started
+
+
+class TimedRunner(AgentRunner):
+    def _start_turn(self, input) -> list:
+        started = time.perf_counter()
+        try:
+            return super()._start_turn(input)
+        finally:
+            self.start_turn_time = time.perf_counter() - started
+
+
+def summary(name: str, values: list, unit: float = 1000, suffix: str = "ms") -> str:
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (f"{name:<22} p50 {statistics.median(values) * unit:9.2f}{suffix}  p95 {p95 * unit:9.2f}{suffix}  "
+            f"max {values[-1] * unit:9.2f}{suffix}")
+
+
+async def run(args):
+    set_tracing_disabled(True)
+    root = tempfile.mkdtemp(prefix="opencoder_e2e_")
+    paths = make_repo(root, args.files, args.dirs, args.file_kb)
+
+    started = time.perf_counter()
+    index = TreeIndex()
+    index.scan(root)
+    tree = index.render(root)
+    tree_build = time.perf_counter() - started
+
+    async with ScriptedModel(paths, behaviours={"*": ModelBehaviour(latency=args.latency_ms / 1000)}) as server:
+        client = TimedClient(AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0))
+        agent = Agent(name="Coder Agent", instructions="You are a coding agent.", tools=get_tools(),
+                      model=OpenAIChatCompletionsModel(model="fake-model", openai_client=client))
+        session = Session(root=root)
+        runner = TimedRunner(agent, session)
+        totals, model_times, overheads, start_turns, context_bytes = [], [], [], [], []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # Tool announcements
+            for turn in range(args.turns):
+                client.model_time = 0.0
+                await runner.run(f"Turn {turn}: look around the repository and take notes.")
+                totals.append(runner.last_turn.total_time)
+                model_times.append(client.model_time)
+                overheads.append(runner.last_turn.total_time - client.model_time)
+                start_turns.append(runner.start_turn_time)
+                context_bytes.append(len(session.context.serialize()))
+        tool_errors = sum(1 for message in session.context.messages if "\nStatus: error\n" in message)
+        await session.close()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / 1024 / (1024 if sys.platform == "darwin" else 1) # Bytes on macOS, KiB on Linux
+    print(f"repo: {args.files} files x {args.file_kb}KiB in {args.dirs} dirs, {args.turns} turns, "
+          f"model latency {args.latency_ms}ms")
+    print(f"{'tree build (cold)':<22} {tree_build * 1000:9.2f}ms  ({len(tree.splitlines())} lines)")
+    print(summary("turn total", totals))
+    print(summary("model calls", model_times))
+    print(summary("overhead", overheads))
+    print(summary("turn start", start_turns))
+    print(summary("context size", context_bytes, unit=1 / 1024, suffix="KiB"))
+    print(f"{'peak RSS':<22} {peak_rss_mb:9.1f}MiB")
+    print()
+    print(get_metrics().summary.render()) # Per tool: calls, time, bytes in/out, context growth
+    if tool_errors:
+        print(f"warning: {tool_errors} tool call(s) failed, the numbers do not reflect the normal path")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--dirs", type=int, default=40)
+    parser.add_argument("--file-kb", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,62 @@
+# benchmarks/bench_history.py
+"""
+Message history size over a long session, with and without compaction
+(api/history.py).
+
+Each simulated turn adds a question, --tools tool records with
+--output-kb of ShellExec-like output each, and an answer. Reported every
+tenth of the run: history tokens without compaction, with it, and the
+time the background compaction took (off the turn's critical path).
+
+Usage: python benchmarks/bench_history.py [--turns N] [--tools N] [--output-kb N] [--budget TOKENS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.context import Context
+from api.history import compact_messages
+from api.tokens import TokenCounter
+
+
+def add_turn(context: Context, turn: int, tools: int, output_kb: int):
+    context.add_user_message(f"turn {turn}: run the tests and fix what fails in module {turn % 17}")
+    for i in range(tools):
+        output = "".join(f"test_case_{turn}_{i}_{n} PASSED\n" for n in range(output_kb * 1024 // 32))
+        context.add_system_message(f"Tool: ShellExec\nAction: Execute command: pytest -q tests/test_{i}.py\n"
+                                   f"Status: {'error' if i == 0 and turn % 5 == 0 else 'success'}\nOutput: {output}")
+    context.add_assistant_message(f"Turn {turn}: all {tools} suites pass after the fix.")
+
+
+def main(args):
+    full, compacted = Context(), Context()
+    counter = TokenCounter()
+    compaction_times = []
+    report_every = max(1, args.turns // 10)
+    print(f"{'turn':>6} {'uncompacted':>12} {'compacted':>10} {'compactions':>12} {'max compact ms':>15}")
+    for turn in range(1, args.turns + 1):
+        add_turn(full, turn, args.tools, args.output_kb)
+        add_turn(compacted, turn, args.tools, args.output_kb)
+        snapshot = list(compacted.messages)
+        started = time.perf_counter()
+        new = compact_messages(snapshot, args.budget, counter) # What HistoryCompactor runs between turns
+        if new is not None:
+            compaction_times.append(time.perf_counter() - started)
+            compacted.replace_history(snapshot, new)
+            counter.retain(new)
+        if turn % report_every == 0:
+            print(f"{turn:>6} {TokenCounter().total(full.messages):>12} {counter.total(compacted.messages):>10} "
+                  f"{len(compaction_times):>12} {max(compaction_times, default=0) * 1000:>15.1f}")
+    print(f"tokens: {'exact' if counter.exact else 'estimated'}, budget {args.budget}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tools", type=int, default=3)
+    parser.add_argument("--output-kb", type=int, default=4)
+    parser.add_argument("--budget", type=int, default=32000)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+# benchmarks/bench_parallel_tools.py
+"""
+One model step with several independent tool calls, run one after another
+(what the agent SDK did with synchronous tools) and gathered through the
+tool thread pool (api/tool_pool.py), as the SDK does now.
+
+The step reads --reads files, outlines --outlines Python files and renders
+the tree. --latency-ms adds a sleep to every file read to stand in for a
+slow or network filesystem.
+
+Usage: python benchmarks/bench_parallel_tools.py [--reads N] [--outlines N] [--file-kb N] [--latency-ms N] [--runs N]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools
+from api.context_handler import use_session
+from api.session import Session
+
+
+def make_repo(root: str, files: int, file_kb: int):
+    os.makedirs(os.path.join(root, "src"))
+    for i in range(files):
+        lines = [f"def function_{i}_{n}(value):\n    return value + {n}\n\n" for n in range(file_kb * 1024 // 48)]
+        with open(os.path.join(root, "src", f"module_{i}.py"), "w") as f:
+            f.write("".join(lines))
+
+
+def invoke(tool, **arguments):
+    payload = {name: arguments.get(name) for name in tool.params_json_schema["properties"]}
+    return tool.on_invoke_tool(None, json.dumps(payload))
+
+
+def step_calls(args):
+    calls = [invoke(tools.ReadFile, filepath=f"src/module_{i}.py") for i in range(args.reads)]
+    calls += [invoke(tools.GetOutline, filepath=f"src/module_{args.reads + i}.py") for i in range(args.outlines)]
+    calls.append(invoke(tools.GetTree, path="."))
+    return calls
+
+
+async def run(args):
+    root = tempfile.mkdtemp(prefix="opencoder_parallel_")
+    make_repo(root, args.reads + args.outlines, args.file_kb)
+    if args.latency_ms:
+        read = tools.read_file_slice
+        def slow_read(*a, **k):
+            time.sleep(args.latency_ms / 1000)
+            return read(*a, **k)
+        tools.read_file_slice = slow_read
+    timings = {"sequential": [], "concurrent": []}
+    for _ in range(args.runs):
+        for mode in timings:
+            session = Session(root=root) # Fresh context, so every run reads again
+            with use_session(session), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                started = time.perf_counter()
+                if mode == "sequential":
+                    for call in step_calls(args):
+                        await call
+                else:
+                    await asyncio.gather(*step_calls(args))
+                timings[mode].append(time.perf_counter() - started)
+            await session.close()
+    shutil.rmtree(root)
+    print(f"step: {args.reads} ReadFile + {args.outlines} GetOutline + GetTree, {args.file_kb}KiB files, "
+          f"+{args.latency_ms}ms per read")
+    for mode, values in timings.items():
+        print(f"{mode:<12} median {statistics.median(values) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reads", type=int, default=5)
+    parser.add_argument("--outlines", type=int, default=3)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
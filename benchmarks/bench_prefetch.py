@@ -0,0 +1,113 @@
+# benchmarks/bench_prefetch.py
+"""
+ReadFile latency along an agent-like read path, with and without the
+background prefetcher (api/prefetch.py).
+
+The synthetic package has --modules modules importing --imports others
+each, plus a test per module. The walk reads a module, waits --think-ms
+(the model round trip), then reads one of its imports (most of the time),
+its test or a random module. --latency-ms adds a sleep to every disk read
+to stand in for a cold or network filesystem; prefetched reads skip it.
+
+Usage: python benchmarks/bench_prefetch.py [--modules N] [--imports N] [--reads N] [--think-ms N] [--latency-ms N] [--file-kb N]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools
+from api import prefetch
+from api.context_handler import use_session
+from api.session import Session
+
+
+def make_package(root: str, modules: int, imports: int, file_kb: int, rng: random.Random):
+    graph = {}
+    os.makedirs(os.path.join(root, "app"))
+    os.makedirs(os.path.join(root, "tests"))
+    open(os.path.join(root, "app", "__init__.py"), "w").close()
+    body = "".join(f"def helper_{n}(value):\n    return value * {n}\n\n" for n in range(file_kb * 1024 // 44))
+    for i in range(modules):
+        graph[i] = rng.sample([m for m in range(modules) if m != i], min(imports, modules - 1))
+        with open(os.path.join(root, "app", f"module_{i}.py"), "w") as f:
+            f.write("".join(f"from .module_{m} import helper_1\n" for m in graph[i]) + "\n" + body)
+        with open(os.path.join(root, "tests", f"test_module_{i}.py"), "w") as f:
+            f.write(f"from app.module_{i} import helper_1\n\ndef test_helper():\n    assert helper_1(2) == 2\n")
+    return graph
+
+
+def walk(graph, reads: int, rng: random.Random):
+    current, path = 0, []
+    for _ in range(reads):
+        path.append(f"app/module_{current}.py")
+        roll = rng.random()
+        if roll < 0.15:
+            path.append(f"tests/test_module_{current}.py")
+        current = rng.choice(graph[current]) if roll < 0.85 else rng.randrange(len(graph))
+    return path[:reads]
+
+
+def invoke(tool, **arguments):
+    payload = {name: arguments.get(name) for name in tool.params_json_schema["properties"]}
+    return tool.on_invoke_tool(None, json.dumps(payload))
+
+
+def add_latency(latency_ms: int):
+    read_slice, read_whole = tools.read_file_slice, prefetch.read_whole
+    def slow_read_slice(*a, data=None, **k):
+        if data is None:
+            time.sleep(latency_ms / 1000)
+        return read_slice(*a, data=data, **k)
+    def slow_read_whole(*a, **k):
+        time.sleep(latency_ms / 1000)
+        return read_whole(*a, **k)
+    tools.read_file_slice, prefetch.read_whole = slow_read_slice, slow_read_whole
+
+
+async def run(args):
+    rng = random.Random(0)
+    root = tempfile.mkdtemp(prefix="opencoder_prefetch_")
+    graph = make_package(root, args.modules, args.imports, args.file_kb, rng)
+    path = walk(graph, args.reads, rng)
+    if args.latency_ms:
+        add_latency(args.latency_ms)
+    print(f"{len(path)} reads of {args.file_kb}KiB files, {args.think_ms}ms between reads, +{args.latency_ms}ms per disk read")
+    print(f"{'prefetch':<9} {'median ms':>10} {'p90 ms':>8} {'total ms':>9} {'hit rate':>9} {'warmed KiB':>11} {'wasted KiB':>11}")
+    for enabled in (False, True):
+        session = Session(root=root)
+        session.prefetcher.budget = prefetch.DEFAULT_PREFETCH_BYTES if enabled else 0
+        timings = []
+        with use_session(session), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for filepath in path:
+                started = time.perf_counter()
+                await invoke(tools.ReadFile, filepath=filepath)
+                timings.append(time.perf_counter() - started)
+                await asyncio.sleep(args.think_ms / 1000)
+        await session.close()
+        stats = session.prefetcher.stats()
+        timings.sort()
+        print(f"{'on' if enabled else 'off':<9} {statistics.median(timings) * 1000:>10.2f} "
+              f"{timings[int(len(timings) * 0.9)] * 1000:>8.2f} {sum(timings) * 1000:>9.1f} {stats['hit_rate']:>8.0%} "
+              f"{stats['prefetched_bytes'] / 1024:>11.0f} {stats['wasted_bytes'] / 1024:>11.0f}")
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--imports", type=int, default=3)
+    parser.add_argument("--reads", type=int, default=100)
+    parser.add_argument("--think-ms", type=int, default=50)
+    parser.add_argument("--latency-ms", type=int, default=10)
+    parser.add_argument("--file-kb", type=int, default=16)
+    asyncio.run(run(parser.parse_args()))
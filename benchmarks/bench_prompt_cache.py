@@ -0,0 +1,80 @@
+# benchmarks/bench_prompt_cache.py
+"""
+How much of each request repeats the previous one (what a provider prompt
+cache can reuse), for the old flat Context.serialize() string and for the
+structured PromptLayout (api/prompt_layout.py).
+
+Each simulated turn adds a user message, reads a few files (some of them
+edited since the last read), logs the tool calls and an answer, which is
+what a coding turn does to the context.
+
+Usage: python benchmarks/bench_prompt_cache.py [--turns N] [--files N] [--file-kb N] [--edit-rate F]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.context import Context
+from api.prompt_layout import PromptLayout
+
+
+def common_prefix(a: str, b: str) -> int:
+    """Length of the common prefix, by bisection on slices (fast for long strings)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def main(args):
+    rng = random.Random(0)
+    context = Context()
+    layout = PromptLayout()
+    versions = [0] * args.files
+    flat_total = flat_prefix = 0
+    layout_chars = 0
+    previous = ""
+    build_time = 0.0
+    for turn in range(args.turns):
+        context.add_user_message(f"turn {turn}: please look at module {rng.randrange(args.files)}")
+        flat = context.serialize()
+        flat_prefix += common_prefix(previous, flat)
+        flat_total += len(flat)
+        previous = flat
+        started = time.perf_counter()
+        items = layout.build(context)
+        build_time += time.perf_counter() - started
+        layout_chars += sum(len(item["content"]) for item in items)
+
+        for _ in range(args.reads):
+            i = rng.randrange(args.files)
+            if rng.random() < args.edit_rate:
+                versions[i] += 1
+            context.add_file(f"src/module_{i}.py", f"# version {versions[i]}\n" + "x" * (args.file_kb * 1024))
+            context.add_system_message(f"Tool: ReadFile\nAction: Read file: 'src/module_{i}.py'\nStatus: success")
+        context.add_assistant_message(f"answer to turn {turn}")
+
+    stats = layout.stats()
+    print(f"{args.turns} turns, {args.files} files x {args.file_kb}KiB, {args.reads} reads/turn, edit rate {args.edit_rate:.0%}")
+    print(f"{'flat string':<16} reusable prefix {flat_prefix / flat_total:6.1%}   sent {flat_total / 2**20:8.1f}MiB   "
+          f"not cacheable {(flat_total - flat_prefix) / 2**20:8.1f}MiB")
+    print(f"{'prompt layout':<16} reusable prefix {stats['prefix_hit_rate']:6.1%}   sent {layout_chars / 2**20:8.1f}MiB   "
+          f"not cacheable {(stats['input_chars'] - stats['prefix_chars']) / 2**20:8.1f}MiB   ({stats['rebuilds']} rebuilds, {build_time / args.turns * 1e6:.0f}us/turn)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--file-kb", type=int, default=4)
+    parser.add_argument("--reads", type=int, default=3)
+    parser.add_argument("--edit-rate", type=float, default=0.2)
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+# benchmarks/bench_resume.py
+"""
+Cost of getting a session's context back after a restart.
+
+A synthetic repository is read into a journaled Session (api/journal.py) along
+with a conversation, then the process "restarts":
+
+- cold: an empty context re-reads every file and re-renders the tree, which is
+  what the agent would otherwise do through tool round trips (one LLM call
+  each, not counted here);
+- resume: restore from snapshot + journal, files revalidated by mtime;
+- resume after edits: the same with --changed files modified on disk.
+
+Also reported: journal/snapshot/blob sizes and the cost of recording.
+
+Usage: python benchmarks/bench_resume.py [--files N] [--file-kb N] [--messages N] [--changed N]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.context import Context
+from api.file_reader import read_file_slice
+from api.session import Session
+from api.tree_index import TreeIndex, tree_key
+
+
+def make_repo(root: str, files: int, file_kb: int) -> list:
+    line = "def function_{n}(value):\n    return value * {n}  # padding padding padding\n"
+    body = "".join(line.format(n=n) for n in range(file_kb * 1024 // len(line.format(n=0)) + 1))
+    paths = []
+    for i in range(files):
+        path = os.path.join(f"pkg{i % 10}", f"module{i}.py")
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write(body + f"# {i}\n")
+        paths.append(path)
+    return paths
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, name)) for d, _, names in os.walk(path) for name in names)
+
+
+def cold_rebuild(root: str, paths: list) -> float:
+    started = time.perf_counter()
+    context, index = Context(max_file_bytes=None), TreeIndex()
+    context.add_file(tree_key(root), index.render(root))
+    for path in paths:
+        context.add_file(path, read_file_slice(os.path.join(root, path)).content)
+    return time.perf_counter() - started
+
+
+def resume(root: str, journal_dir: str) -> dict:
+    session = Session("bench", root=root)
+    session.context.max_file_bytes = None # Keep every file, like the recorded session
+    report = session.attach_journal(journal_dir, resume=True)
+    session.journal.close()
+    return report
+
+
+async def run(args):
+    root = tempfile.mkdtemp(prefix="opencoder_resume_")
+    journal_dir = os.path.join(tempfile.mkdtemp(prefix="opencoder_journal_"), "sessions")
+    paths = make_repo(root, args.files, args.file_kb)
+
+    session = Session("bench", root=root)
+    session.context.max_file_bytes = None
+    session.attach_journal(journal_dir)
+    started = time.perf_counter()
+    session.tree_index.rendered_roots.add(root)
+    session.context.add_file(tree_key(root), session.tree_index.render(root))
+    for i, path in enumerate(paths):
+        session.context.add_file(path, read_file_slice(os.path.join(root, path)).content)
+        if i < args.messages:
+            session.context.add_user_message(f"message {i}: please look at {path}")
+    record = time.perf_counter() - started
+    session.journal.flush() # Blobs and lines are written on the journal thread
+    written = time.perf_counter() - started
+    journal_bytes = os.path.getsize(session.journal.journal_path)
+    await session.close()
+
+    cold = cold_rebuild(root, paths)
+    warm = resume(root, journal_dir)
+    for path in paths[:args.changed]:
+        with open(os.path.join(root, path), "a") as f:
+            f.write("# edited\n")
+    edited = resume(root, journal_dir)
+
+    print(f"repo: {args.files} files x {args.file_kb}KiB, {min(args.messages, args.files)} messages")
+    print(f"{'record (journaled)':<26} {record * 1000:9.1f}ms  journal {journal_bytes / 1024:.1f}KiB, written after {written * 1000:.1f}ms")
+    print(f"{'snapshot + blobs':<26} {directory_size(os.path.dirname(journal_dir)) / 1024:9.1f}KiB")
+    print(f"{'cold re-read':<26} {cold * 1000:9.1f}ms  ({args.files} reads = {args.files} tool calls)")
+    print(f"{'resume':<26} {warm['elapsed_ms']:9.1f}ms  {warm}")
+    print(f"{'resume, {} changed'.format(args.changed):<26} {edited['elapsed_ms']:9.1f}ms  {edited}")
+    shutil.rmtree(root)
+    shutil.rmtree(os.path.dirname(journal_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-kb", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--changed", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,90 @@
+# benchmarks/bench_scheduler.py
+"""
+Compares the raw client with RequestScheduler against a flaky local server.
+
+The primary model is rate limited for its first requests, then fails part of
+the time and has a slow tail; the fallback model is healthy. Both setups send
+the same number of concurrent requests through FakeOpenAIServer and report
+success rate, p50/p95 latency, per-model stats and hedges.
+
+Usage: python benchmarks/bench_scheduler.py [requests] [concurrency]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import AsyncOpenAI
+
+from api.scheduler import RequestScheduler
+from fake_openai_server import FakeOpenAIServer, ModelBehaviour
+
+PRIMARY = "primary-model"
+FALLBACK = "fallback-model"
+
+
+def behaviours():
+    return {
+        PRIMARY: ModelBehaviour(latency=0.05, latency_jitter=0.6, fail_first=5, fail_rate=0.3),
+        FALLBACK: ModelBehaviour(latency=0.08, latency_jitter=0.02),
+    }
+
+
+async def drive(client, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.chat.completions.create(model=PRIMARY, messages=[{"role": "user", "content": f"ping {i}"}])
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def report(name: str, latencies, failures: int, wall: float, requests: int):
+    if latencies:
+        latencies = sorted(latencies)
+        p50 = statistics.median(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        timing = f"p50 {p50:.3f}s, p95 {p95:.3f}s"
+    else:
+        timing = "no successful requests"
+    print(f"{name:<22} ok {requests - failures}/{requests}, {timing}, wall {wall:.2f}s")
+
+
+async def main(requests: int = 60, concurrency: int = 4):
+    logging.basicConfig(level=logging.ERROR) # Retries are expected here, keep the output readable
+    async with FakeOpenAIServer(behaviours=behaviours()) as server:
+        raw = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+        report("raw client", *await drive(raw, requests, concurrency), requests)
+
+    async with FakeOpenAIServer(behaviours=behaviours()) as server:
+        client = AsyncOpenAI(base_url=server.base_url, api_key="fake")
+        scheduler = RequestScheduler(client, fallback_models=[FALLBACK], rate_per_second=50, burst=10)
+        report("scheduler", *await drive(scheduler, requests, concurrency), requests)
+        print(scheduler.describe_stats())
+
+    async with FakeOpenAIServer(behaviours=behaviours()) as server:
+        client = AsyncOpenAI(base_url=server.base_url, api_key="fake")
+        scheduler = RequestScheduler(client, fallback_models=[FALLBACK], rate_per_second=50, burst=10,
+                                     hedge_after=0.25)
+        report("scheduler + hedging", *await drive(scheduler, requests, concurrency), requests)
+        print(scheduler.describe_stats())
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(main(*args))
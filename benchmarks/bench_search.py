@@ -0,0 +1,99 @@
+# benchmarks/bench_search.py
+"""
+SearchCode index (api/search_index.py) against `grep -rn` on a synthetic repo.
+
+Reported: cold index build, no-op refresh (re-stat only), incremental
+update of one file, then per query the index latency (median of a few runs),
+candidates checked and `grep -rn` latency for the same literal.
+
+Usage: python benchmarks/bench_search.py [--files N] [--file-kb N] [--runs N]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.search_index import SearchIndex
+
+WORDS = ["value", "result", "count", "index", "buffer", "session", "context", "parse", "render", "client",
+         "stream", "token", "cache", "model", "request", "handler", "update", "record", "params", "config"]
+QUERIES = [
+    ("literal, rare", "Module2500Session", False),
+    ("literal, common", "return value", False),
+    ("regex", r"class \w+Session\b", True),
+    ("regex, no literal", r"\d{7}", True),
+]
+
+
+def make_repo(root: str, files: int, file_kb: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i % 97}", f"sub{i % 13}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        while sum(len(line) for line in lines) < file_kb * 1024:
+            a, b = rng.sample(WORDS, 2)
+            n = rng.randrange(10000)
+            lines.append(f"def {a}_{b}_{n}(value):\n    return value + {n}  # {a} {b}\n")
+        if i % 500 == 0:
+            lines.append(f"class Module{i}Session:\n    pass\n")
+        with open(os.path.join(directory, f"module{i}.py"), "w") as f:
+            f.write("".join(lines))
+
+
+def median_time(function, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def main(args):
+    root = tempfile.mkdtemp(prefix="opencoder_search_")
+    make_repo(root, args.files, args.file_kb)
+    index = SearchIndex(root)
+
+    build = median_time(index.refresh, 1)
+    refresh = median_time(index.refresh, 1)
+    target = os.path.join(root, "pkg0", "sub0", "module0.py")
+    with open(target, "a") as f:
+        f.write("def freshly_added_function():\n    pass\n")
+    update = median_time(lambda: index.update_paths([target]), 1)
+    stats = index.stats()
+    print(f"repo: {args.files} files x {args.file_kb}KiB")
+    print(f"{'cold build':<22} {build * 1000:10.1f}ms  ({stats['trigrams']} trigrams, {stats['bytes'] / 2**20:.1f}MiB on disk)")
+    print(f"{'no-op refresh':<22} {refresh * 1000:10.1f}ms")
+    print(f"{'update one file':<22} {update * 1000:10.1f}ms  "
+          f"(found: {bool(index.search('freshly_added_function').matches)})")
+
+    grep = shutil.which("grep")
+    for name, query, regex in QUERIES:
+        index.stale = False
+        result = index.search(query, regex=regex)
+        elapsed = median_time(lambda: index.search(query, regex=regex), args.runs)
+        line = (f"{name:<22} {elapsed * 1000:10.1f}ms  {result.candidates:>6} checked, "
+                f"{result.files_matched:>6} files matched")
+        if grep is not None:
+            command = [grep, "-rn", "-E" if regex else "-F", "-i", query.replace(r"\w", "[[:alnum:]_]").replace(r"\b", "").replace(r"\d", "[0-9]"), root]
+            grep_time = median_time(lambda: subprocess.run(command, stdout=subprocess.DEVNULL), max(1, args.runs // 3))
+            line += f"   grep -rn {grep_time * 1000:8.1f}ms"
+        print(line)
+    index.close()
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--file-kb", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+# benchmarks/bench_server.py
+"""
+Throughput of AgentServer under N concurrent simulated users.
+
+Each user opens its own TCP connection, creates a session rooted in its own
+scratch workspace and runs a few turns. The model is FakeOpenAIServer with a
+fixed latency: every turn makes one ReadFile tool call and then answers, so
+a turn is two model round trips plus a tool call. Every session's context is
+checked afterwards to hold only its own workspace's file.
+
+Usage: python benchmarks/bench_server.py [turns_per_user] [model_latency_ms] [users...]
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import Agent, OpenAIChatCompletionsModel, set_tracing_disabled
+from openai import AsyncOpenAI
+
+from api.server import AgentServer
+from fake_openai_server import FakeOpenAIServer, ModelBehaviour
+from tools import get_tools
+
+
+class ReadThenAnswer(FakeOpenAIServer):
+    """Reads notes.txt when asked something, answers once the tool result is back."""
+
+    def script_for(self, request: dict) -> dict:
+        if request["messages"][-1]["role"] == "tool":
+            return {"content": "Done, I read the notes."}
+        return {"tool_calls": [{"name": "ReadFile", "arguments": {
+            "filepath": "notes.txt", "start_line": None, "end_line": None, "start_byte": None, "end_byte": None}}]}
+
+
+class Client():
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader, self.writer = reader, writer
+        self._next_id = 0
+
+    async def call(self, method: str, **params):
+        self._next_id += 1
+        self.writer.write(json.dumps({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}).encode() + b"\n")
+        await self.writer.drain()
+        while True:
+            message = json.loads(await self.reader.readline())
+            if message.get("id") == self._next_id:
+                if "error" in message:
+                    raise RuntimeError(message["error"]["message"])
+                return message["result"]
+
+
+async def simulated_user(port: int, workspace: str, user: int, turns: int, latencies: list):
+    root = os.path.join(workspace, f"user{user}")
+    os.makedirs(root)
+    with open(os.path.join(root, "notes.txt"), "w") as f:
+        f.write(f"notes of user {user}\n")
+    client = Client(*await asyncio.open_connection("127.0.0.1", port, limit=16 * 1024 * 1024))
+    session_id = (await client.call("session.create", root=f"user{user}"))["session_id"]
+    for turn in range(turns):
+        started = time.perf_counter()
+        await client.call("agent.run", session_id=session_id, input=f"user {user} turn {turn}: read the notes")
+        latencies.append(time.perf_counter() - started)
+    context = (await client.call("context.get", session_id=session_id))["context"]
+    assert f"notes of user {user}\n" in context and context.count("notes of user") == 1, "sessions leaked state"
+    await client.call("session.close", session_id=session_id)
+    client.writer.close()
+
+
+async def run(users: int, turns: int, latency: float):
+    async with ReadThenAnswer(behaviours={"*": ModelBehaviour(latency=latency)}) as fake:
+        model = OpenAIChatCompletionsModel(model="fake-model", openai_client=AsyncOpenAI(base_url=fake.base_url, api_key="fake"))
+        agent = Agent(name="Coder Agent", instructions="You are a coding agent.", model=model, tools=get_tools())
+        server = AgentServer(agent, workspace=tempfile.mkdtemp(prefix="opencoder_bench_"))
+        tcp_server = await server.serve_tcp()
+        port = tcp_server.sockets[0].getsockname()[1]
+        latencies = []
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # Tool announcements
+            await asyncio.gather(*(simulated_user(port, server.workspace, user, turns, latencies) for user in range(users)))
+        wall = time.perf_counter() - started
+        tcp_server.close()
+        await server.close()
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{users:>4} users: {len(latencies) / wall:7.1f} turns/s, turn p50 {statistics.median(latencies) * 1000:6.1f}ms, "
+          f"p95 {p95 * 1000:6.1f}ms, wall {wall:.2f}s")
+
+
+async def main(turns: int = 5, latency_ms: int = 50, *user_counts: int):
+    set_tracing_disabled(True)
+    for users in user_counts or (1, 4, 16, 32):
+        await run(users, turns, latency_ms / 1000)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*[int(a) for a in sys.argv[1:]]))
@@ -0,0 +1,93 @@
+# benchmarks/bench_startup.py
+"""
+Startup cost of the REPL.
+
+1. `python -X importtime -c "import main"`: total import time and the
+   slowest top-level imports (what the first prompt has to wait for).
+2. Wall-clock from process start to the "Ask the agent:" prompt of main.py,
+   and to a built agent (`agent.get_agent()`), median of a few runs.
+
+Nothing reaches the network: the API key is fake and warm-up is disabled.
+
+Usage: python benchmarks/bench_startup.py [runs] [top_imports]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = b"Ask the agent: "
+
+
+def environment() -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OPENROUTER_API_KEY": env.get("OPENROUTER_API_KEY", "fake"),
+        "OPENCODER_WARMUP": "0",
+        "OPENCODER_CACHE_PATH": os.path.join(tempfile.gettempdir(), "opencoder_bench_startup.sqlite3"),
+        "PYTHONDONTWRITEBYTECODE": "0",
+    })
+    return env
+
+
+def import_times(statement: str, top: int):
+    """
+    Parses -X importtime output. Returns (total seconds, the `top` slowest
+    imports made directly by the statement's modules as (cumulative seconds, module)).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, env=environment(),
+                            capture_output=True, text=True)
+    total, entries = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2 # Nested imports are indented by two spaces per level
+        if depth == 0:
+            total += int(cumulative_us) / 1e6
+        elif depth == 1:
+            entries.append((int(cumulative_us) / 1e6, name.strip()))
+    return total, sorted(entries, reverse=True)[:top]
+
+
+def time_to_prompt() -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=environment(),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    while PROMPT not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError(f"main.py exited before prompting: {output.decode(errors='replace')}")
+        output += chunk
+    elapsed = time.perf_counter() - started
+    process.communicate(b"exit\n", timeout=60)
+    return elapsed
+
+
+def time_to_agent() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import agent; agent.get_agent()"], cwd=ROOT, env=environment(),
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main(runs: int = 5, top: int = 10):
+    total, slowest = import_times("import main", top)
+    print(f"import main: {total * 1000:.1f}ms of imports")
+    for seconds, name in slowest:
+        print(f"  {seconds * 1000:8.1f}ms  {name}")
+    total, _ = import_times("import agent; agent.get_agent()", top)
+    print(f"import + build agent: {total * 1000:.1f}ms of imports")
+
+    prompt = statistics.median(time_to_prompt() for _ in range(runs))
+    agent = statistics.median(time_to_agent() for _ in range(runs))
+    print(f"process start -> first prompt: {prompt * 1000:.1f}ms (median of {runs})")
+    print(f"process start -> agent built:  {agent * 1000:.1f}ms (median of {runs})")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,82 @@
+# benchmarks/bench_symbols.py
+"""
+Symbol index (api/symbol_index.py) on a source tree: what an outline costs
+against reading whole files.
+
+Reported: cold parse of every supported file, warm pass (outline cache hits),
+bytes of all outlines vs bytes of the files, and the median latency of
+go-to-definition / find-references for a few names defined in the tree.
+
+Usage: python benchmarks/bench_symbols.py [--root DIR] [--names N] [--runs N]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.search_index import SearchIndex
+from api.symbol_index import SymbolIndex, language_of, render_outline
+
+
+def source_files(root: str, index: SearchIndex):
+    for directory, subdirs, files in os.walk(root):
+        rel = os.path.relpath(directory, root).replace(os.sep, "/")
+        prefix = "" if rel == "." else rel + "/"
+        subdirs[:] = [d for d in subdirs if not index.ignore.is_ignored(prefix + d, True)]
+        for name in files:
+            path = os.path.join(directory, name)
+            if language_of(path) is not None and not index.ignore.is_ignored(prefix + name, False):
+                yield path
+
+
+def median_time(function, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def main(args):
+    root = os.path.abspath(args.root)
+    cache_dir = tempfile.mkdtemp(prefix="opencoder_symbols_")
+    search = SearchIndex(root, path=os.path.join(cache_dir, "search.sqlite3"))
+    symbols = SymbolIndex(search, path=os.path.join(cache_dir, "symbols.sqlite3"))
+    paths = list(source_files(root, search))
+
+    started = time.perf_counter()
+    outlines = {path: symbols.symbols(path) for path in paths}
+    cold = time.perf_counter() - started
+    warm = median_time(lambda: [symbols.symbols(path) for path in paths], 1)
+    file_bytes = sum(os.path.getsize(path) for path in paths)
+    outline_bytes = sum(len(render_outline(os.path.relpath(path, root), found).encode()) for path, found in outlines.items())
+    print(f"tree: {root} ({len(paths)} source files, {file_bytes / 1024:.0f}KiB)")
+    print(f"{'cold parse':<22} {cold * 1000:10.1f}ms  ({sum(len(s) for s in outlines.values())} symbols)")
+    print(f"{'warm (cache hits)':<22} {warm * 1000:10.1f}ms")
+    print(f"{'outline bytes':<22} {outline_bytes / 1024:10.1f}KiB  ({outline_bytes / max(1, file_bytes):.1%} of the files)")
+
+    search.refresh()
+    names = sorted({s.name for found in outlines.values() for s in found if s.kind in ("class", "function", "method")})
+    for name in random.Random(0).sample(names, min(args.names, len(names))):
+        definition = median_time(lambda: symbols.definitions(name), args.runs)
+        references = median_time(lambda: symbols.references(name), args.runs)
+        print(f"{name[:22]:<22} definition {definition * 1000:7.1f}ms ({len(symbols.definitions(name))} found)   "
+              f"references {references * 1000:7.1f}ms ({len(symbols.references(name))} found)")
+    symbols.close()
+    search.close()
+    shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--names", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+# benchmarks/bench_transport.py
+"""
+Default AsyncOpenAI transport vs the pooled one from api/transport.py.
+
+FakeOpenAIServer delays every new connection by `connect_ms` (standing in
+for DNS, TLS and the gateway hop). Each setup makes a first request, then
+bursts of concurrent requests separated by idle gaps longer than httpx's
+default 5s keep-alive only if asked to (`gap_s`). The pooled setup is warmed
+up first. PoolMetrics is checked against the connections the server saw.
+
+Usage: python benchmarks/bench_transport.py [connect_ms] [bursts] [burst_size] [gap_s]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from openai import AsyncOpenAI
+
+from api.transport import PoolMetrics, build_http_client, warm_up
+from fake_openai_server import FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+async def timed(client: AsyncOpenAI) -> float:
+    started = time.perf_counter()
+    await client.chat.completions.create(model="fake-model", messages=MESSAGES)
+    return time.perf_counter() - started
+
+
+async def scenario(client: AsyncOpenAI, bursts: int, burst_size: int, gap: float):
+    first = await timed(client)
+    latencies = []
+    for _ in range(bursts):
+        if gap:
+            await asyncio.sleep(gap)
+        latencies.extend(await asyncio.gather(*(timed(client) for _ in range(burst_size))))
+    return first, latencies
+
+
+def report(name: str, first: float, latencies, connections: int, metrics: PoolMetrics = None):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    line = (f"{name:<16} first request {first * 1000:7.1f}ms, then p50 {statistics.median(latencies) * 1000:6.1f}ms "
+            f"p95 {p95 * 1000:6.1f}ms, server saw {connections} connections")
+    print(line)
+    if metrics is not None:
+        print(f"{'':<16} pool metrics: {metrics.stats()}")
+
+
+async def main(connect_ms: int = 100, bursts: int = 10, burst_size: int = 8, gap_s: float = 0.0):
+    connect_delay = connect_ms / 1000
+
+    async with FakeOpenAIServer(connect_delay=connect_delay) as server:
+        client = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+        report("default", *await scenario(client, bursts, burst_size, gap_s), server.connections)
+        await client.close()
+
+    async with FakeOpenAIServer(connect_delay=connect_delay) as server:
+        metrics = PoolMetrics()
+        http_client = build_http_client(max_connections=burst_size, max_keepalive=burst_size, metrics=metrics)
+        client = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0, http_client=http_client)
+        warmed = await warm_up(http_client, client.base_url, connections=burst_size)
+        first, latencies = await scenario(client, bursts, burst_size, gap_s)
+        report(f"pooled+warm({warmed})", first, latencies, server.connections, metrics)
+        assert metrics.connections_opened == server.connections, "pool metrics disagree with the server"
+        await client.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(main(*(int(a) for a in args[:3]), *(float(a) for a in args[3:4])))
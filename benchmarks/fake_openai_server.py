@@ -0,0 +1,221 @@
+# benchmarks/fake_openai_server.py
+"""
+A local, dependency-free fake of the OpenAI chat-completions API.
+
+It answers POST .../chat/completions (streamed or not) from a script of
+steps, so the agent, the scheduler and the transport can be exercised
+offline. Each step is either a text answer or a list of tool calls:
+
+    {"content": "Done!"}
+    {"tool_calls": [{"name": "ReadFile", "arguments": {"filepath": "a.py"}}]}
+
+Requests consume the steps in order (wrapping around), or per conversation
+with `script_for(request)` overridden. Failures and latency can be injected
+per model to test retries and routing, and `connect_delay` makes every new
+connection slow to test pooling.
+
+Usage: python benchmarks/fake_openai_server.py [port]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ModelBehaviour():
+    """Latency and failure injection for one model name ("*" matches any model)."""
+    latency: float = 0.0              # Seconds before the first byte
+    latency_jitter: float = 0.0       # Extra uniform random latency
+    fail_first: int = 0               # Answer the first N requests with `fail_status`
+    fail_rate: float = 0.0            # Then fail this fraction of requests
+    fail_status: int = 429
+    token_delay: float = 0.0          # Delay between streamed chunks
+    requests: int = field(default=0, init=False)
+
+
+class FakeOpenAIServer():
+    def __init__(self, script: Optional[List[dict]] = None, host: str = "127.0.0.1", port: int = 0,
+                 behaviours: Optional[Dict[str, ModelBehaviour]] = None, seed: int = 0,
+                 connect_delay: float = 0.0):
+        self.script = script or [{"content": "Hello from the fake model."}]
+        self.host = host
+        self.port = port
+        self.behaviours = behaviours or {}
+        self.connect_delay = connect_delay # Stands in for DNS/TLS/proxy setup of a new connection
+        self.requests = 0
+        self.connections = 0
+        self.request_log: List[dict] = [] # (model, status, messages count) per request
+        self._step = 0
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> "FakeOpenAIServer":
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers): # Idle keep-alive connections would block wait_closed()
+                writer.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def script_for(self, request: dict) -> dict:
+        """Picks the next step. Override to script per conversation."""
+        step = self.script[self._step % len(self.script)]
+        self._step += 1
+        return step
+
+    # --- HTTP plumbing ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            if self.connect_delay:
+                await asyncio.sleep(self.connect_delay)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _version = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._handle_request(method, path, body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError, BrokenPipeError, asyncio.CancelledError):
+            pass # Client went away, or the server is stopping
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, payload: dict, extra_headers: str = ""):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n{extra_headers}\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _handle_request(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        self.requests += 1
+        if method == "GET" and path.rstrip("/").endswith("/models"):
+            await self._send(writer, 200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+            return
+        if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+            await self._send(writer, 404, {"error": {"message": f"Unknown endpoint {method} {path}"}})
+            return
+        request = json.loads(body or b"{}")
+        model = request.get("model", "fake-model")
+        behaviour = self.behaviours.get(model) or self.behaviours.get("*") or ModelBehaviour()
+        behaviour.requests += 1
+        delay = behaviour.latency + self._random.uniform(0, behaviour.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if behaviour.requests <= behaviour.fail_first or self._random.random() < behaviour.fail_rate:
+            self.request_log.append({"model": model, "status": behaviour.fail_status})
+            await self._send(writer, behaviour.fail_status,
+                             {"error": {"message": "Injected failure", "type": "rate_limit_error", "code": behaviour.fail_status}},
+                             "Retry-After: 0\r\n" if behaviour.fail_status == 429 else "")
+            return
+        self.request_log.append({"model": model, "status": 200, "messages": len(request.get("messages", []))})
+        step = self.script_for(request)
+        if request.get("stream"):
+            await self._stream(writer, model, step, behaviour.token_delay)
+        else:
+            await self._send(writer, 200, self._completion(model, step))
+
+    # --- Payloads ---
+
+    @staticmethod
+    def _tool_calls(step: dict) -> List[dict]:
+        return [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+        } for call in step.get("tool_calls", [])]
+
+    @staticmethod
+    def _usage(step: dict) -> dict:
+        completion_tokens = max(1, len(step.get("content") or "") // 4)
+        return {"prompt_tokens": 10, "completion_tokens": completion_tokens, "total_tokens": 10 + completion_tokens}
+
+    def _completion(self, model: str, step: dict) -> dict:
+        tool_calls = self._tool_calls(step)
+        message = {"role": "assistant", "content": step.get("content")}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": self._usage(step),
+        }
+
+    async def _stream(self, writer: asyncio.StreamWriter, model: str, step: dict, token_delay: float):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+
+        async def send_event(data: str):
+            payload = f"data: {data}\n\n".encode()
+            writer.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            await writer.drain()
+            if token_delay:
+                await asyncio.sleep(token_delay)
+
+        def chunk(delta: dict, finish_reason=None, usage=None) -> str:
+            return json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                               **({"usage": usage} if usage else {})})
+
+        content = step.get("content") or ""
+        for start in range(0, len(content), 8): # A few characters per chunk, like real tokens
+            await send_event(chunk({"role": "assistant", "content": content[start:start + 8]}))
+        tool_calls = self._tool_calls(step)
+        for index, call in enumerate(tool_calls):
+            await send_event(chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                                    "function": {"name": call["function"]["name"], "arguments": ""}}]}))
+            await send_event(chunk({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]}))
+        await send_event(chunk({}, "tool_calls" if tool_calls else "stop", self._usage(step)))
+        await send_event("[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def _serve(port: int):
+    script_path = os.getenv("FAKE_OPENAI_SCRIPT")
+    script = json.load(open(script_path)) if script_path else None
+    async with FakeOpenAIServer(script=script, port=port) as server:
+        print(f"Fake OpenAI server listening on {server.base_url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
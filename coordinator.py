@@ -0,0 +1,26 @@
+#
+import argparse
+import asyncio
+import os
+from agent import get_agent
+from api.coordinator import DEFAULT_WORKERS, TODO_FILENAME, Coordinator
+from api.metrics import configure_from_env
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run the unchecked items of todo.md with several agent workers at once.")
+    parser.add_argument("--root", default=".", help="workspace (a git repository uses worktrees, else scratch copies)")
+    parser.add_argument("--todo", default=None, help=f"checklist to run (default: <root>/{TODO_FILENAME})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="items run at the same time")
+    parser.add_argument("--isolation", choices=("auto", "worktree", "copy"), default="auto")
+    parser.add_argument("--no-merge", action="store_true", help="leave the results on a branch (or scratch copy)")
+    args = parser.parse_args()
+
+    configure_from_env() # OPENCODER_METRICS_JSONL / OPENCODER_METRICS_PROM
+    coordinator = Coordinator(os.path.abspath(args.root), agent=get_agent(), workers=args.workers,
+                              isolation=args.isolation, merge=not args.no_merge)
+    report = await coordinator.run(args.todo)
+    print(report.describe())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,25 +1,48 @@
 # load_client.py
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
+# openai, agents, httpx and dotenv are imported on first use: importing this
+# module must stay cheap, so the REPL can show its prompt right away.
 import os
-from agents import set_default_openai_client, set_tracing_disabled
+import threading
 
 client = None
+http_client = None
+pool_metrics = None
+scheduler = None
+agent_client = None
+_lock = threading.RLock() # The agent may be built in a worker thread while the REPL waits for input
+
+# Tried in this order when the selected model is rate limited or failing. Opt-in:
+# without a comma separated list in OPENCODER_FALLBACK_MODELS only the configured model answers
+DEFAULT_FALLBACK_MODELS = []
 
 def get_client():
-    if(isClientLoaded()):
-        return client
-    load_client()
-    return get_client()
+    with _lock:
+        if(isClientLoaded()):
+            return client
+        load_client()
+        return get_client()
 
 def isClientLoaded():
     return client is not None
 
 def load_client():
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+    from agents import set_default_openai_client, set_tracing_disabled
+    from api.transport import build_http_client
     load_dotenv()
-    global client
+    global client, http_client
+    # One explicit pool shared by every request (and by the scheduler's copy of the client)
+    http_client = build_http_client(
+        max_connections=int(os.getenv("OPENCODER_HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive=int(os.getenv("OPENCODER_HTTP_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("OPENCODER_HTTP_KEEPALIVE_EXPIRY", "120")),
+        http2=os.getenv("OPENCODER_HTTP2", "0") == "1",
+        metrics=get_pool_metrics(),
+    )
     client = AsyncOpenAI(
-        base_url="https://gateway.helicone.ai/api/v1",
+        http_client=http_client,
+        base_url=os.getenv("OPENCODER_BASE_URL", "https://gateway.helicone.ai/api/v1"),
         api_key=os.getenv("OPENROUTER_API_KEY"),
         default_headers={
             "Helicone-Auth": f"Bearer {os.getenv('HELICONE_API_KEY')}",
@@ -32,4 +55,63 @@ def load_client():
     )
     set_tracing_disabled(True)
     set_default_openai_client(client)
-    return client
\ No newline at end of file
+    return client
+
+def get_pool_metrics():
+    global pool_metrics
+    with _lock:
+        if pool_metrics is None:
+            from api.transport import PoolMetrics
+            pool_metrics = PoolMetrics()
+        return pool_metrics
+
+async def warm_up_client():
+    """Opens pooled connections to the gateway before the first request (OPENCODER_WARMUP=0 disables it)."""
+    from api.transport import warm_up
+    if os.getenv("OPENCODER_WARMUP", "1") == "0":
+        return 0
+    client = get_client()
+    return await warm_up(http_client, client.base_url, connections=int(os.getenv("OPENCODER_WARMUP_CONNECTIONS", "1")))
+
+def get_scheduler():
+    """The client wrapped in a RequestScheduler (pacing, retries, model fallback)."""
+    from api.scheduler import RequestScheduler
+    global scheduler
+    with _lock:
+        if scheduler is not None:
+            return scheduler
+        fallback_models = os.getenv("OPENCODER_FALLBACK_MODELS")
+        hedge_after = os.getenv("OPENCODER_HEDGE_AFTER")
+        scheduler = RequestScheduler(
+            get_client(),
+            fallback_models=[m.strip() for m in fallback_models.split(",") if m.strip()]
+                if fallback_models is not None else list(DEFAULT_FALLBACK_MODELS),
+            rate_per_second=float(os.getenv("OPENCODER_RATE_PER_SECOND", "1.0")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+        return scheduler
+
+def get_agent_client():
+    """
+    What the agent model talks to: the scheduler, behind the local response cache
+    unless OPENCODER_CACHE=off. OPENCODER_CACHE=record/replay records a session
+    and re-runs it offline.
+    """
+    from dotenv import load_dotenv
+    from api.response_cache import CachedClient, DEFAULT_CACHE_PATH, DEFAULT_TTL, ResponseCache
+    global agent_client
+    with _lock:
+        if agent_client is not None:
+            return agent_client
+        load_dotenv()
+        mode = os.getenv("OPENCODER_CACHE", "on")
+        if mode == "off":
+            agent_client = get_scheduler()
+        else:
+            ttl = os.getenv("OPENCODER_CACHE_TTL")
+            cache = ResponseCache(
+                path=os.getenv("OPENCODER_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl=float(ttl) if ttl else DEFAULT_TTL,
+            )
+            agent_client = CachedClient(get_scheduler(), cache, mode)
+        return agent_client
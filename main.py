@@ -1,21 +1,80 @@
 #
-from agent import get_agent
+from agent import get_agent, get_model
 from api.agent_runner import AgentRunner
-from api.context_handler import get_context
+from api.context_handler import get_context, get_session
+from api.metrics import configure_from_env, get_metrics
+from load_client import get_agent_client, get_pool_metrics, warm_up_client
+import argparse
 import asyncio
+import os
+
+STREAM_RESPONSES = os.getenv("OPENCODER_STREAM", "1") != "0" # Print the answer while it is generated
+JOURNAL_CONTEXT = os.getenv("OPENCODER_JOURNAL", "1") != "0" # Persist the context to .opencoder/sessions
+
+async def prepare():
+    """Builds the agent (heavy imports) and warms up the connection while the user types."""
+    agent = await asyncio.to_thread(get_agent)
+    await warm_up_client()
+    return agent
 
 async def main():
-    agent = get_agent()
-    runner = AgentRunner(agent)
+    parser = argparse.ArgumentParser(description="Interactive coding agent.")
+    parser.add_argument("--resume", action="store_true", help="restore the context of the previous run of this session")
+    parser.add_argument("--session", default="default", help="session name the context is journaled under")
+    args = parser.parse_args()
+
+    print("Selected model: "+get_model())
+    configure_from_env() # OPENCODER_METRICS_JSONL / OPENCODER_METRICS_PROM
+    session = get_session()
+    session.id = args.session
+    if(JOURNAL_CONTEXT):
+        report = session.attach_journal(resume=args.resume)
+        if(report is not None):
+            print(f"Resumed session '{session.id}': {report['messages']} messages, {report['files']} files unchanged, "
+                  f"{report['reread']} re-read, {report['trees']} trees, {report['dropped']} dropped "
+                  f"in {report['elapsed_ms']:.1f}ms")
+    elif(args.resume):
+        print("Warning: --resume has no effect with OPENCODER_JOURNAL=0")
+    preparing = asyncio.create_task(prepare())
+    runner = None
     while(True):
-        user_input = input("Ask the agent: ")
+        user_input = await asyncio.to_thread(input, "Ask the agent: ") # Keeps the event loop (warm-up) running
         if(user_input == "exit"):
             break
         if(user_input == "context"):
             print(get_context().serialize())
             continue
-        final_response = await runner.run(user_input)
-        print(final_response)
+        if(user_input == "metrics"):
+            print(get_metrics().summary.render())
+            continue
+        if(user_input == "pool"):
+            print(get_pool_metrics().stats())
+            continue
+        if(user_input == "cache"):
+            print(get_context().cache_stats())
+            print(f"prompt: {session.prompt_layout.stats()}")
+            print(f"history: {session.history.stats()}")
+            print(f"prefetch: {session.prefetcher.stats()}")
+            cache = getattr(get_agent_client(), "cache", None)
+            if(cache is not None):
+                print(f"responses: {cache.stats()}")
+            continue
+        if(runner is None):
+            runner = AgentRunner(await preparing)
+        if(STREAM_RESPONSES):
+            async for event in runner.run_streamed(user_input):
+                if(event.kind == "text"):
+                    print(event.text, end="", flush=True)
+                elif(event.kind == "tool_call"):
+                    print(f"\n[calling {event.text}]", flush=True)
+            print()
+        else:
+            final_response = await runner.run(user_input)
+            print(final_response)
+        print(f"({runner.last_turn.describe()})")
+    preparing.cancel()
+    get_metrics().close()
+    await session.close()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+#
+import argparse
+import asyncio
+import sys
+from agent import get_agent
+from api.server import AgentServer
+
+async def main():
+    parser = argparse.ArgumentParser(description="Serve agent sessions over JSON-RPC (one JSON object per line).")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="listen on TCP instead of stdio")
+    parser.add_argument("--workspace", default=None, help="directory session roots are relative to (default: cwd)")
+    args = parser.parse_args()
+
+    server = AgentServer(get_agent(), workspace=args.workspace)
+    try:
+        if(args.tcp is None):
+            await server.serve_stdio()
+        else:
+            host, port = args.tcp.rsplit(":", 1)
+            tcp_server = await server.serve_tcp(host, int(port))
+            print(f"Serving agent sessions on {host}:{tcp_server.sockets[0].getsockname()[1]}", file=sys.stderr)
+            async with tcp_server:
+                await tcp_server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
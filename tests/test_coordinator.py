@@ -0,0 +1,66 @@
+# tests/test_coordinator.py
+import asyncio
+import os
+import shutil
+import subprocess
+
+from api.coordinator import Coordinator, mark_done, parse_todo
+
+
+def test_mark_done_splits_lines_like_parse_todo():
+    text = "- [ ] one\fstill one\n- [ ] two \n- [ ] three\r\n"
+    tasks = parse_todo(text)
+    assert [task.text for task in tasks] == ["one", "two", "three"]
+    assert mark_done(text, tasks[1:]) == "- [ ] one\fstill one\n- [x] two \n- [x] three\r\n"
+
+
+def test_items_behind_a_later_blocked_item_are_reported(tmp_path):
+    (tmp_path / "todo.md").write_text("- [ ] a (after: 3)\n- [ ] b\n- [ ] c (after: 2)\n")
+
+    async def run_task(session, task, prompt):
+        if task.text == "b":
+            raise RuntimeError("boom")
+        return "ok"
+
+    report = asyncio.run(Coordinator(str(tmp_path), run_task=run_task, isolation="copy").run())
+    assert [(r.task.text, r.status) for r in report.results] == [("a", "blocked"), ("b", "failed"), ("c", "blocked")]
+
+
+def test_copy_results_outlive_the_run_without_merge(tmp_path):
+    (tmp_path / "todo.md").write_text("- [ ] add a file\n")
+
+    async def run_task(session, task, prompt):
+        with open(os.path.join(session.root, "new.txt"), "w") as f:
+            f.write("new\n")
+        return "ok"
+
+    report = asyncio.run(Coordinator(str(tmp_path), run_task=run_task, isolation="copy", merge=False).run())
+    kept = report.merge_note.split("results kept in ", 1)[1]
+    try:
+        assert (tmp_path / "todo.md").read_text() == "- [ ] add a file\n"
+        assert not (tmp_path / "new.txt").exists()
+        with open(os.path.join(kept, "new.txt")) as f:
+            assert f.read() == "new\n"
+    finally:
+        shutil.rmtree(kept, ignore_errors=True)
+
+
+def test_todo_unchanged_when_the_final_merge_fails(tmp_path):
+    todo = "- [ ] edit the file\n"
+    (tmp_path / "todo.md").write_text(todo)
+    (tmp_path / "file.txt").write_text("base\n")
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@localhost"]
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "-A"], cwd=tmp_path, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=tmp_path, check=True)
+
+    async def run_task(session, task, prompt):
+        with open(os.path.join(session.root, "file.txt"), "w") as f:
+            f.write("from the worker\n")
+        (tmp_path / "file.txt").write_text("edited meanwhile\n") # Uncommitted: the final merge refuses to run
+        return "ok"
+
+    report = asyncio.run(Coordinator(str(tmp_path), run_task=run_task, isolation="worktree").run())
+    assert report.results[0].status == "done"
+    assert report.merge_note.startswith("could not merge")
+    assert (tmp_path / "todo.md").read_text() == todo
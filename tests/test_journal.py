@@ -0,0 +1,57 @@
+# tests/test_journal.py
+import os
+
+from api.context import Context
+from api.journal import SessionJournal
+from api.tree_index import TreeIndex
+
+
+def _age_blobs(blob_dir: str, seconds: int = 3600):
+    for directory, _, names in os.walk(blob_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_records_are_written_in_order_and_restored(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("value = 2\n")
+    journal = SessionJournal(str(tmp_path / "sessions" / "s"))
+    context = Context()
+    context.journal = journal
+    context.add_user_message("hello")
+    context.add_file(str(path), "value = 1\n")
+    context.add_file(str(path), "value = 2\n")
+    journal.close()
+
+    restored = Context()
+    report = SessionJournal(str(tmp_path / "sessions" / "s")).restore(restored, TreeIndex())
+    assert restored.messages == ["user: hello"]
+    assert restored.files[str(path)] == "value = 2\n"
+    assert report["files"] == 1
+
+
+def test_snapshot_prunes_unreferenced_blobs(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("value = 2\n")
+    sessions = tmp_path / "sessions"
+    other = SessionJournal(str(sessions / "other"))
+    other_context = Context()
+    other_context.journal = other
+    other_context.add_file(str(path), "kept by the other session\n")
+    other.close()
+
+    journal = SessionJournal(str(sessions / "s"))
+    context = Context()
+    context.journal = journal
+    context.add_file(str(path), "value = 1\n")
+    context.add_file(str(path), "value = 2\n") # The first blob is no longer referenced
+    journal.flush()
+    _age_blobs(journal.blobs.directory)
+    journal.compact()
+
+    assert journal.pruned_blobs == 1
+    remaining = {name for _, _, names in os.walk(journal.blobs.directory) for name in names}
+    assert remaining == {journal.files[str(path)]["blob"], other.files[str(path)]["blob"]}
+    journal.close()
@@ -0,0 +1,104 @@
+# tests/test_patching.py
+import os
+import stat
+
+import pytest
+
+from api.patching import (Hunk, PatchError, apply_hunks, describe_changes, find_hunk, hunk_from_search_replace,
+                          parse_unified_diff, write_atomic)
+
+DIFF = """--- a/module.py
++++ b/module.py
+@@ -1,3 +1,3 @@
+ a = 1
+-b = 2
++b = 20
+ c = 3
+@@ -5,2 +5,3 @@
+ e = 5
++f = 6
+\\ No newline at end of file
+"""
+
+
+def test_parse_unified_diff():
+    hunks = parse_unified_diff(DIFF)
+    assert [(h.old, h.new, h.hint) for h in hunks] == [
+        (["a = 1", "b = 2", "c = 3"], ["a = 1", "b = 20", "c = 3"], 0),
+        (["e = 5"], ["e = 5", "f = 6"], 4),
+    ]
+
+
+def test_parse_rejects_bad_diffs():
+    with pytest.raises(PatchError):
+        parse_unified_diff("just some text\n")
+    with pytest.raises(PatchError):
+        parse_unified_diff("@@ -1 +1 @@\n*a = 1\n")
+    with pytest.raises(PatchError):
+        hunk_from_search_replace("  \n", "a = 1")
+
+
+def test_search_replace_hunk():
+    hunk = hunk_from_search_replace("a = 1\r\nb = 2\n", "a = 10\n")
+    assert (hunk.old, hunk.new, hunk.hint) == (["a = 1", "b = 2"], ["a = 10"], None)
+
+
+def test_find_hunk_exact_whitespace_and_fuzzy():
+    lines = ["def f(x):", "    total = x + 1", "    return total * 2", "", "print(f(3))"]
+    assert find_hunk(lines, Hunk(["    total = x + 1"], [])) == (1, "exact")
+    assert find_hunk(lines, Hunk(["def  f(x):", "  total = x +  1"], [])) == (0, "whitespace")
+    assert find_hunk(lines, Hunk(["def f(x):", "    total = x + 1", "    return total * 3"], [])) == (0, "fuzzy")
+
+
+def test_find_hunk_rejects_missing_and_ambiguous():
+    lines = ["x = 1", "y = 2", "x = 1", "y = 2"]
+    with pytest.raises(PatchError, match="not found"):
+        find_hunk(lines, Hunk(["completely = different"], []))
+    with pytest.raises(PatchError, match="matches 2 places"):
+        find_hunk(lines, Hunk(["x = 1", "y = 2"], []))
+    assert find_hunk(lines, Hunk(["x = 1", "y = 2"], [], hint=2)) == (2, "exact") # A line number picks one
+
+
+def test_hints_shift_across_hunks():
+    text = "".join(f"v = {n % 2}\n" for n in range(8)) # Every other line repeats
+    diff = "@@ -1,1 +1,3 @@\n-v = 0\n+v = 0\n+w = 0\n+w = 1\n@@ -5,1 +7,1 @@\n-v = 0\n+v = 'four'\n"
+    new_text, applied = apply_hunks(text, parse_unified_diff(diff))
+    assert new_text.splitlines()[6] == "v = 'four'" # Old line 5, two lines further down
+    assert [(h.start, h.match) for h in applied] == [(0, "exact"), (6, "exact")]
+
+
+@pytest.mark.parametrize("text", ["a = 1\nb = 2\n", "a = 1\nb = 2"])
+def test_final_newline_kept(text):
+    new_text, _ = apply_hunks(text, [hunk_from_search_replace("b = 2", "b = 3\nc = 4")])
+    assert new_text == text.replace("b = 2", "b = 3\nc = 4")
+    new_text, _ = apply_hunks(text, [Hunk([], ["z = 0"], hint=2)]) # Insertion at the end
+    assert new_text == "a = 1\nb = 2\nz = 0" + ("\n" if text.endswith("\n") else "")
+
+
+def test_untouched_lines_are_byte_identical():
+    text = "a = 1\r\nsection\fbreak\ns = 'x\u2028y'\r\nc = 3\nd = 4\r\n"
+    hunk = hunk_from_search_replace("c = 3", "c = 30\nc2 = 31")
+    new_text, applied = apply_hunks(text, [hunk])
+    assert new_text == "a = 1\r\nsection\fbreak\ns = 'x\u2028y'\r\nc = 30\nc2 = 31\nd = 4\r\n"
+    assert applied[0].start == 3
+    assert "     4  c = 30" in describe_changes(new_text, applied).splitlines()
+
+
+def test_write_atomic_keeps_mode(tmp_path):
+    path = tmp_path / "run.sh"
+    path.write_text("echo old\n")
+    os.chmod(path, 0o750)
+    write_atomic(str(path), "echo new\n")
+    assert path.read_text() == "echo new\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o750
+
+
+def test_write_atomic_follows_symlinks(tmp_path):
+    target = tmp_path / "real.py"
+    target.write_text("old = 1\n")
+    link = tmp_path / "link.py"
+    link.symlink_to(target)
+    write_atomic(str(link), "new = 2\n")
+    assert link.is_symlink()
+    assert target.read_text() == "new = 2\n"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
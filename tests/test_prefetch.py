@@ -0,0 +1,42 @@
+# tests/test_prefetch.py
+import os
+import time
+
+from api.prefetch import Prefetcher
+
+
+def _warmed(tmp_path) -> Prefetcher:
+    (tmp_path / "main.py").write_text("value = 1\n")
+    prefetcher = Prefetcher(str(tmp_path), budget=1024 * 1024)
+    prefetcher.after_tree(str(tmp_path))
+    deadline = time.monotonic() + 5
+    while prefetcher.stats()["cached_files"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prefetcher.stats()["cached_files"] == 1
+    return prefetcher
+
+
+def test_same_size_edit_with_restored_mtime_is_not_served(tmp_path):
+    prefetcher = _warmed(tmp_path)
+    path = tmp_path / "main.py"
+    stat = os.stat(path)
+    path.write_text("value = 2\n") # Same size, and the mtime is put back
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert prefetcher.take(str(path)) is None
+    assert prefetcher.stats()["stale"] == 1
+
+
+def test_invalidate_drops_written_paths(tmp_path):
+    prefetcher = _warmed(tmp_path)
+    prefetcher.invalidate([str(tmp_path)]) # A directory drops everything below it
+    stats = prefetcher.stats()
+    assert stats["cached_files"] == 0 and stats["wasted_bytes"] == len("value = 1\n")
+    assert prefetcher.take(str(tmp_path / "main.py")) is None
+    assert prefetcher.stats()["stale"] == 0 # Dropped before it could be served, not found stale
+
+
+def test_clear_drops_everything(tmp_path):
+    prefetcher = _warmed(tmp_path)
+    prefetcher.clear()
+    assert prefetcher.stats()["cached_files"] == 0
+    assert prefetcher.take(str(tmp_path / "main.py")) is None
@@ -0,0 +1,71 @@
+# tests/test_watcher.py
+import os
+
+import pytest
+
+from api.context import Context
+from api.tree_index import TreeIndex
+from api.watcher import FileWatcher
+
+
+def _edit(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+    stat = os.stat(path) # Same size: make sure the mtime moves even on coarse filesystems
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_file_cached_after_sync_is_refreshed(tmp_path, use_inotify):
+    path = tmp_path / "module.py"
+    path.write_text("old = 1\n")
+    context = Context()
+    watcher = FileWatcher(context, TreeIndex(), use_inotify=use_inotify)
+    try:
+        assert watcher.sync() == [] # Nothing cached yet
+        context.add_file(str(path), path.read_text())
+        _edit(str(path), "new = 2\n")
+        assert watcher.sync() == [str(path)]
+        assert context.files[str(path)] == "new = 2\n"
+    finally:
+        watcher.close()
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_own_write_is_not_reported(tmp_path, use_inotify):
+    path = tmp_path / "module.py"
+    path.write_text("value = 1\n")
+    context = Context()
+    watcher = FileWatcher(context, TreeIndex(), use_inotify=use_inotify)
+    try:
+        _edit(str(path), "value = 2\n")
+        context.add_file(str(path), "value = 2\n") # A tool wrote the file, then cached what it wrote
+        assert watcher.sync() == []
+    finally:
+        watcher.close()
+
+
+def test_sync_paths_updates_search_index_without_refresh(tmp_path):
+    from api.search_index import SearchIndex
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("alpha = 1\n")
+    index = SearchIndex(str(tmp_path), path=str(tmp_path / ".opencoder" / "index.db"))
+    watcher = FileWatcher(Context(), TreeIndex())
+    try:
+        if watcher.backend != "inotify":
+            pytest.skip("inotify unavailable")
+        index.refresh()
+        assert watcher.watch_directories(index.directories())
+        (tmp_path / "pkg" / "a.py").write_text("omega = 1\n")
+        (tmp_path / "new").mkdir()
+        (tmp_path / "new" / "b.py").write_text("omega = 2\n")
+        _changed, paths = watcher.sync_paths()
+        index.update_paths(paths)
+        refreshed = index.last_refresh
+        assert sorted(m.path for m in index.search("omega").matches) == ["new/b.py", "pkg/a.py"]
+        assert index.search("alpha").matches == []
+        assert index.last_refresh == refreshed # Found through the delta, not a re-walk
+        assert str(tmp_path / "new") in index.directories()
+    finally:
+        watcher.close()
+        index.close()
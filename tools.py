@@ -3,14 +3,31 @@
 import os
 import os.path # Explicit import for clarity
 import logging
-import subprocess
+import re
+import threading
+from typing import List, Literal, Optional
+from pydantic import BaseModel
 from agents import function_tool
-from api.context_handler import get_context # Assuming this context handler exists and works
+from api.context_handler import get_context, get_tree_index, get_watcher, get_shell_session, get_session, resolve_path # Assuming this context handler exists and works
+from api.shell import run_command
+from api.file_reader import read_file_slice, slice_key, split_slice_key
+from api.search_index import DEFAULT_MAX_RESULTS
+from api.symbol_index import language_of, render_outline
+from api.patching import PatchError, apply_hunks, describe_changes, hunk_from_search_replace, parse_unified_diff, write_atomic
+from api.tree_index import TREE_KEY_PREFIX, tree_key, refresh_rendered_trees as _refresh_rendered_trees
+from api.metrics import instrument_tool, record_tool_status
+from api.locking import Claim
+from api.tool_pool import concurrent_tool, reads, writes
 
 logger = logging.getLogger(__name__)
 
+_console_lock = threading.Lock()
+
 # --- Configuration ---
 SHELL_TIMEOUT = 60 # Increased timeout slightly
+SHELL_OUTPUT_TAIL_BYTES = 16 * 1024 # Output kept per stream (stdout/stderr) for the context
+# Run commands in one long-lived shell (keeps cd/env/venv between calls). Set OPENCODER_PERSISTENT_SHELL=0 to spawn one shell per command.
+SHELL_PERSISTENT_SESSION = os.getenv("OPENCODER_PERSISTENT_SHELL", "1") != "0"
 TODO_FILENAME = "todo.md" # Define as constant
 
 # --- Console Formatting ---
@@ -21,17 +38,24 @@ RESET_COLOR = "\033[0m"
 
 # --- Helper Functions ---
 
-def announce_execution_output(tool_name: str, execution_details: str, status: str, output: str):
-    """Announces the result of a tool execution to context and console."""
+def announce_execution_output(tool_name: str, execution_details: str, status: str, output: str, console_note: str = ""):
+    """
+    Announces the result of a tool execution to context and console.
+    console_note (e.g. timings) is only printed, so the context stays reproducible.
+    """
     prefix = GREEN_PREFIX if status == "success" else RED_PREFIX
     console_output = f"{prefix}{tool_name}: {RESET_COLOR}{execution_details} -> {status.upper()}"
+    if console_note:
+        console_output += f" ({console_note})"
     if output and status != "success": # Only show output details on console for errors
         console_output += f"\n{YELLOW_PREFIX}Output: {RESET_COLOR}{output}"
     elif status == "success" and output and output not in ["successful", "successful, tree updated", "File content appended into the chat history"]:
          # Optionally show non-generic success output
          console_output += f"\n{YELLOW_PREFIX}Output: {RESET_COLOR}{output}"
 
-    print(console_output)
+    with _console_lock: # Concurrent tool calls would interleave their lines
+        print(console_output)
+    record_tool_status(status) # Marks the running tool call as failed in the metrics
 
     # Add concise info to agent context
     context_message = f"Tool: {tool_name}\nAction: {execution_details}\nStatus: {status}\nOutput: {output}"
@@ -39,35 +63,19 @@ def announce_execution_output(tool_name: str, execution_details: str, status: st
 
 def get_parent_dir(filepath: str) -> str:
     """Safely gets the parent directory of a path."""
-    return os.path.dirname(os.path.abspath(filepath))
+    return os.path.dirname(resolve_path(filepath))
 
-def _build_tree(root: str, prefix: str = "") -> str:
-    """Recursive helper to build the directory tree string."""
-    tree = ""
-    try:
-        # Sort entries, directories first, then files
-        entries = sorted(os.listdir(root), key=lambda x: (not os.path.isdir(os.path.join(root, x)), x.lower()))
-    except OSError as e:
-        # Handle cases where listing is not possible (e.g., permissions) early
-        return f"{prefix}└── [Error listing directory: {e.strerror}]\n"
-
-    for index, entry in enumerate(entries):
-        path = os.path.join(root, entry)
-        connector = "└── " if index == len(entries) - 1 else "├── "
-        tree += f"{prefix}{connector}{entry}\n"
-        if os.path.isdir(path):
-            # Check for recursion depth or other limits if necessary
-            new_prefix = prefix + ("    " if index == len(entries) - 1 else "│   ")
-            tree += _build_tree(path, new_prefix) # Recursive call
-    return tree
+def refresh_rendered_trees(abs_paths: List[str]):
+    """Re-renders the trees in the context that contain any of the given paths."""
+    _refresh_rendered_trees(get_tree_index(), get_context(), abs_paths)
 
 def get_and_update_tree(target_path: str) -> str:
     """
-    Generates a directory tree string starting from target_path.
-    Updates the context with the generated tree.
+    Scans target_path into the tree index and renders its directory tree.
+    Updates the context with the generated tree, keyed by absolute path.
     Handles cases where the path is not a valid directory.
     """
-    abs_path = os.path.abspath(target_path)
+    abs_path = resolve_path(target_path)
     tool_name = "GetTree (Helper)"
     action_details = f"Generate tree for '{target_path}'"
 
@@ -82,9 +90,12 @@ def get_and_update_tree(target_path: str) -> str:
         return error_msg
 
     try:
-        tree_str = f"{os.path.basename(abs_path)}\n" # Start with the root folder name
-        tree_str += _build_tree(abs_path)
-        get_context().add_file(f"tree_of_{os.path.basename(abs_path)}", tree_str)
+        index = get_tree_index()
+        with index.lock:
+            index.scan(abs_path) # Explicit request, so pick up changes made outside the file tools
+            tree_str = index.render(abs_path)
+            index.rendered_roots.add(abs_path)
+        get_context().add_file(tree_key(abs_path), tree_str)
         # Announce is usually done by the calling tool, but could announce here if needed
         # announce_execution_output(tool_name, action_details, "success", "Tree generated and added to context")
         return tree_str
@@ -101,7 +112,7 @@ def get_and_update_tree(target_path: str) -> str:
 
 def _write_to_file_internal(filepath: str, content: str) -> bool:
     """Internal helper to write content to a file. Returns True on success, False on error."""
-    abs_filepath = os.path.abspath(filepath)
+    abs_filepath = resolve_path(filepath)
     parent_dir = get_parent_dir(abs_filepath)
     try:
         # Ensure parent directory exists
@@ -109,9 +120,9 @@ def _write_to_file_internal(filepath: str, content: str) -> bool:
              os.makedirs(parent_dir, exist_ok=True) # exist_ok=True prevents error if dir already exists
              logger.info(f"Created directory: {parent_dir}")
 
-        with open(abs_filepath, "w", encoding='utf-8') as f: # Use utf-8 encoding
-            f.write(content)
+        write_atomic(abs_filepath, content) # Temp file + rename, never a half-written file
         get_context().add_file(filepath, content) # Update context on successful write
+        get_session().files_changed([abs_filepath])
         return True
     except (OSError, IOError) as e: # Catch file system related errors
         logger.exception(f"Error writing file '{filepath}':")
@@ -124,9 +135,13 @@ def _write_to_file_internal(filepath: str, content: str) -> bool:
 # --- Tool Functions ---
 
 @function_tool
-def ShellExec(command: str) -> str:
+@concurrent_tool(lambda **_: [writes()]) # Any command may touch any file
+@instrument_tool
+async def ShellExec(command: str) -> str:
     """
     Executes one or more shell commands separated by newlines or semicolons.
+    Commands run without blocking the agent and are killed after a timeout; only the tail of long outputs is kept.
+    Commands share one shell session, so `cd`, exported variables and activated virtualenvs persist between calls.
 
     Args:
         command: The shell command(s) to execute.
@@ -144,32 +159,34 @@ def ShellExec(command: str) -> str:
         if not commands:
             return "Error: No valid command provided."
 
+        watcher = get_watcher()
+        watcher.sync() # Snapshot cached files before the commands can touch them
+        delta = get_session().watch_search_index() # Every directory watched: only re-index what changed
         for i, cmd in enumerate(commands):
             cmd_details = f"Executing command ({i+1}/{len(commands)}): '{cmd}'"
             output = ""
             status = "error" # Default to error
             try:
-                result = subprocess.run(
-                    cmd,
-                    shell=True, # Be cautious with shell=True due to security risks if command is user-influenced
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8', # Be explicit about encoding
-                    timeout=SHELL_TIMEOUT,
-                    check=False # Don't raise exception on non-zero exit code, handle manually
-                )
-                if result.returncode == 0:
-                    output = result.stdout.strip() if result.stdout else "[No standard output]"
+                # Streams output on the event loop; only the last SHELL_OUTPUT_TAIL_BYTES per stream are kept
+                if SHELL_PERSISTENT_SESSION:
+                    result = await get_shell_session().run(cmd, timeout=SHELL_TIMEOUT, tail_bytes=SHELL_OUTPUT_TAIL_BYTES)
+                else:
+                    result = await run_command(cmd, timeout=SHELL_TIMEOUT, tail_bytes=SHELL_OUTPUT_TAIL_BYTES, cwd=get_session().root)
+                report = f"{result.wall_time:.2f}s, {result.output_bytes} bytes of output"
+                if result.timed_out:
+                    output = f"Error: Command '{cmd}' timed out after {SHELL_TIMEOUT} seconds."
+                    if SHELL_PERSISTENT_SESSION:
+                        output += " The shell session was restarted, so directory and environment changes were lost."
+                    if result.stdout or result.stderr:
+                        output += f"\nLast output before the timeout:\n{result.stdout}\n{result.stderr}".rstrip()
+                elif result.returncode == 0:
+                    output = result.stdout if result.stdout else "[No standard output]"
                     status = "success"
-                    announce_execution_output(tool_name, cmd_details, status, output)
                 else:
-                    output = result.stderr.strip() if result.stderr else f"[No standard error, exit code: {result.returncode}]"
-                    announce_execution_output(tool_name, cmd_details, status, output)
+                    output = result.stderr if result.stderr else f"[No standard error, exit code: {result.returncode}]"
+                announce_execution_output(tool_name, cmd_details, status, output, console_note=report)
 
-            except subprocess.TimeoutExpired:
-                output = f"Error: Command '{cmd}' timed out after {SHELL_TIMEOUT} seconds."
-                announce_execution_output(tool_name, cmd_details, status, output)
-            except FileNotFoundError: # Often happens if the command itself isn't found
+            except FileNotFoundError: # Often happens if the working directory vanished
                  output = f"Error: Command not found: '{cmd.split()[0]}'"
                  announce_execution_output(tool_name, cmd_details, status, output)
             except Exception as e:
@@ -179,6 +196,11 @@ def ShellExec(command: str) -> str:
 
             results.append(f"Command: {cmd}\nStatus: {status.upper()}\nOutput:\n{output}")
 
+        changed, changed_paths = watcher.sync_paths() # Refresh cached files and trees the commands modified
+        get_session().apply_search_index_changes(changed_paths if delta else None)
+        get_session().prefetcher.clear(get_session().id) # Any prefetched file may have been rewritten in place
+        if changed:
+            results.append(f"Context refreshed for modified files: {', '.join(changed)}")
         return "\n\n".join(results)
 
     except Exception as e:
@@ -189,6 +211,8 @@ def ShellExec(command: str) -> str:
         return error_msg
 
 @function_tool
+@concurrent_tool(lambda filepath: [writes(filepath)])
+@instrument_tool
 def DeleteFile(filepath: str) -> str:
     """
     Deletes the specified file.
@@ -201,8 +225,7 @@ def DeleteFile(filepath: str) -> str:
     """
     tool_name = "DeleteFile"
     action_details = f"Delete file: '{filepath}'"
-    abs_filepath = os.path.abspath(filepath)
-    parent_dir = get_parent_dir(abs_filepath)
+    abs_filepath = resolve_path(filepath)
 
     try:
         if not os.path.exists(abs_filepath):
@@ -216,7 +239,9 @@ def DeleteFile(filepath: str) -> str:
 
         os.remove(abs_filepath)
         get_context().delete_file(filepath) # Update context
-        get_and_update_tree(parent_dir) # Update tree of the PARENT directory
+        get_tree_index().remove_path(abs_filepath) # Patch the tree index instead of rescanning the parent
+        get_session().files_changed([abs_filepath])
+        refresh_rendered_trees([abs_filepath])
         success_msg = f"File deleted successfully: '{filepath}'"
         announce_execution_output(tool_name, action_details, "success", "successful, tree updated")
         return success_msg
@@ -236,20 +261,12 @@ def DeleteFile(filepath: str) -> str:
         announce_execution_output(tool_name, action_details, "error", error_msg)
         return error_msg
 
-@function_tool
-def ReadFile(filepath: str) -> str:
-    """
-    Reads the content of the specified file.
-
-    Args:
-        filepath: The path to the file to read.
-
-    Returns:
-        The content of the file as a string, or an error message string.
-    """
+def _read_file_internal(filepath: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+                        start_byte: Optional[int] = None, end_byte: Optional[int] = None) -> str:
+    """Shared implementation of ReadFile (also used by ReadTODO). Announces its own outcome."""
     tool_name = "ReadFile"
     action_details = f"Read file: '{filepath}'"
-    abs_filepath = os.path.abspath(filepath)
+    abs_filepath = resolve_path(filepath)
 
     try:
         if not os.path.exists(abs_filepath):
@@ -261,11 +278,19 @@ def ReadFile(filepath: str) -> str:
              announce_execution_output(tool_name, action_details, "error", error_msg)
              return error_msg
 
-        with open(abs_filepath, "r", encoding='utf-8') as f: # Specify encoding
-            content = f.read()
-        get_context().add_file(filepath, content) # Add to context AFTER successful read
+        session = get_session()
+        cached = session.prefetcher.take(abs_filepath, session.id) # Warmed by an earlier read, if still fresh
+        file_slice = read_file_slice(abs_filepath, start_line, end_line, start_byte, end_byte, data=cached)
+        if file_slice.label is not None:
+            action_details += f" ({file_slice.label})"
+        if file_slice.is_binary:
+            announce_execution_output(tool_name, action_details, "success", file_slice.content)
+            return file_slice.content
+        # Only the requested slice (or the preview) goes into the context, AFTER a successful read
+        get_context().add_file(slice_key(filepath, file_slice.label), file_slice.content)
+        session.prefetcher.after_read(abs_filepath, file_slice.content, session.id) # Its imports, tests, neighbours
         announce_execution_output(tool_name, action_details, "success", "File content read and added to context")
-        return content # Return the actual content
+        return file_slice.content # Return the actual content
     except PermissionError as e:
         logger.warning(f"Permission error reading file '{filepath}': {e}")
         error_msg = f"Error: Permission denied reading file: '{filepath}'"
@@ -283,25 +308,37 @@ def ReadFile(filepath: str) -> str:
         return error_msg
 
 @function_tool
-def WriteAndCreateFile(filepath: str, content: str) -> str:
+@concurrent_tool(lambda filepath, **_: [reads(filepath)])
+@instrument_tool
+def ReadFile(filepath: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+             start_byte: Optional[int] = None, end_byte: Optional[int] = None) -> str:
     """
-    Writes content to a file, creating the file and any necessary directories if they don't exist.
-    Overwrites the file if it already exists.
+    Reads the content of the specified file, or only a range of it.
+    Large files without a range return a head/tail preview with their size and line count.
+    Binary files are detected and not returned.
 
     Args:
-        filepath: The path to the file to write.
-        content: The string content to write to the file.
+        filepath: The path to the file to read.
+        start_line: Optional first line to read (1-based, inclusive).
+        end_line: Optional last line to read (1-based, inclusive).
+        start_byte: Optional first byte offset to read (0-based, inclusive). Takes precedence over lines.
+        end_byte: Optional byte offset where reading stops (exclusive).
 
     Returns:
-        A success message or an error message string.
+        The content of the file (or of the requested range) as a string, or an error message string.
     """
-    tool_name = "WriteAndCreateFile"
+    return _read_file_internal(filepath, start_line, end_line, start_byte, end_byte)
+
+def _write_and_create_file_internal(filepath: str, content: str, tool_name: str = "WriteAndCreateFile") -> str:
+    """Shared implementation of WriteAndCreateFile (also used by WriteTODO). Announces its own outcome."""
     action_details = f"Write to file: '{filepath}'"
-    abs_filepath = os.path.abspath(filepath)
-    parent_dir = get_parent_dir(abs_filepath)
+    abs_filepath = resolve_path(filepath)
 
+    existed = os.path.exists(abs_filepath)
     if _write_to_file_internal(abs_filepath, content):
-        get_and_update_tree(parent_dir) # Update tree of the PARENT directory
+        if not existed: # Overwriting an existing file does not change any tree
+            get_tree_index().add_path(abs_filepath, is_dir=False)
+            refresh_rendered_trees([abs_filepath])
         success_msg = f"File written successfully: '{filepath}'"
         announce_execution_output(tool_name, action_details, "success", "successful, tree updated")
         return success_msg
@@ -313,6 +350,124 @@ def WriteAndCreateFile(filepath: str, content: str) -> str:
         return error_msg # Return generic error, specific logged already
 
 @function_tool
+@concurrent_tool(lambda filepath, **_: [writes(filepath)])
+@instrument_tool
+def WriteAndCreateFile(filepath: str, content: str) -> str:
+    """
+    Writes content to a file, creating the file and any necessary directories if they don't exist.
+    Overwrites the file if it already exists.
+
+    Args:
+        filepath: The path to the file to write.
+        content: The string content to write to the file.
+
+    Returns:
+        A success message or an error message string.
+    """
+    return _write_and_create_file_internal(filepath, content)
+
+
+class TextEdit(BaseModel):
+    """One search/replace hunk of EditFile."""
+    search: str  # Exact lines currently in the file (a few lines of context make it unique)
+    replace: str # The lines to put in their place
+
+def _update_cached_copies(abs_filepath: str, content: str):
+    """
+    Puts the edited content in every whole-file context entry of abs_filepath
+    and drops its slices (their line/byte ranges may have shifted). A file that
+    was not cached is not added: the tool output already shows the changed lines.
+    """
+    context = get_context()
+    with context.lock:
+        for key in list(context.files) + list(context.evicted):
+            if key.startswith(TREE_KEY_PREFIX):
+                continue
+            path, label = split_slice_key(key)
+            if resolve_path(path) != abs_filepath:
+                continue
+            if label is None and key in context.files:
+                context.add_file(key, content)
+            else:
+                context.delete_file(key)
+
+@function_tool
+@concurrent_tool(lambda filepath, **_: [writes(filepath)])
+@instrument_tool
+def EditFile(filepath: str, edits: Optional[List[TextEdit]] = None, diff: Optional[str] = None) -> str:
+    """
+    Edits part of an existing file instead of rewriting it. Prefer this over WriteAndCreateFile for changes to existing files.
+    Give either search/replace edits or a unified diff (or both; edits are applied first). Each hunk is located
+    exactly, then ignoring whitespace, then by similarity, so small mistakes in the context lines are tolerated.
+    If any hunk cannot be located, nothing is written.
+
+    Args:
+        filepath: The path to the file to edit.
+        edits: Search/replace hunks, applied in order. "search" must be lines of the current file.
+        diff: A unified diff of the file (lines starting with " ", "-" or "+" under "@@ -a,b +c,d @@" headers).
+
+    Returns:
+        The changed regions with line numbers, or an error message string.
+    """
+    tool_name = "EditFile"
+    action_details = f"Edit file: '{filepath}'"
+    abs_filepath = resolve_path(filepath)
+
+    try:
+        if not os.path.exists(abs_filepath):
+            error_msg = f"Error: File not found: '{filepath}' (use WriteAndCreateFile to create it)"
+            announce_execution_output(tool_name, action_details, "error", error_msg)
+            return error_msg
+        if os.path.isdir(abs_filepath):
+            error_msg = f"Error: Path is a directory, not a file: '{filepath}'"
+            announce_execution_output(tool_name, action_details, "error", error_msg)
+            return error_msg
+
+        hunks = [hunk_from_search_replace(edit.search, edit.replace) for edit in edits or []]
+        if diff:
+            hunks.extend(parse_unified_diff(diff))
+        if not hunks:
+            error_msg = "Error: Nothing to apply, pass edits or diff"
+            announce_execution_output(tool_name, action_details, "error", error_msg)
+            return error_msg
+
+        with open(abs_filepath, "r", encoding="utf-8", newline="") as f: # newline="": keep \r\n as is
+            original = f.read()
+        content, applied = apply_hunks(original, hunks)
+        if content != original:
+            write_atomic(abs_filepath, content, newline="")
+            _update_cached_copies(abs_filepath, content)
+            get_session().files_changed([abs_filepath])
+        summary = ", ".join(f"lines {h.start + 1}-{h.start + h.new_count} (-{h.old_count} +{h.new_count})" for h in applied)
+        announce_execution_output(tool_name, action_details, "success", f"{len(applied)} hunk(s) applied: {summary}")
+        return f"Edited '{filepath}', {len(applied)} hunk(s) applied:\n{describe_changes(content, applied)}"
+    except PatchError as e:
+        error_msg = f"Error: Could not apply the edit to '{filepath}': {e}. The file was not changed; read it and retry."
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except UnicodeDecodeError:
+        error_msg = f"Error: '{filepath}' is not a UTF-8 text file"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except PermissionError as e:
+        logger.warning(f"Permission error editing file '{filepath}': {e}")
+        error_msg = f"Error: Permission denied editing file: '{filepath}'"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except OSError as e:
+        logger.exception(f"OS error editing file '{filepath}':")
+        error_msg = f"Error editing file '{filepath}': {e.strerror}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except Exception as e:
+        logger.exception(f"Unexpected error editing file '{filepath}':")
+        error_msg = f"Error: Unexpected error editing file '{filepath}': {str(e)}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+
+@function_tool
+@concurrent_tool(lambda source_path, dest_path: [writes(source_path), writes(dest_path)])
+@instrument_tool
 def RenameAndMoveFile(source_path: str, dest_path: str) -> str:
     """
     Renames or moves a file or directory from source_path to dest_path.
@@ -326,9 +481,8 @@ def RenameAndMoveFile(source_path: str, dest_path: str) -> str:
     """
     tool_name = "RenameAndMoveFile"
     action_details = f"Move '{source_path}' to '{dest_path}'"
-    abs_source = os.path.abspath(source_path)
-    abs_dest = os.path.abspath(dest_path)
-    source_parent_dir = get_parent_dir(abs_source)
+    abs_source = resolve_path(source_path)
+    abs_dest = resolve_path(dest_path)
     dest_parent_dir = get_parent_dir(abs_dest)
 
     try:
@@ -345,10 +499,10 @@ def RenameAndMoveFile(source_path: str, dest_path: str) -> str:
         os.rename(abs_source, abs_dest)
         get_context().rename_file(source_path, dest_path) # Update context
 
-        # Update trees of both source and destination parent directories if they differ
-        get_and_update_tree(source_parent_dir)
-        if source_parent_dir != dest_parent_dir:
-            get_and_update_tree(dest_parent_dir)
+        # Patch the index once and re-render the trees showing either side of the move
+        get_tree_index().move_path(abs_source, abs_dest)
+        refresh_rendered_trees([abs_source, abs_dest])
+        get_session().files_changed([abs_source, abs_dest])
 
         success_msg = f"Moved successfully from '{source_path}' to '{dest_path}'"
         announce_execution_output(tool_name, action_details, "success", "successful, tree(s) updated")
@@ -374,6 +528,8 @@ def RenameAndMoveFile(source_path: str, dest_path: str) -> str:
         return error_msg
 
 @function_tool
+@concurrent_tool(lambda folder_path: [writes(folder_path)])
+@instrument_tool
 def CreateFolder(folder_path: str) -> str:
     """
     Creates a new directory, including any necessary parent directories.
@@ -386,8 +542,7 @@ def CreateFolder(folder_path: str) -> str:
     """
     tool_name = "CreateFolder"
     action_details = f"Create folder: '{folder_path}'"
-    abs_folder_path = os.path.abspath(folder_path)
-    parent_dir = get_parent_dir(abs_folder_path)
+    abs_folder_path = resolve_path(folder_path)
 
     try:
         if os.path.exists(abs_folder_path):
@@ -403,7 +558,8 @@ def CreateFolder(folder_path: str) -> str:
                 return error_msg
 
         os.makedirs(abs_folder_path, exist_ok=True) # exist_ok=True redundant due to check, but safe
-        get_and_update_tree(parent_dir) # Update tree of the PARENT directory
+        get_tree_index().add_path(abs_folder_path, is_dir=True)
+        refresh_rendered_trees([abs_folder_path])
         success_msg = f"Folder created successfully: '{folder_path}'"
         announce_execution_output(tool_name, action_details, "success", "successful, tree updated")
         return success_msg
@@ -424,6 +580,8 @@ def CreateFolder(folder_path: str) -> str:
         return error_msg
 
 @function_tool
+@concurrent_tool(lambda path: [reads(path)])
+@instrument_tool
 def GetTree(path: str = '.') -> str:
     """
     Gets the directory tree structure starting from the specified path. Defaults to current directory.
@@ -444,29 +602,306 @@ def GetTree(path: str = '.') -> str:
         # Error was already announced by get_and_update_tree, just return it
         return tree_result
     else:
+        session = get_session()
+        session.prefetcher.after_tree(resolve_path(path), session.id)
         announce_execution_output(tool_name, action_details, "success", "Tree generated and added to context")
         return tree_result
 
 
 @function_tool
+@concurrent_tool(lambda **_: [reads()])
+@instrument_tool
+def SearchCode(query: str, regex: bool = False, path_glob: Optional[str] = None, max_results: Optional[int] = None) -> str:
+    """
+    Searches the text of every file in the workspace (ignoring .git, node_modules, .gitignore'd paths...)
+    through an index, much faster than grep in ShellExec and with a capped output.
+    The search is case-insensitive unless the query contains an uppercase letter.
+    Files with matching definitions (def, class, function...) are listed first.
+
+    Args:
+        query: The text to find, or a Python regular expression if regex is true.
+        regex: Treat query as a regular expression. Defaults to false (literal text).
+        path_glob: Optional glob restricting the files searched, relative to the workspace (e.g. "src/*.py").
+        max_results: Maximum number of matching lines returned (default 50).
+
+    Returns:
+        Matching lines as "path:line: text", grouped by file in rank order, or an error message string.
+    """
+    tool_name = "SearchCode"
+    action_details = f"Search for {'regex' if regex else 'text'}: {query!r}" + (f" in '{path_glob}'" if path_glob else "")
+    if not query:
+        error_msg = "Error: Empty query"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    try:
+        result = get_session().search_index.search(query, regex=regex, path_glob=path_glob,
+                                                   max_results=max_results or DEFAULT_MAX_RESULTS)
+    except re.error as e:
+        error_msg = f"Error: Invalid regular expression {query!r}: {e}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except Exception as e:
+        logger.exception(f"Unexpected error searching for {query!r}:")
+        error_msg = f"Error: Unexpected error searching for {query!r}: {str(e)}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+
+    summary = f"{len(result.matches)} line(s) shown from {result.files_matched} file(s)"
+    if result.truncated:
+        summary += " (more matches exist, narrow the query or path_glob)"
+    note = f"{result.elapsed * 1000:.1f}ms, {result.candidates} file(s) checked" + ("" if result.indexed else ", no index narrowing")
+    announce_execution_output(tool_name, action_details, "success", summary, console_note=note)
+    if not result.matches:
+        return f"No matches for {query!r}."
+    lines = [f"{match.path}:{match.line}: {match.text}" for match in result.matches]
+    return summary + "\n" + "\n".join(lines)
+
+
+@function_tool
+@concurrent_tool(lambda filepath: [reads(filepath)])
+@instrument_tool
+def GetOutline(filepath: str) -> str:
+    """
+    Lists the classes, functions, methods and top-level variables of a file with their signatures,
+    line ranges and first docstring line, without reading the whole file.
+    Use it to understand a module, then ReadFile only the line ranges you need.
+
+    Args:
+        filepath: The path to the file to outline.
+
+    Returns:
+        One line per symbol ("start-end  signature  # doc"), indented by nesting, or an error message string.
+    """
+    tool_name = "GetOutline"
+    action_details = f"Outline file: '{filepath}'"
+    abs_filepath = resolve_path(filepath)
+    try:
+        if not os.path.isfile(abs_filepath):
+            error_msg = f"Error: File not found: '{filepath}'"
+            announce_execution_output(tool_name, action_details, "error", error_msg)
+            return error_msg
+        if language_of(abs_filepath) is None:
+            error_msg = f"Error: No outline support for '{os.path.splitext(filepath)[1] or filepath}' files, use ReadFile"
+            announce_execution_output(tool_name, action_details, "error", error_msg)
+            return error_msg
+        symbols = get_session().symbol_index.symbols(abs_filepath)
+        outline = render_outline(filepath, symbols)
+        get_context().add_file(slice_key(filepath, "outline"), outline) # Dropped by the watcher when the file changes
+        announce_execution_output(tool_name, action_details, "success", f"{len(symbols)} symbol(s) added to context")
+        return outline
+    except PermissionError as e:
+        logger.warning(f"Permission error outlining file '{filepath}': {e}")
+        error_msg = f"Error: Permission denied reading file: '{filepath}'"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except OSError as e:
+        logger.exception(f"OS error outlining file '{filepath}':")
+        error_msg = f"Error reading file '{filepath}': {e.strerror}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    except Exception as e:
+        logger.exception(f"Unexpected error outlining file '{filepath}':")
+        error_msg = f"Error: Unexpected error outlining file '{filepath}': {str(e)}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+
+@function_tool
+@concurrent_tool(lambda **_: [reads()])
+@instrument_tool
+def GoToDefinition(name: str, path_glob: Optional[str] = None) -> str:
+    """
+    Finds where a class, function, method or top-level variable is defined in the workspace.
+
+    Args:
+        name: The symbol name, optionally qualified with its class (e.g. "Session" or "Session.close").
+        path_glob: Optional glob restricting the files searched, relative to the workspace (e.g. "api/*.py").
+
+    Returns:
+        One line per definition ("path:start-end kind signature"), or an error message string.
+    """
+    tool_name = "GoToDefinition"
+    action_details = f"Find definition of '{name}'"
+    try:
+        definitions = get_session().symbol_index.definitions(name, path_glob)
+    except Exception as e:
+        logger.exception(f"Unexpected error finding definition of '{name}':")
+        error_msg = f"Error: Unexpected error finding definition of '{name}': {str(e)}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    if not definitions:
+        message = f"No definition of '{name}' found."
+        announce_execution_output(tool_name, action_details, "success", message)
+        return message
+    lines = []
+    for path, symbol in definitions:
+        span = f"{symbol.line}-{symbol.end_line}" if symbol.end_line else str(symbol.line)
+        doc = f"  # {symbol.doc}" if symbol.doc else ""
+        lines.append(f"{path}:{span} {symbol.kind} {symbol.qualified_name}: {symbol.signature}{doc}")
+    announce_execution_output(tool_name, action_details, "success", f"{len(definitions)} definition(s) found")
+    return "\n".join(lines)
+
+@function_tool
+@concurrent_tool(lambda **_: [reads()])
+@instrument_tool
+def FindReferences(name: str, path_glob: Optional[str] = None, max_results: Optional[int] = None) -> str:
+    """
+    Lists the lines that mention a symbol as a whole word (case-sensitive), marking its definitions.
+
+    Args:
+        name: The symbol name (a qualified "Class.method" searches for "method").
+        path_glob: Optional glob restricting the files searched, relative to the workspace.
+        max_results: Maximum number of lines returned (default 50).
+
+    Returns:
+        "path:line: text" lines, definitions marked with "[definition]", or an error message string.
+    """
+    tool_name = "FindReferences"
+    action_details = f"Find references to '{name}'"
+    try:
+        references = get_session().symbol_index.references(name, path_glob, max_results or DEFAULT_MAX_RESULTS)
+    except Exception as e:
+        logger.exception(f"Unexpected error finding references to '{name}':")
+        error_msg = f"Error: Unexpected error finding references to '{name}': {str(e)}"
+        announce_execution_output(tool_name, action_details, "error", error_msg)
+        return error_msg
+    if not references:
+        message = f"No references to '{name}' found."
+        announce_execution_output(tool_name, action_details, "success", message)
+        return message
+    lines = [f"{match.path}:{match.line}: {match.text}" + (" [definition]" if is_definition else "")
+             for match, is_definition in references]
+    announce_execution_output(tool_name, action_details, "success", f"{len(references)} reference(s) shown")
+    return "\n".join(lines)
+
+
+class FileOperation(BaseModel):
+    """One step of BatchFileOperations."""
+    op: Literal["read", "write", "mkdir", "move"]
+    path: str
+    content: Optional[str] = None # Required for "write"
+    dest: Optional[str] = None    # Required for "move"
+
+def _batch_claims(operations: List[FileOperation]) -> List[Claim]:
+    claims = []
+    for operation in operations:
+        claims.append(reads(operation.path) if operation.op == "read" else writes(operation.path))
+        if operation.op == "move" and operation.dest:
+            claims.append(writes(operation.dest))
+    return claims
+
+def _run_file_operation(operation: FileOperation, touched: List[str]) -> str:
+    """
+    Runs one batch step without announcing it or re-rendering trees.
+    Appends the paths whose tree entries changed to `touched`.
+    Returns the read content for "read", an empty string otherwise. Raises on failure.
+    """
+    abs_path = resolve_path(operation.path)
+    index = get_tree_index()
+    if operation.op == "read":
+        if os.path.isdir(abs_path):
+            raise IsADirectoryError(f"Path is a directory, not a file: '{operation.path}'")
+        file_slice = read_file_slice(abs_path)
+        if not file_slice.is_binary:
+            get_context().add_file(slice_key(operation.path, file_slice.label), file_slice.content)
+        return file_slice.content
+    if operation.op == "write":
+        if operation.content is None:
+            raise ValueError("'write' needs content")
+        existed = os.path.exists(abs_path)
+        if not _write_to_file_internal(operation.path, operation.content):
+            raise OSError(f"Failed to write to file '{operation.path}'. Check logs for details.")
+        if not existed:
+            index.add_path(abs_path, is_dir=False)
+            touched.append(abs_path)
+        return ""
+    if operation.op == "mkdir":
+        if os.path.exists(abs_path) and not os.path.isdir(abs_path):
+            raise FileExistsError(f"Path exists but is a file, not a folder: '{operation.path}'")
+        os.makedirs(abs_path, exist_ok=True)
+        index.add_path(abs_path, is_dir=True)
+        touched.append(abs_path)
+        return ""
+    if operation.op == "move":
+        if not operation.dest:
+            raise ValueError("'move' needs dest")
+        abs_dest = resolve_path(operation.dest)
+        if not os.path.exists(abs_path):
+            raise FileNotFoundError(f"Source path not found: '{operation.path}'")
+        os.makedirs(get_parent_dir(abs_dest), exist_ok=True)
+        os.rename(abs_path, abs_dest)
+        get_context().rename_file(operation.path, operation.dest)
+        index.move_path(abs_path, abs_dest)
+        get_session().files_changed([abs_path, abs_dest])
+        touched.extend([abs_path, abs_dest])
+        return ""
+    raise ValueError(f"Unknown operation '{operation.op}'")
+
+@function_tool
+@concurrent_tool(_batch_claims)
+@instrument_tool
+def BatchFileOperations(operations: List[FileOperation]) -> str:
+    """
+    Runs several file operations in one call, in order. Prefer this over many single-file tool calls.
+    Each operation has an op ("read", "write", "mkdir" or "move") and a path; "write" also needs content
+    and "move" needs dest. A failing operation does not stop the following ones.
+
+    Args:
+        operations: The list of operations to run.
+
+    Returns:
+        One status line per operation ("[n] op path: OK" or "[n] op path: ERROR message"), followed by the content of each read.
+    """
+    tool_name = "BatchFileOperations"
+    action_details = f"Run {len(operations)} file operation(s)"
+    touched: List[str] = []
+    status_lines = []
+    read_ops = []
+    for i, operation in enumerate(operations, start=1):
+        label = f"[{i}] {operation.op} {operation.path}" + (f" -> {operation.dest}" if operation.op == "move" else "")
+        try:
+            content = _run_file_operation(operation, touched)
+            status_lines.append(f"{label}: OK")
+            if operation.op == "read":
+                read_ops.append(f"--- [{i}] {operation.path} ---\n{content}")
+        except OSError as e:
+            logger.warning(f"Batch operation {label} failed: {e}")
+            status_lines.append(f"{label}: ERROR {e.strerror or e}")
+        except ValueError as e: # Malformed operation (missing content/dest)
+            status_lines.append(f"{label}: ERROR {str(e)}")
+        except Exception as e:
+            logger.exception(f"Unexpected error in batch operation {label}:")
+            status_lines.append(f"{label}: ERROR {str(e)}")
+
+    if touched:
+        refresh_rendered_trees(touched) # One tree re-render for the whole batch
+    failed = sum(1 for line in status_lines if ": ERROR " in line)
+    summary = "\n".join(status_lines)
+    announce_execution_output(tool_name, action_details, "success" if not failed else "error", summary)
+    return "\n\n".join([summary] + read_ops)
+
+@function_tool
+@concurrent_tool(lambda: [reads(TODO_FILENAME)])
+@instrument_tool
 def ReadTODO() -> str:
     """Reads the content of the predefined TODO file (todo.md)."""
     tool_name = "ReadTODO"
     action_details = f"Read file: '{TODO_FILENAME}'"
     # Reuse the generic ReadFile logic but announce specifically
-    content = ReadFile(TODO_FILENAME)
+    content = _read_file_internal(TODO_FILENAME)
     # ReadFile already announces, so we might not need another announcement here,
     # unless we want to explicitly log the use of ReadTODO vs ReadFile.
     # If ReadFile returned an error, content will contain the error message.
     return content
 
 @function_tool
+@concurrent_tool(lambda content: [writes(TODO_FILENAME)])
+@instrument_tool
 def WriteTODO(content: str) -> str:
     """Writes (overwrites) content to the predefined TODO file (todo.md)."""
     tool_name = "WriteTODO"
     action_details = f"Write to file: '{TODO_FILENAME}'"
-    # Reuse the generic WriteAndCreateFile logic
-    result = WriteAndCreateFile(TODO_FILENAME, content)
+    # Reuse the generic WriteAndCreateFile logic (the tool itself is a FunctionTool, not callable)
+    result = _write_and_create_file_internal(TODO_FILENAME, content, tool_name)
     # WriteAndCreateFile already announces.
     # If it failed, result contains the error message. If success, it contains the success message.
     # We can modify the message slightly if needed.
@@ -485,9 +920,15 @@ def get_tools():
         DeleteFile,
         ReadFile,
         WriteAndCreateFile,
+        EditFile,
         RenameAndMoveFile,
         CreateFolder,
         GetTree,
+        SearchCode,
+        GetOutline,
+        GoToDefinition,
+        FindReferences,
+        BatchFileOperations,
         ReadTODO,
         WriteTODO,
     ]
\ No newline at end of file